@@ -0,0 +1,73 @@
+"""
+MMU Student Portal - Account balance check
+Reads the fee balance in the same session as the registration check: from
+the page the login lands on when it shows the balance, otherwise with one
+extra request for MMU_BALANCE_URL that does not leave the current page.
+"""
+
+import os
+
+from structured_log import get_logger
+
+log = get_logger()
+
+# Fetches a same-origin page with the browser's cookies, without navigating
+FETCH_PAGE_SCRIPT = """
+const done = arguments[arguments.length - 1];
+fetch(arguments[0], {credentials: 'same-origin'})
+    .then(response => response.ok ? response.text() : null)
+    .then(done)
+    .catch(() => done(null));
+"""
+
+
+def balance_enabled():
+    """Whether to read the account balance during a check (MMU_BALANCE_CHECK, default false)."""
+    return os.getenv("MMU_BALANCE_CHECK", "false").lower() == "true"
+
+
+def read_balance(page_source, fetch_page, url):
+    """
+    Parse the balance from the current page, or from `url` fetched with
+    `fetch_page(url)` (returning its HTML, or None).
+
+    Returns parse_balance()'s dict plus its 'source', or None.
+    """
+    from portal_parser import parse_balance
+
+    balance = parse_balance(page_source)
+    if balance:
+        balance["source"] = "current_page"
+    else:
+        page = fetch_page(url)
+        balance = parse_balance(page) if page else None
+        if balance:
+            balance["source"] = url
+
+    if balance:
+        owed = "owed" if balance["amount"] > 0 else "nothing owed"
+        log.info(f"Account balance: {balance['currency']} {balance['amount']:,.2f} ({owed})")
+    else:
+        log.warning("Could not find the account balance (set MMU_BALANCE_URL to the fee statement page)")
+    return balance
+
+
+def read_balance_in_browser(driver, url):
+    """Read the balance on a logged-in browser without navigating away."""
+    try:
+        def fetch_page(page_url):
+            return driver.execute_async_script(FETCH_PAGE_SCRIPT, page_url)
+
+        return read_balance(driver.page_source, fetch_page, url)
+    except Exception as e:
+        log.warning(f"Balance check failed: {e}")
+        return None
+
+
+def read_balance_http(session, url):
+    """Read the balance on a logged-in HttpPortalSession without changing its page state."""
+    try:
+        return read_balance(session.page_source, session.fetch_page, url)
+    except Exception as e:
+        log.warning(f"Balance check failed: {e}")
+        return None
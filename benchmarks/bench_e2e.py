@@ -0,0 +1,153 @@
+"""
+Benchmark: end-to-end checks against the local mock portal
+
+Starts mock_portal.py with the given latency and runs full checks
+(login -> Unit Registration -> Get Units -> extraction) for each engine,
+scenario and unit-list size, reporting end-to-end and per-stage latency,
+peak RSS of the bot and its browser processes, and WebDriver command counts.
+
+Usage:
+    python benchmarks/bench_e2e.py --engines selenium http --scenarios units units_modal \
+        already_registered --units 10 100 --latency 50 --repeat 3 --json bench_e2e.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psutil
+
+from mock_portal import SCENARIOS, MockPortal
+
+REG_NUMBER = "BENCH/001/2024"
+PASSWORD = "bench-secret"
+
+
+class PeakRss:
+    """Samples the RSS of this process and all its children (chromedriver, Chrome) in the background."""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak = 0
+        self.process = psutil.Process()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self.stopped.is_set():
+            total = 0
+            try:
+                processes = [self.process] + self.process.children(recursive=True)
+            except psutil.Error:
+                processes = [self.process]
+            for proc in processes:
+                try:
+                    total += proc.memory_info().rss
+                except psutil.Error:
+                    continue
+            self.peak = max(self.peak, total)
+            self.stopped.wait(self.interval)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+    @property
+    def peak_mb(self):
+        return self.peak / (1024 * 1024)
+
+
+def run_case(bot, engine, repeat):
+    """Run `repeat` checks and summarise them."""
+    durations = []
+    commands = []
+    stages = {}
+    statuses = set()
+    engines = set()
+    with PeakRss() as rss:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = bot.run_check(REG_NUMBER, PASSWORD, engine=engine, headless=True, review=False)
+            durations.append(time.perf_counter() - started)
+            statuses.add(result["status"])
+            engines.add(result.get("engine", engine))
+            spans = result.get("timings", [])
+            commands.append(sum(span["webdriver_commands"] for span in spans))
+            for span in spans:
+                stages.setdefault(span["stage"], []).append(span["seconds"])
+
+    return {
+        "engine": "+".join(sorted(engines)),
+        "status": "/".join(sorted(statuses)),
+        "e2e_median_s": round(statistics.median(durations), 3),
+        "e2e_max_s": round(max(durations), 3),
+        "webdriver_commands": int(statistics.median(commands)),
+        "peak_rss_mb": round(rss.peak_mb, 1),
+        "stages": {stage: round(statistics.median(seconds), 3) for stage, seconds in stages.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engines", nargs="+", choices=["selenium", "http"], default=["selenium", "http"])
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS),
+                        default=["units", "units_modal", "already_registered"])
+    parser.add_argument("--units", type=int, nargs="+", default=[10, 100], help="Unit-list sizes")
+    parser.add_argument("--latency", type=float, default=50, help="Milliseconds added to every portal response")
+    parser.add_argument("--jitter", type=float, default=0, help="Up to this many extra milliseconds at random")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--session-cache", action="store_true", help="Reuse cached sessions between runs")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    portal = MockPortal(registration_number=REG_NUMBER, password=PASSWORD,
+                        latency=args.latency / 1000, jitter=args.jitter / 1000).start()
+    # The bot reads its configuration on first use
+    os.environ["MMU_PORTAL_URL"] = portal.base_url
+    os.environ["MMU_LINGER_SECONDS"] = "0"
+    os.environ["MMU_SESSION_CACHE"] = "true" if args.session_cache else "false"
+    import course_registration_bot as bot
+
+    results = []
+    try:
+        print(f"{'engine':>9} | {'scenario':>18} | {'units':>5} | {'e2e s':>7} | {'max s':>7} | "
+              f"{'cmds':>5} | {'peak MB':>8} | status")
+        print("-" * 96)
+        for engine in args.engines:
+            for scenario in args.scenarios:
+                sizes = args.units if scenario.startswith("units") else args.units[:1]
+                for size in sizes:
+                    portal.configure(scenario=scenario, unit_count=size)
+                    case = run_case(bot, engine, args.repeat)
+                    case.update({"requested_engine": engine, "scenario": scenario, "units": size})
+                    results.append(case)
+                    print(f"{case['engine']:>9} | {scenario:>18} | {size:>5} | {case['e2e_median_s']:>7.3f} | "
+                          f"{case['e2e_max_s']:>7.3f} | {case['webdriver_commands']:>5} | "
+                          f"{case['peak_rss_mb']:>8.1f} | {case['status']}")
+    finally:
+        portal.stop()
+
+    print("\nPer-stage median seconds:")
+    for case in results:
+        stages = ", ".join(f"{stage} {seconds:.3f}" for stage, seconds in case["stages"].items())
+        print(f"  {case['requested_engine']}/{case['scenario']}/{case['units']}: {stages}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"latency_ms": args.latency, "jitter_ms": args.jitter, "repeat": args.repeat,
+                       "results": results}, f, indent=2)
+        print(f"\nResults saved to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
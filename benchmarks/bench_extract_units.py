@@ -0,0 +1,118 @@
+"""
+Benchmark: batched vs per-element unit extraction
+
+Loads a generated Unit Registration page with N units in the checkbox modal
+and times collect_unit_candidates() (one execute_script) against the
+original per-element WebDriver walk, counting WebDriver commands for each.
+
+Usage:
+    python benchmarks/bench_extract_units.py --sizes 10 50 200 --repeat 5
+"""
+
+import argparse
+import html
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+
+from mock_portal import make_units
+from unit_extractor import collect_unit_candidates, collect_unit_candidates_per_element
+
+
+def build_page(unit_count):
+    rows = "".join(
+        f'<tr><td><input type="checkbox" id="Main_chkUnit_{i}" /></td>'
+        f'<td>{html.escape(code)}</td><td>{html.escape(title)}</td><td>{hours}</td></tr>'
+        for i, (code, title, hours) in enumerate(make_units(unit_count))
+    )
+    return f"""<!DOCTYPE html><html><body>
+<div id="myModalCourseRegister" style="display: block">
+<table><tr><th>Select</th><th>Unit Code</th><th>Unit Name</th><th>Credit Hours</th></tr>{rows}</table>
+</div></body></html>"""
+
+
+def start_driver():
+    options = Options()
+    options.add_argument("--headless=new")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    chrome_bin = os.getenv("CHROME_BIN") or os.getenv("CHROME_PATH")
+    if chrome_bin:
+        options.binary_location = chrome_bin
+    chromedriver_path = os.getenv("CHROMEDRIVER_PATH")
+    if chromedriver_path:
+        return webdriver.Chrome(service=Service(executable_path=chromedriver_path), options=options)
+    return webdriver.Chrome(options=options)
+
+
+def count_commands(driver):
+    """Wrap driver.execute so every WebDriver command is counted."""
+    counter = {"commands": 0}
+    original = driver.execute
+
+    def counting_execute(driver_command, params=None):
+        counter["commands"] += 1
+        return original(driver_command, params)
+
+    driver.execute = counting_execute
+    return counter
+
+
+def run(driver, counter, collector, repeat):
+    timings = []
+    commands = 0
+    result = None
+    for _ in range(repeat):
+        counter["commands"] = 0
+        started = time.perf_counter()
+        result = collector(driver)
+        timings.append(time.perf_counter() - started)
+        commands = counter["commands"]
+    return statistics.median(timings), commands, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    # Compare the full walks; a learned checkbox selector would reorder the batched run's lookups
+    os.environ["MMU_LOCATOR_CACHE"] = "false"
+
+    driver = start_driver()
+    counter = count_commands(driver)
+    try:
+        print(f"{'units':>6} | {'per-element s':>13} | {'cmds':>6} | {'batched s':>9} | {'cmds':>4} | {'speedup':>7} | same")
+        print("-" * 72)
+        for size in args.sizes:
+            with tempfile.NamedTemporaryFile("w", suffix=".html", delete=False, encoding="utf-8") as f:
+                f.write(build_page(size))
+                page_path = f.name
+            try:
+                driver.get("file://" + page_path)
+                slow, slow_cmds, slow_result = run(driver, counter, collect_unit_candidates_per_element, args.repeat)
+                fast, fast_cmds, fast_result = run(driver, counter, collect_unit_candidates, args.repeat)
+            finally:
+                os.remove(page_path)
+
+            same = (
+                [u["text"] for u in slow_result["checkboxes"]] == [u["text"] for u in fast_result["checkboxes"]]
+                and slow_result["dropdown"] == fast_result["dropdown"]
+                and slow_result["table"] == fast_result["table"]
+            )
+            print(f"{size:>6} | {slow:>13.3f} | {slow_cmds:>6} | {fast:>9.3f} | {fast_cmds:>4} | "
+                  f"{slow / fast if fast else float('inf'):>6.1f}x | {'yes' if same else 'NO'}")
+    finally:
+        driver.quit()
+
+
+if __name__ == "__main__":
+    main()
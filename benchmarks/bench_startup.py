@@ -0,0 +1,107 @@
+"""
+Benchmark: import time of the bot's entry points
+
+Imports each module in a fresh interpreter with `python -X importtime` and
+reports the module's own cumulative import time, the wall time of the
+whole process over a bare interpreter, and which heavy backends
+(Selenium's WebDriver, requests, lxml, cryptography) the import loaded.
+
+Usage:
+    python benchmarks/bench_startup.py --repeat 5
+    python benchmarks/bench_startup.py --modules probe daemon --budget 150
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MODULES = ["course_registration_bot", "probe", "http_engine", "daemon", "scheduler",
+                   "multi_account", "type_scanner", "notifier", "state_store"]
+
+# Top-level modules that mark a heavy backend as loaded
+BACKENDS = {
+    "selenium": "selenium.webdriver.remote.webdriver",
+    "requests": "requests",
+    "lxml": "lxml.etree",
+    "cryptography": "cryptography.fernet",
+}
+
+REPORT_SCRIPT = "import json, sys; import {module}; print(json.dumps([name for name, marker in {backends!r} " \
+                "if marker in sys.modules]))"
+
+
+def run_python(args):
+    """Run the interpreter in the repository root; returns (wall seconds, stdout, stderr)."""
+    started = time.perf_counter()
+    completed = subprocess.run([sys.executable] + args, cwd=ROOT, capture_output=True, text=True,
+                               env=dict(os.environ, PYTHONDONTWRITEBYTECODE="1"))
+    elapsed = time.perf_counter() - started
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr else "import failed")
+    return elapsed, completed.stdout, completed.stderr
+
+
+def import_time_ms(module):
+    """Cumulative import time of `module` reported by -X importtime, in ms."""
+    _, _, stderr = run_python(["-X", "importtime", "-c", f"import {module}"])
+    for line in reversed(stderr.splitlines()):
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == module:
+            return int(parts[1]) / 1000
+    raise RuntimeError(f"No importtime line for {module}")
+
+
+def measure(module, repeat, baseline):
+    import_ms = [import_time_ms(module) for _ in range(repeat)]
+    wall_ms = [(run_python(["-c", f"import {module}"])[0] - baseline) * 1000 for _ in range(repeat)]
+    _, stdout, _ = run_python(["-c", REPORT_SCRIPT.format(module=module, backends=list(BACKENDS.items()))])
+    return {
+        "module": module,
+        "import_ms": round(statistics.median(import_ms), 1),
+        "wall_over_bare_ms": round(statistics.median(wall_ms), 1),
+        "backends": json.loads(stdout),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=None,
+                        help="Exit with status 1 if any module's import time exceeds this many ms")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    # Warm the bytecode and filesystem caches once so the first module is not penalised
+    for module in args.modules:
+        run_python(["-c", f"import {module}"])
+    baseline = statistics.median(run_python(["-c", "pass"])[0] for _ in range(args.repeat))
+
+    print(f"{'module':>24} | {'import ms':>9} | {'wall ms':>8} | backends loaded")
+    print("-" * 80)
+    results = []
+    for module in args.modules:
+        result = measure(module, args.repeat, baseline)
+        results.append(result)
+        print(f"{module:>24} | {result['import_ms']:>9.1f} | {result['wall_over_bare_ms']:>8.1f} | "
+              f"{', '.join(result['backends']) or '-'}")
+    print(f"\nBare interpreter: {baseline * 1000:.1f} ms (wall ms is on top of that)")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"baseline_ms": round(baseline * 1000, 1), "results": results}, f, indent=2)
+
+    over = [result for result in results if args.budget is not None and result["import_ms"] > args.budget]
+    for result in over:
+        print(f"Over budget: {result['module']} ({result['import_ms']} ms > {args.budget} ms)")
+    return 1 if over else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,83 @@
+"""
+MMU Student Portal - Configuration
+The portal URLs, engine and credentials a check runs with. Importing the
+bot modules reads nothing; entry points call load_env() first so a .env
+file is honoured, and library callers can build a BotConfig themselves:
+
+    config.set_config(BotConfig(portal_url="http://127.0.0.1:8085", engine="http"))
+    course_registration_bot.run_check("TEST/001/2024", "secret")
+"""
+
+import os
+import threading
+
+DEFAULT_PORTAL_URL = "https://studentportal.mmu.ac.ke"
+
+_env_loaded = False
+
+
+def load_env():
+    """Load .env into the environment once (variables already set win)."""
+    global _env_loaded
+    if _env_loaded:
+        return
+    _env_loaded = True
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        return
+    load_dotenv()
+
+
+class BotConfig:
+    """
+    Where and as whom to check.
+
+    Args:
+        portal_url: Portal base URL (default: $MMU_PORTAL_URL or the MMU portal)
+        engine: "selenium" or "http" (default: $MMU_ENGINE or selenium)
+        registration_number, password: Default account (default: $MMU_REG_NUMBER / $MMU_PASSWORD)
+        balance_url: Page showing the fee balance (default: $MMU_BALANCE_URL or the home page)
+    """
+
+    def __init__(self, portal_url=None, engine=None, registration_number=None, password=None, balance_url=None):
+        self.portal_url = (portal_url or os.getenv("MMU_PORTAL_URL") or DEFAULT_PORTAL_URL).rstrip("/")
+        self.engine = (engine or os.getenv("MMU_ENGINE") or "selenium").lower()
+        self.registration_number = registration_number or os.getenv("MMU_REG_NUMBER")
+        self.password = password or os.getenv("MMU_PASSWORD")
+        self.balance_url = balance_url or os.getenv("MMU_BALANCE_URL") or f"{self.portal_url}/Home.aspx"
+
+    @property
+    def login_url(self):
+        return f"{self.portal_url}/Student%20Login.aspx"
+
+    @property
+    def unit_registration_url(self):
+        return f"{self.portal_url}/UnitRegistration.aspx"
+
+    def has_credentials(self):
+        return bool(self.registration_number and self.password)
+
+    def __repr__(self):
+        return f"BotConfig(portal_url={self.portal_url!r}, engine={self.engine!r}, " \
+               f"registration_number={self.registration_number!r})"
+
+
+_config = None
+_config_lock = threading.Lock()
+
+
+def get_config():
+    """The configuration in use, read from the environment on first use."""
+    global _config
+    with _config_lock:
+        if _config is None:
+            _config = BotConfig()
+        return _config
+
+
+def set_config(config):
+    """Use `config` for every check in this process (None re-reads the environment)."""
+    global _config
+    with _config_lock:
+        _config = config
@@ -1,30 +1,56 @@
 """
 MMU Student Portal - Automated Course Registration Bot
 This script logs in, navigates to Unit Registration, and automatically registers for courses.
+
+Importing it has no side effects: Selenium, the HTTP engine and the lxml
+page parser (portal_parser) are only loaded when a check needs them, and
+settings come from config.get_config() (main() loads .env first).
 """
 
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import Select
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
-import time
+import argparse
+import json
 import os
-from dotenv import load_dotenv
+import time
+from datetime import datetime
 
-# Load environment variables from .env file
-load_dotenv()
+from balance import balance_enabled, read_balance_http, read_balance_in_browser
+from config import get_config, load_env
+from latency_history import defer_non_urgent, observe_spans
+from lean_profile import apply_lean_options, enable_request_blocking, lean_enabled, page_loads, record_page_load
+from locator_cache import locator_stats, run_strategies
+from probe import probe_enabled, run_probe
+from resilience import PortalUnavailable, retry
+from session_cache import SessionCache, cache_enabled
+from snapshot_store import save_snapshot
+from state_store import StateStore, state_enabled
+from structured_log import get_logger
+from timing import StageTimer, write_metrics
+from unit_catalog import catalog_dict
+from unit_extractor import collect_unit_candidates
+from unit_submitter import select_and_submit
+from waits import (
+    any_of,
+    checkbox_modal_rendered,
+    dom_ready,
+    element_present,
+    element_visible,
+    get_wait_engine,
+    is_ci,
+    linger,
+    staleness_of,
+    sweetalert_closed,
+    sweetalert_visible,
+    units_dropdown_populated,
+    url_changed,
+)
 
-# Configuration - Read from environment variables for security
-LOGIN_URL = "https://studentportal.mmu.ac.ke/Student%20Login.aspx"
-UNIT_REGISTRATION_URL = "https://studentportal.mmu.ac.ke/UnitRegistration.aspx"
-REGISTRATION_NUMBER = os.getenv("MMU_REG_NUMBER")
-PASSWORD = os.getenv("MMU_PASSWORD")
+log = get_logger()
+http_log = get_logger("http")
 
-# Validate that credentials are set
-if not REGISTRATION_NUMBER or not PASSWORD:
+def require_credentials():
+    """Exit with setup instructions if the credentials are not set."""
+    if get_config().has_credentials():
+        return
     print("=" * 80)
     print("ERROR: Credentials not found!")
     print("=" * 80)
@@ -38,9 +64,37 @@ if not REGISTRATION_NUMBER or not PASSWORD:
     print("\n" + "=" * 80)
     exit(1)
 
-def setup_driver(headless=False):
-    """Initialize and configure the Chrome WebDriver."""
+def parse_auto_register(value):
+    """
+    Parse an --auto-register / MMU_AUTO_REGISTER value.
+    
+    Returns None (manual mode), "all", or a list of 1-based unit numbers.
+    """
+    value = (value or "").strip().lower()
+    if not value or value in ("false", "no", "off", "0"):
+        return None
+    if value in ("all", "true", "yes"):
+        return "all"
+    try:
+        return [int(part) for part in value.replace(" ", "").split(",") if part]
+    except ValueError:
+        log.warning(f"Ignoring invalid auto-register value: {value}")
+        return None
+
+def setup_driver(headless=False, lean=None):
+    """
+    Initialize and configure the Chrome WebDriver.
+    
+    Args:
+        headless: Run Chrome without a window
+        lean: Use the lean profile (eager page loads, non-essential resources
+              blocked); defaults to MMU_LEAN_BROWSER
+    """
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    
     chrome_options = Options()
+    is_lean = lean_enabled() if lean is None else lean
     
     # Check for headless mode via argument or env var
     is_headless = headless or os.getenv("HEADLESS", "false").lower() == "true"
@@ -60,103 +114,234 @@ def setup_driver(headless=False):
     chrome_bin = os.getenv("CHROME_BIN") or os.getenv("CHROME_PATH")
     if chrome_bin:
         chrome_options.binary_location = chrome_bin
-        print(f"[INFO] Using Chrome binary at: {chrome_bin}")
+        log.info(f"Using Chrome binary at: {chrome_bin}")
 
     chrome_options.add_argument("--disable-blink-features=AutomationControlled")
     
+    if is_lean:
+        apply_lean_options(chrome_options)
+    
     try:
         from selenium.webdriver.chrome.service import Service
         service = None
         chromedriver_path = os.getenv("CHROMEDRIVER_PATH")
         
         if chromedriver_path:
-             print(f"[INFO] Using ChromeDriver at: {chromedriver_path}")
+             log.info(f"Using ChromeDriver at: {chromedriver_path}")
              service = Service(executable_path=chromedriver_path)
         
         if service:
             driver = webdriver.Chrome(service=service, options=chrome_options)
         else:
             driver = webdriver.Chrome(options=chrome_options)
+        
+        if is_lean:
+            enable_request_blocking(driver)
             
         return driver
     except Exception as e:
-        print(f"[ERROR] Failed to initialize WebDriver: {str(e)}")
+        log.error(f"Failed to initialize WebDriver: {str(e)}")
         import traceback
-        print(traceback.format_exc())
+        log.detail(traceback.format_exc())
+        return None
+
+# First text-or-password input and first password input, as the input scan picks them
+LOGIN_FIELD_SELECTORS = ["input[type='text'], input[type='password']", "input[type='password']"]
+
+def find_login_fields_css(driver, selectors=None):
+    """
+    Locate the registration and password fields with one CSS query each.
+    
+    Args:
+        driver: Selenium WebDriver instance
+        selectors: Learned [registration, password] selectors (default: LOGIN_FIELD_SELECTORS)
+    
+    Returns ((registration_field, password_field), selectors) or None. Without
+    learned selectors the fields' ids are read so the next run can target them.
+    """
+    from selenium.webdriver.common.by import By
+    
+    registration_fields = driver.find_elements(By.CSS_SELECTOR, (selectors or LOGIN_FIELD_SELECTORS)[0])
+    password_fields = driver.find_elements(By.CSS_SELECTOR, (selectors or LOGIN_FIELD_SELECTORS)[1])
+    if not registration_fields or not password_fields:
+        return None
+    fields = (registration_fields[0], password_fields[0])
+    if selectors is None:
+        ids = [field.get_attribute("id") for field in fields]
+        if all(ids) and not any("'" in field_id for field_id in ids):
+            selectors = [f"input[id='{field_id}']" for field_id in ids]
+        else:
+            selectors = list(LOGIN_FIELD_SELECTORS)
+    return fields, selectors
+
+def find_login_fields_scan(driver):
+    """Locate the login fields by reading the type of every input; returns ((registration_field, password_field), None) or None."""
+    from selenium.webdriver.common.by import By
+    
+    input_fields = driver.find_elements(By.TAG_NAME, "input")
+    text_inputs = [inp for inp in input_fields if inp.get_attribute("type") in ["text", "password"]]
+    password_inputs = [inp for inp in input_fields if inp.get_attribute("type") == "password"]
+    if not text_inputs or not password_inputs:
         return None
+    return (text_inputs[0], password_inputs[0]), None
 
-def login_to_portal(driver):
-    """Log into the MMU Student Portal."""
+def login_to_portal(driver, registration_number=None, password=None, raise_unavailable=False):
+    """
+    Log into the MMU Student Portal.
+    
+    Args:
+        driver: Selenium WebDriver instance
+        registration_number, password: Account to use (default: MMU_REG_NUMBER / MMU_PASSWORD)
+        raise_unavailable: Raise PortalUnavailable when the portal timed out or
+                           served a server error page instead of returning False,
+                           so a rejected password is not mistaken for an outage
+    """
+    from selenium.common.exceptions import TimeoutException
+    from selenium.webdriver.common.by import By
+    from portal_parser import is_server_error_page
+    from selenium.webdriver.support import expected_conditions as EC
+    
+    config = get_config()
+    registration_number = registration_number or config.registration_number
+    password = password or config.password
     try:
-        print(f"[INFO] Navigating to: {LOGIN_URL}")
-        driver.get(LOGIN_URL)
+        log.info(f"Navigating to: {config.login_url}")
+        driver.get(config.login_url)
         
-        wait = WebDriverWait(driver, 10)
+        waits = get_wait_engine(driver)
         
         # Click "Student Login" button
-        print("[INFO] Clicking 'Student Login' button...")
-        student_login_button = wait.until(
-            EC.element_to_be_clickable((By.ID, "ContentPlaceHolder1_btnStudentLogin"))
+        log.info("Clicking 'Student Login' button...")
+        student_login_button = waits.until(
+            "login_form",
+            EC.element_to_be_clickable((By.ID, "ContentPlaceHolder1_btnStudentLogin")),
+            name="student_login_button"
         )
         student_login_button.click()
-        time.sleep(2)
+        
+        # Wait for the login form to be shown
+        waits.until("login_form", element_visible(By.CSS_SELECTOR, "input[type='password']"), name="password_field")
         
         # Find and fill login fields
-        print("[INFO] Entering credentials...")
-        
-        # Registration field
-        registration_field = None
-        input_fields = driver.find_elements(By.TAG_NAME, "input")
-        text_inputs = [inp for inp in input_fields if inp.get_attribute("type") in ["text", "password"]]
-        if text_inputs:
-            registration_field = text_inputs[0]
-        
-        # Password field
-        password_field = None
-        password_inputs = [inp for inp in input_fields if inp.get_attribute("type") == "password"]
-        if password_inputs:
-            password_field = password_inputs[0]
-        
-        if not registration_field or not password_field:
-            print("[ERROR] Could not locate login form fields!")
+        log.info("Entering credentials...")
+        
+        # The strategy that found the fields last time is tried first (see locator_cache)
+        fields = run_strategies(driver, "login", [
+            ("css", lambda selectors: find_login_fields_css(driver, selectors)),
+            ("scan", lambda selectors: find_login_fields_scan(driver)),
+        ])
+        if not fields:
+            log.error("Could not locate login form fields!")
             return False
+        registration_field, password_field = fields
         
         registration_field.clear()
-        registration_field.send_keys(REGISTRATION_NUMBER)
+        registration_field.send_keys(registration_number)
         password_field.clear()
-        password_field.send_keys(PASSWORD)
-        time.sleep(1)
+        password_field.send_keys(password)
         
         # Submit
         submit_buttons = driver.find_elements(By.CSS_SELECTOR, "input[type='submit'], button[type='submit']")
         if submit_buttons:
-            print("[INFO] Clicking login button...")
+            log.info("Clicking login button...")
+            login_page_url = driver.current_url
             submit_buttons[0].click()
-            time.sleep(3)
+            # Wait until the portal leaves the login page or re-renders it
+            waits.until(
+                "login_submit",
+                any_of(url_changed=url_changed(login_page_url), postback=staleness_of(submit_buttons[0])),
+                name="login_response",
+                required=False
+            )
+            waits.until("login_submit", dom_ready, name="dom_ready", required=False)
         
         # Check login success
         current_url = driver.current_url
         if "Login" not in current_url:
-            print("[SUCCESS] Login successful!")
+            log.success("Login successful!")
+            record_page_load(driver, "login")
             return True
         else:
-            print("[WARNING] Login may have failed.")
+            if raise_unavailable and is_server_error_page(driver.page_source):
+                raise PortalUnavailable("login: server error page")
+            log.warning("Login may have failed.")
             return False
             
+    except PortalUnavailable:
+        raise
     except Exception as e:
-        print(f"[ERROR] Login failed: {e}")
+        log.error(f"Login failed: {e}")
+        if raise_unavailable and isinstance(e, TimeoutException):
+            raise PortalUnavailable(f"login: {e}") from e
         return False
 
+def restore_cached_session(driver, cache, registration_number=None, password=None):
+    """
+    Load cached portal cookies into the browser and check them with one
+    request to Unit Registration.
+    Returns True (and leaves the browser on that page) if the session is still valid.
+    """
+    from selenium.webdriver.common.by import By
+    
+    config = get_config()
+    registration_number = registration_number or config.registration_number
+    password = password or config.password
+    cookies = cache.load(registration_number, password)
+    if not cookies:
+        return False
+    
+    try:
+        log.info("Restoring cached session...")
+        for cookie in cookies:
+            params = {
+                "name": cookie["name"],
+                "value": cookie["value"],
+                "url": config.portal_url,
+                "path": cookie.get("path", "/"),
+                "secure": bool(cookie.get("secure", False)),
+                "httpOnly": bool(cookie.get("httpOnly", False))
+            }
+            if cookie.get("domain"):
+                params["domain"] = cookie["domain"]
+            # CDP sets cookies without first loading a page on the portal domain
+            driver.execute_cdp_cmd("Network.setCookie", params)
+        
+        driver.get(config.unit_registration_url)
+        if "Login" not in driver.current_url and driver.find_elements(By.ID, "Main__ddlRegFor"):
+            log.success("Reused cached session - skipping login")
+            record_page_load(driver, "unit_registration")
+            return True
+    except Exception as e:
+        log.warning(f"Could not restore cached session: {e}")
+    
+    log.info("Cached session has expired, logging in again")
+    cache.invalidate(registration_number)
+    driver.delete_all_cookies()
+    return False
+
+def save_session(cookies, cache, registration_number=None, password=None):
+    """Store the authenticated cookies for the next run."""
+    try:
+        config = get_config()
+        cache.store(registration_number or config.registration_number, password or config.password, cookies)
+    except Exception as e:
+        log.warning(f"Could not save session cache: {e}")
+
 def navigate_to_unit_registration(driver):
     """Navigate to the Unit Registration page."""
+    from selenium.webdriver.common.by import By
+    
     try:
-        print(f"\n[INFO] Navigating to Unit Registration page...")
-        driver.get(UNIT_REGISTRATION_URL)
-        time.sleep(3)
-        print(f"[SUCCESS] On Unit Registration page")
+        log.info("Navigating to Unit Registration page...")
+        driver.get(get_config().unit_registration_url)
+        waits = get_wait_engine(driver)
+        waits.until("navigation", dom_ready, name="dom_ready")
+        waits.until("navigation", element_present(By.ID, "Main__ddlRegFor"), name="registration_type_dropdown", required=False)
+        log.success("On Unit Registration page")
+        record_page_load(driver, "unit_registration")
         return True
     except Exception as e:
-        print(f"[ERROR] Failed to navigate: {e}")
+        log.error(f"Failed to navigate: {e}")
         return False
 
 def select_registration_type(driver, reg_type="Course Registration"):
@@ -167,30 +352,32 @@ def select_registration_type(driver, reg_type="Course Registration"):
         driver: Selenium WebDriver instance
         reg_type: Type of registration - "Course Registration", "Supplementary", or "Retake"
     """
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import Select
+    
+    from portal_parser import REGISTRATION_TYPE_VALUES
+    
     try:
-        print(f"\n[INFO] Selecting registration type: {reg_type}")
+        log.info(f"Selecting registration type: {reg_type}")
         
         # Find the registration type dropdown
-        dropdown = Select(driver.find_element(By.ID, "Main__ddlRegFor"))
-        
-        # Map registration type to value
-        reg_type_map = {
-            "Course Registration": "0",
-            "Supplementary": "2",
-            "Retake": "3"
-        }
-        
-        if reg_type in reg_type_map:
-            dropdown.select_by_value(reg_type_map[reg_type])
-            print(f"[SUCCESS] Selected: {reg_type}")
-            time.sleep(1)
+        dropdown_element = driver.find_element(By.ID, "Main__ddlRegFor")
+        dropdown = Select(dropdown_element)
+        
+        if reg_type in REGISTRATION_TYPE_VALUES:
+            auto_postback = "__doPostBack" in (dropdown_element.get_attribute("onchange") or "")
+            dropdown.select_by_value(REGISTRATION_TYPE_VALUES[reg_type])
+            if auto_postback:
+                # The dropdown reloads the page when changed
+                get_wait_engine(driver).page_load("registration_type", old_element=dropdown_element)
+            log.success(f"Selected: {reg_type}")
             return True
         else:
-            print(f"[ERROR] Invalid registration type: {reg_type}")
+            log.error(f"Invalid registration type: {reg_type}")
             return False
             
     except Exception as e:
-        print(f"[ERROR] Could not select registration type: {e}")
+        log.error(f"Could not select registration type: {e}")
         return False
 
 def click_get_units_button(driver):
@@ -205,258 +392,265 @@ def click_get_units_button(driver):
     - 'technical_error': Technical issue or unknown error
     - None: No error (success)
     """
+    from selenium.webdriver.common.by import By
+    
+    from portal_parser import parse_get_units_response
+    
     try:
-        print("\n[INFO] Clicking 'Get Units To Register' button...")
+        log.info("Clicking 'Get Units To Register' button...")
         
         button = driver.find_element(By.ID, "Main__btnRegister")
         button.click()
         
-        print("[SUCCESS] Button clicked, checking for errors or loading units...")
-        time.sleep(3)  # Wait for response
+        log.success("Button clicked, checking for errors or loading units...")
         
-        error_title = ""
-        error_content = ""
+        # Wait for the postback to finish, then for its outcome to render
+        waits = get_wait_engine(driver)
+        waits.until(
+            "get_units",
+            any_of(postback=staleness_of(button), alert=sweetalert_visible),
+            name="get_units_response",
+            required=False
+        )
+        waits.until("get_units", dom_ready, name="dom_ready", required=False)
+        waits.until(
+            "get_units_render",
+            any_of(alert=sweetalert_visible, units_dropdown=units_dropdown_populated,
+                   checkbox_modal=checkbox_modal_rendered),
+            name="get_units_outcome",
+            required=False
+        )
+        # Time-to-submit for auto-registration is measured from here
+        driver._mmu_units_seen_at = time.perf_counter()
+        record_page_load(driver, "get_units")
         
-        # Check for SweetAlert error messages (common on this portal)
-        try:
-            # Look for SweetAlert modal
-            swal_modal = driver.find_element(By.CSS_SELECTOR, ".swal2-modal[style*='display: block'], .swal2-modal[aria-hidden='false']")
+        # Categorize from the rendered page with the shared HTML parser
+        page_source = driver.page_source
+        success, error_category, full_message = parse_get_units_response(page_source)
+        
+        if not success:
+            save_snapshot(page_source, f"get_units_{error_category}", reason=full_message)
             
-            if swal_modal:
-                # Extract error title
-                try:
-                    error_title = driver.find_element(By.CSS_SELECTOR, ".swal2-modal h2").text
-                except:
-                    error_title = ""
-                
-                # Extract error content
-                try:
-                    error_content = driver.find_element(By.CSS_SELECTOR, ".swal2-modal .swal2-content").text
-                except:
-                    error_content = ""
-                
-                if error_title or error_content:
-                    full_message = f"{error_title}\n\n{error_content}".strip()
-                    
-                    # Print the message
-                    print("\n" + "=" * 80)
-                    print("📋 MESSAGE FROM PORTAL")
-                    print("=" * 80)
-                    if error_title:
-                        print(f"\n{error_title}")
-                    if error_content:
-                        print(f"\n{error_content}")
-                    print("\n" + "=" * 80)
-                    
-                    # Categorize the message
-                    message_lower = full_message.lower()
-                    error_category = None
-                    
-                    if "already" in message_lower and "registered" in message_lower:
-                        error_category = "already_registered"
-                        print("\n✅ Status: Already Registered")
-                        print("[INFO] You have already registered units for this semester")
-                    elif "payment" in message_lower or "pay" in message_lower or "fee" in message_lower:
-                        error_category = "payment_required"
-                        print("\n💰 Status: Payment Required")
-                        print("[ACTION] You need to complete payment before registering")
-                    elif "closed" in message_lower or "not allowed" in message_lower or "disabled" in message_lower:
-                        error_category = "registration_closed"
-                        print("\n🔒 Status: Registration Not Allowed")
-                        print("[INFO] Registration is currently closed or not yet open")
-                    else:
-                        error_category = "technical_error"
-                        print("\n⚠️ Status: Portal Message/Error")
-                        print("[INFO] Check the message above for details")
-                    
-                    print("=" * 80)
-                    
-                    # Close the alert
-                    try:
-                        close_button = driver.find_element(By.CSS_SELECTOR, ".swal2-confirm, .swal2-close")
-                        time.sleep(1)
-                        close_button.click()
-                        time.sleep(1)
-                    except:
-                        pass
-                    
-                    return (False, error_category, full_message)
-        except NoSuchElementException:
-            # No SweetAlert, check for other error types
-            pass
-        
-        # Check for page-level error messages
-        try:
-            error_divs = driver.find_elements(By.CSS_SELECTOR, ".alert-danger, .error-message, [style*='color: red'], [style*='color:red']")
-            for error_div in error_divs:
-                error_text = error_div.text.strip()
-                if error_text and len(error_text) > 10:
-                    print("\n" + "=" * 80)
-                    print("⚠️  ERROR MESSAGE DETECTED")
-                    print("=" * 80)
-                    print(f"\n{error_text}\n")
-                    print("=" * 80)
-                    return (False, "technical_error", error_text)
-        except:
-            pass
-        
-        time.sleep(2)  # Additional wait for modal or page to load
+            # Print the message
+            log.detail("\n" + "=" * 80)
+            log.detail("📋 MESSAGE FROM PORTAL")
+            log.detail("=" * 80)
+            log.detail(f"\n{full_message}")
+            log.detail("\n" + "=" * 80)
+            
+            if error_category == "already_registered":
+                log.detail("\n✅ Status: Already Registered")
+                log.info("You have already registered units for this semester")
+            elif error_category == "payment_required":
+                log.detail("\n💰 Status: Payment Required")
+                log.info("You need to complete payment before registering")
+            elif error_category == "registration_closed":
+                log.detail("\n🔒 Status: Registration Not Allowed")
+                log.info("Registration is currently closed or not yet open")
+            else:
+                log.detail("\n⚠️ Status: Portal Message/Error")
+                log.info("Check the message above for details")
+            
+            log.detail("=" * 80)
+            
+            # Close the alert, if the message came from one
+            try:
+                if sweetalert_visible(driver):
+                    close_button = driver.find_element(By.CSS_SELECTOR, ".swal2-confirm, .swal2-close")
+                    close_button.click()
+                    waits.until("alert_close", sweetalert_closed, name="alert_closed", required=False)
+            except Exception:
+                pass
+            
+            return (False, error_category, full_message)
+        
         return (True, None, None)
         
     except Exception as e:
-        print(f"[ERROR] Could not click button: {e}")
+        log.error(f"Could not click button: {e}")
         return (False, "technical_error", str(e))
 
-def extract_available_units(driver):
-    """Extract and display available units from the modal or page."""
+def extract_available_units(driver, reg_type=None):
+    """
+    Extract and display available units from the modal or page.
+    
+    Args:
+        driver: Selenium WebDriver instance
+        reg_type: Registration type the units are for (keys the learned locator)
+    """
     try:
-        print("\n" + "=" * 80)
-        print("AVAILABLE UNITS FOR REGISTRATION")
-        print("=" * 80)
+        log.detail("\n" + "=" * 80)
+        log.detail("AVAILABLE UNITS FOR REGISTRATION")
+        log.detail("=" * 80)
         
         units_found = False
         
+        # One round trip collects the candidates of every strategy below
+        candidates = collect_unit_candidates(driver, reg_type)
+        
         # Strategy 1: Look for units in dropdowns
-        try:
-            unit_dropdown_element = driver.find_element(By.ID, "Main__ddlUnits")
-            unit_dropdown = Select(unit_dropdown_element)
-            
-            units = []
-            for option in unit_dropdown.options:
-                if option.text.strip() and option.text.strip() not in ["", "--Select--"]:
-                    units.append({
-                        'text': option.text.strip(),
-                        'value': option.get_attribute('value')
-                    })
+        units = candidates["dropdown"]
+        if units:
+            units_found = True
+            log.info(f"{len(units)} units available in dropdown:")
+            for i, unit in enumerate(units, 1):
+                log.detail(f"  {i}. {unit['text']}")
             
-            if units:
-                units_found = True
-                print(f"\n[FOUND] {len(units)} units available in dropdown:")
-                for i, unit in enumerate(units, 1):
-                    print(f"  {i}. {unit['text']}")
-                
-                print("\n" + "✅" * 40)
-                print("✅  UNITS CAN BE REGISTERED!")
-                print("✅  Use the dropdown to select and add units")
-                print("✅" * 40)
-                return units
-                
-        except NoSuchElementException:
-            pass
+            log.detail("\n" + "✅" * 40)
+            log.detail("✅  UNITS CAN BE REGISTERED!")
+            log.detail("✅  Use the dropdown to select and add units")
+            log.detail("✅" * 40)
+            return units
         
         # Strategy 2: Look for checkboxes (main indicator of registrable units)
-        try:
-            # Look in modal first
-            modal_checkboxes = driver.find_elements(By.CSS_SELECTOR, "#myModalCourseRegister input[type='checkbox']")
+        if candidates["checkbox_count"]:
+            units_found = True
+            log.info(f"{candidates['checkbox_count']} selectable units (checkboxes)")
             
-            if not modal_checkboxes:
-                # Look in page
-                modal_checkboxes = driver.find_elements(By.CSS_SELECTOR, "input[type='checkbox']")
+            units = candidates["checkboxes"]
+            for unit in units:
+                log.detail(f"  ☑️  {unit['text']}")
             
-            if modal_checkboxes:
-                units_found = True
-                print(f"\n[FOUND] {len(modal_checkboxes)} selectable units (checkboxes)")
-                
-                units = []
-                for cb in modal_checkboxes:
-                    try:
-                        # Get unit info from nearby elements
-                        parent = cb.find_element(By.XPATH, "..")
-                        
-                        # Try to find label
-                        try:
-                            label = parent.find_element(By.TAG_NAME, "label")
-                            unit_text = label.text.strip()
-                        except:
-                            unit_text = parent.text.strip()
-                        
-                        # Also check table row if checkbox is in a table
-                        try:
-                            row = cb.find_element(By.XPATH, "ancestor::tr")
-                            cells = row.find_elements(By.TAG_NAME, "td")
-                            if cells:
-                                row_text = " | ".join([cell.text.strip() for cell in cells if cell.text.strip()])
-                                if row_text:
-                                    unit_text = row_text
-                        except:
-                            pass
-                        
-                        if unit_text and len(unit_text) > 3:
-                            units.append({'element': cb, 'text': unit_text})
-                            print(f"  ☑️  {unit_text}")
-                    except:
-                        continue
-                
-                if units:
-                    print("\n" + "✅" * 40)
-                    print("✅  UNITS CAN BE REGISTERED!")
-                    print(f"✅  {len(units)} units available for selection")
-                    print("✅  Check the boxes for units you want to register")
-                    print("✅  Then click 'Submit Registration' button")
-                    print("✅" * 40)
-                    return units
-        except Exception as e:
-            print(f"[DEBUG] Checkbox detection error: {e}")
+            if units:
+                log.detail("\n" + "✅" * 40)
+                log.detail("✅  UNITS CAN BE REGISTERED!")
+                log.detail(f"✅  {len(units)} units available for selection")
+                log.detail("✅  Check the boxes for units you want to register")
+                log.detail("✅  Then click 'Submit Registration' button")
+                log.detail("✅" * 40)
+                return units
         
         # Strategy 3: Look for units in tables
-        try:
-            tables = driver.find_elements(By.TAG_NAME, "table")
+        table = candidates["table"]
+        if table:
+            units_found = True
+            log.info(f"Units table with {table['row_count']-1} units:")
+            
+            # Print header
+            log.detail(f"\n{table['header']}")
+            log.detail("-" * 80)
             
-            for table in tables:
-                rows = table.find_elements(By.TAG_NAME, "tr")
-                if len(rows) > 1:
-                    header_text = rows[0].text.lower() if rows else ""
-                    
-                    if any(keyword in header_text for keyword in ['unit', 'course', 'code']):
-                        units_found = True
-                        print(f"\n[FOUND] Units table with {len(rows)-1} units:")
-                        
-                        # Print header
-                        header_cells = rows[0].find_elements(By.TAG_NAME, "th")
-                        if not header_cells:
-                            header_cells = rows[0].find_elements(By.TAG_NAME, "td")
-                        
-                        header = " | ".join([cell.text.strip() for cell in header_cells])
-                        print(f"\n{header}")
-                        print("-" * 80)
-                        
-                        # Print units
-                        for row in rows[1:11]:  # First 10 units
-                            cells = row.find_elements(By.TAG_NAME, "td")
-                            row_text = " | ".join([cell.text.strip() for cell in cells if cell.text.strip()])
-                            if row_text:
-                                print(f"{row_text}")
-                        
-                        if len(rows) > 11:
-                            print(f"... and {len(rows) - 11} more units")
-                        
-                        break
-        except:
-            pass
+            # Print units (first 10)
+            for row_text in table["rows"]:
+                if row_text:
+                    log.detail(f"{row_text}")
+            
+            if table["row_count"] > 11:
+                log.detail(f"... and {table['row_count'] - 11} more units")
         
         if not units_found:
-            print("\n❌ No units found")
-            print("[INFO] This could mean:")
-            print("  - No units available for this registration type")
-            print("  - Registration not allowed (check error messages above)")
-            print("  - Units need to be loaded differently")
-        
-        # Save page source for debugging
-        print("\n[INFO] Saving current page source for inspection...")
-        try:
-            with open("registration_units_page.html", "w", encoding="utf-8") as f:
-                f.write(driver.page_source)
-            print("[SUCCESS] Page source saved to 'registration_units_page.html'")
-        except Exception as e:
-            print(f"[WARNING] Could not save page source: {e}")
+            log.detail("\n❌ No units found")
+            log.info("This could mean:")
+            log.detail("  - No units available for this registration type")
+            log.detail("  - Registration not allowed (check error messages above)")
+            log.detail("  - Units need to be loaded differently")
+        
+        # Keep the page for inspection (only stored again when it changes)
+        save_snapshot(driver.page_source, "no_units")
         
         return []
         
     except Exception as e:
-        print(f"[ERROR] Error extracting units: {e}")
+        log.error(f"Error extracting units: {e}")
         return []
 
-def register_for_units(driver, unit_indices=None, auto_register_all=False):
+def submission_result(units, dry_run=False):
+    """Return an empty auto-registration result for the chosen units."""
+    return {
+        "status": "error",
+        "dry_run": dry_run,
+        "units": [u['text'] for u in units],
+        "category": None,
+        "message": "",
+        "time_to_submit_seconds": None,
+        "time_to_confirm_seconds": None
+    }
+
+def print_submission_result(result):
+    """Print the outcome of an auto-registration."""
+    log.detail("\n" + "=" * 80)
+    log.detail("📋 REGISTRATION RESULT")
+    log.detail("=" * 80)
+    log.detail(f"\n{result['message']}")
+    if result["status"] == "registered":
+        log.detail(f"\n🎉 Status: Registered for {len(result['units'])} units")
+    elif result["status"] == "dry_run":
+        log.detail(f"\n🧪 Status: Dry run - {len(result['units'])} units selected, nothing submitted")
+    else:
+        log.detail("\n⚠️ Status: Registration not confirmed")
+    if result["time_to_submit_seconds"] is not None:
+        log.info(f"Time to submit: {result['time_to_submit_seconds']}s after the units appeared")
+    log.detail("=" * 80)
+
+def submit_registration(driver, units, unit_indices=None, dry_run=False):
+    """
+    Select units, click 'Submit Registration' and confirm the result from
+    the portal's response.
+    
+    Args:
+        driver: Selenium WebDriver instance
+        units: Units returned by extract_available_units()
+        unit_indices: Units to register (1-indexed), or None for all of them
+        dry_run: Select the units but do not submit
+    
+    Returns a dict with status ('registered', 'rejected', 'dry_run' or
+    'error'), the portal message and the time from the units appearing to
+    the submit click (and to the portal's confirmation).
+    """
+    from portal_parser import parse_registration_response, pick_units
+    
+    seen_at = getattr(driver, "_mmu_units_seen_at", None) or time.perf_counter()
+    chosen = pick_units(units, unit_indices)
+    result = submission_result(chosen, dry_run)
+    if not chosen:
+        result["message"] = "No units selected for registration"
+        log.warning(result["message"])
+        return result
+    
+    log.info(f"{'Dry run - selecting' if dry_run else 'Registering for'} {len(chosen)} units...")
+    try:
+        selection = select_and_submit(driver, chosen, dry_run)
+    except Exception as e:
+        result["message"] = f"Could not select units: {e}"
+        log.error(result["message"])
+        return result
+    if selection["error"] or selection["button"] is None:
+        result["message"] = selection["error"] or "Submit Registration button not found"
+        log.error(result["message"])
+        return result
+    result["time_to_submit_seconds"] = round(time.perf_counter() - seen_at, 3)
+    
+    if dry_run:
+        result["status"] = "dry_run"
+        result["message"] = f"{selection['selected']} units selected; registration was not submitted"
+        print_submission_result(result)
+        return result
+    
+    # Wait for the postback, then for the portal's confirmation alert
+    waits = get_wait_engine(driver)
+    waits.until(
+        "registration_submit",
+        any_of(postback=staleness_of(selection["button"]), alert=sweetalert_visible),
+        name="registration_response",
+        required=False
+    )
+    waits.until("registration_submit", dom_ready, name="dom_ready", required=False)
+    waits.until("registration_submit", sweetalert_visible, name="registration_outcome",
+                timeout=waits.timeouts.get("get_units_render"), required=False)
+    
+    page_source = driver.page_source
+    registered, category, message = parse_registration_response(page_source)
+    if not registered:
+        save_snapshot(page_source, f"registration_{category}", reason=message)
+    result["time_to_confirm_seconds"] = round(time.perf_counter() - seen_at, 3)
+    result["status"] = "registered" if registered else "rejected"
+    result["category"] = category
+    result["message"] = message
+    print_submission_result(result)
+    return result
+
+def register_for_units(driver, unit_indices=None, auto_register_all=False, review=True, units=None,
+                       dry_run=False):
     """
     Register for units.
     
@@ -464,189 +658,657 @@ def register_for_units(driver, unit_indices=None, auto_register_all=False):
         driver: Selenium WebDriver instance
         unit_indices: List of unit indices to register (1-indexed), or None for manual selection
         auto_register_all: If True, automatically register for all available units
+        review: If False, never keep the browser open for manual selection
+        units: Units already extracted from the page (extracted here if None)
+        dry_run: Select the units but do not submit the registration
+    
+    Returns the list of available units (empty if none were found).
     """
     try:
-        units = extract_available_units(driver)
+        if units is None:
+            units = extract_available_units(driver)
         
         if not units:
-            print("\n[WARNING] No units available for registration")
-            return False
+            log.warning("No units available for registration")
+            return []
         
         if auto_register_all:
-            print(f"\n[INFO] Auto-registering for ALL {len(units)} units...")
-            # Implementation depends on page structure
-            # This is a placeholder - actual implementation would select all checkboxes or add all from dropdown
+            log.info(f"Auto-registering for ALL {len(units)} units...")
+            submit_registration(driver, units, dry_run=dry_run)
+            return units
             
         elif unit_indices:
-            print(f"\n[INFO] Registering for selected units: {unit_indices}")
-            # Implementation would select specific units
+            log.info(f"Registering for selected units: {unit_indices}")
+            submit_registration(driver, units, unit_indices, dry_run=dry_run)
+            return units
             
         else:
-            print("\n[INFO] Manual mode - please review units above")
-            print("[INFO] Browser will remain open for manual selection")
-            print("[INFO] Press Ctrl+C when done")
-            time.sleep(300)  # 5 minutes for manual selection
-            return True
+            log.info("Manual mode - please review units above")
+            log.info("Check the boxes for the units you want and click 'Submit Registration'")
+            if review:
+                linger(300, 300, "Browser will remain open for {seconds} seconds for manual selection - press Ctrl+C when done")
+            return units
+            
+    except Exception as e:
+        log.error(f"Registration error: {e}")
+        return [] # Return empty list on error
+
+def record_portal_message(output_data, error_category, error_message):
+    """
+    Fill output_data from a failed 'Get Units' result.
+
+    When the account balance was read (output_data["balance"]) it decides
+    between 'payment_required' and the other categories.
+    """
+    from portal_parser import categorize_portal_message
+    
+    balance = output_data.get("balance")
+    if balance and error_category in ("payment_required", "technical_error"):
+        refined = categorize_portal_message(error_message, balance)
+        if refined != error_category:
+            log.info(f"Account balance {balance['currency']} {balance['amount']:,.2f} - "
+                     f"treating '{error_category}' as '{refined}'")
+            error_category = refined
+    
+    if error_category == "already_registered":
+        output_data["status"] = "already_registered"
+        output_data["message"] = "You have already registered units for this semester"
+        output_data["error"] = error_message
+        log.info("✅ You have already registered for this semester", extra={"category": error_category})
+    elif error_category == "payment_required":
+        output_data["status"] = "payment_required"
+        output_data["message"] = "Payment required before registration"
+        if balance and balance["amount"] > 0:
+            output_data["message"] += f" (balance {balance['currency']} {balance['amount']:,.2f})"
+        output_data["error"] = error_message
+        log.info("💰 Payment is required before you can register", extra={"category": error_category})
+    elif error_category == "registration_closed":
+        output_data["status"] = "registration_closed"
+        output_data["message"] = "Registration is not currently allowed"
+        output_data["error"] = error_message
+        log.info("🔒 Registration is currently closed", extra={"category": error_category})
+    else:
+        output_data["status"] = "error"
+        output_data["message"] = "Could not load units for registration"
+        output_data["error"] = error_message or "Unknown error occurred"
+        log.info("⚠️ An error occurred", extra={"category": error_category})
+
+def record_units(output_data, units):
+    """
+    Fill output_data with the extracted units: their display strings under
+    "units" and the parsed records under "catalog" (see unit_catalog).
+    """
+    output_data["status"] = "success"
+    output_data["message"] = f"Found {len(units)} units available for registration"
+    output_data["units"] = [u if isinstance(u, str) else u.get('text', str(u)) for u in units]
+    output_data["catalog"] = catalog_dict(units)
+
+def record_portal_unavailable(output_data, error):
+    """Fill output_data for a check abandoned because the portal kept failing."""
+    output_data["status"] = "error"
+    output_data["message"] = "The portal is not responding - it may be overloaded"
+    output_data["error"] = str(error)
+
+def run_http_check(reg_type, output_data, registration_number=None, password=None, rate_limiter=None,
+                   timer=None, auto_register=None, dry_run=False, defer=False):
+    """
+    Run the check with the browserless HTTP engine.
+
+    Returns True when output_data holds a result, or False when the engine
+    could not complete the flow and the Selenium engine should take over.
+    Each step is recorded as an "http_*" span on `timer`. With `defer`, the
+    balance read is left for a quiet hour.
+    """
+    from http_engine import HttpEngineError, HttpPortalSession
+    from portal_parser import pick_units
+
+    config = get_config()
+    registration_number = registration_number or config.registration_number
+    password = password or config.password
+    session = HttpPortalSession(config.login_url, config.unit_registration_url, rate_limiter=rate_limiter)
+    cache = SessionCache() if cache_enabled() else None
+    timer = timer or StageTimer()
+    try:
+        cookies = cache.load(registration_number, password) if cache else None
+        session_restored = False
+        if cookies:
+            with timer.span("http_session_restore") as span:
+                session_restored = session.resume_session(cookies)
+                span["outcome"] = "ok" if session_restored else "miss"
+        if cookies and not session_restored:
+            http_log.info("Cached session has expired, logging in again")
+            cache.invalidate(registration_number)
+        output_data["session_reused"] = session_restored
         
-        # Look for submit button
-        try:
-            submit_button = driver.find_element(By.ID, "Main__btnRegisterCourse")
-            print("\n[INFO] Found 'Submit Registration' button")
-            print("[WARNING] Auto-submission is DISABLED for safety")
-            print("[INFO] Please review selections and click 'Submit Registration' manually")
-            time.sleep(60)  # Wait for manual submission
+        if not session_restored:
+            with timer.span("http_login") as span:
+                if not session.login(registration_number, password):
+                    span["outcome"] = "failed"
+                    return False
+            # Right after login, while the landing page may show the balance
+            if balance_enabled() and not (defer and defer_non_urgent("balance check")):
+                with timer.span("http_balance") as span:
+                    output_data["balance"] = read_balance_http(session, config.balance_url)
+                    if not output_data["balance"]:
+                        span["outcome"] = "not_found"
+            with timer.span("http_navigation") as span:
+                if not session.navigate_to_unit_registration():
+                    span["outcome"] = "failed"
+                    return False
+        if cache and not session_restored:
+            save_session(session.export_cookies(), cache, registration_number, password)
+        if session_restored and balance_enabled() and not (defer and defer_non_urgent("balance check")):
+            with timer.span("http_balance") as span:
+                output_data["balance"] = read_balance_http(session, config.balance_url)
+                if not output_data["balance"]:
+                    span["outcome"] = "not_found"
+        with timer.span("http_registration_type") as span:
+            if not session.select_registration_type(reg_type):
+                span["outcome"] = "failed"
+                return False
+
+        with timer.span("http_get_units") as span:
+            success, error_category, error_message = session.click_get_units_button()
+            if not success:
+                span["outcome"] = error_category
+        if not success:
+            record_portal_message(output_data, error_category, error_message)
             return True
-        except NoSuchElementException:
-            print("[WARNING] Submit button not found")
+
+        with timer.span("http_extraction") as span:
+            units = session.extract_available_units()
+            if not units:
+                span["outcome"] = "no_units"
+        if not units:
+            # Units may be rendered by scripts the HTTP engine does not run
             return False
-            
+
+        units_seen_at = time.perf_counter()
+
+        record_units(output_data, units)
+        
+        if auto_register:
+            chosen = pick_units(units, None if auto_register == "all" else auto_register)
+            submission = submission_result(chosen, dry_run)
+            with timer.span("http_submission") as span:
+                try:
+                    registered, category, message = session.submit_registration(chosen, dry_run)
+                    submission["time_to_submit_seconds"] = round(session.submitted_at - units_seen_at, 3)
+                    submission["status"] = "dry_run" if dry_run else ("registered" if registered else "rejected")
+                    submission["category"] = category
+                    submission["message"] = message
+                    if not dry_run:
+                        submission["time_to_confirm_seconds"] = round(time.perf_counter() - units_seen_at, 3)
+                except HttpEngineError as e:
+                    submission["message"] = str(e)
+                    http_log.error(str(e))
+                span["outcome"] = submission["status"]
+            output_data["registration"] = submission
+            print_submission_result(submission)
+        return True
+    except PortalUnavailable as e:
+        # Falling back to the browser would only add to the overload
+        http_log.error(f"Portal unavailable: {e}")
+        record_portal_unavailable(output_data, e)
+        return True
     except Exception as e:
-        print(f"[ERROR] Registration error: {e}")
-        return [] # Return empty list on error
+        http_log.error(f"Unexpected error: {e}")
+        return False
+    finally:
+        session.close()
 
-def main():
-    """Main execution function."""
-    driver = None
-    output_data = {
+def new_output():
+    """Return an empty result in the registration_output.json schema."""
+    return {
         "status": "unknown",
         "message": "",
         "units": [],
         "error": None
     }
+
+def defer_allowed(auto_register=None, now=None):
+    """
+    Whether a check may leave non-urgent work for a quiet hour: never when
+    it registers automatically or inside the opening window
+    ($MMU_OPEN_WINDOW, as read by scheduler.py).
+    """
+    if auto_register:
+        return False
+    window = os.getenv("MMU_OPEN_WINDOW")
+    if not window:
+        return True
+    from scheduler import OpeningWindow
     
     try:
-        print("===" * 27)
-        print("MMU STUDENT PORTAL - AUTOMATED COURSE REGISTRATION BOT")
-        print("===" * 27)
-        print("\nThis bot will:")
-        print("1. Log into the student portal")
-        print("2. Navigate to Unit Registration")
-        print("3. Select 'Course Registration' type")
-        print("4. Load available units")
-        print("5. Display units for your review")
-        print("\n" + "===" * 27)
-        
-        # Automatically use "Course Registration" as the registration type
-        selected_reg_type = "Course Registration"
-        print(f"\n[INFO] Registration Type: {selected_reg_type}")
-        
-        # Detect if running in GitHub Actions or CI environment
-        is_ci = os.getenv("CI") == "true" or os.getenv("GITHUB_ACTIONS") == "true"
-        headless_mode = is_ci
-        
-        if is_ci:
-            print("[INFO] Running in CI/GitHub Actions mode (headless)")
-        else:
-            print("[INFO] Running in local mode (with browser UI)")
+        return not OpeningWindow.parse(window).contains(now or datetime.now())
+    except ValueError:
+        # Unreadable window: assume it may be open
+        return False
+
+def deferred_result(registration_number, reg_type):
+    """
+    The stored result to reuse instead of checking now, or None.
+    
+    An account that has already registered has nothing waiting, so during
+    an hour the latency history marks as busy its last result is reused,
+    unless it is older than $MMU_DEFER_MAX_HOURS (default 24).
+    """
+    if not state_enabled() or not defer_non_urgent("already-registered re-check"):
+        return None
+    try:
+        with StateStore() as store:
+            previous = store.latest(registration_number, reg_type)
+    except Exception as e:
+        log.warning(f"Could not read the state store: {e}")
+        return None
+    if not previous or previous["status"] != "already_registered":
+        return None
+    try:
+        age = time.time() - datetime.strptime(previous["updated_at"], "%Y-%m-%dT%H:%M:%S%z").timestamp()
+    except ValueError:
+        return None
+    if age > float(os.getenv("MMU_DEFER_MAX_HOURS", "24")) * 3600:
+        return None
+    return previous
+
+def run_check(registration_number=None, password=None, reg_type="Course Registration",
+              engine=None, headless=None, review=True, rate_limiter=None, auto_register=None,
+              dry_run=False, probe=None, driver_pool=None, defer=False):
+    """
+    Run one registration check for an account and return its result.
+    
+    Args:
+        registration_number, password: Account to check (default: MMU_REG_NUMBER / MMU_PASSWORD)
+        reg_type: "Course Registration", "Supplementary", or "Retake"
+        engine: "selenium" or "http" (default: $MMU_ENGINE)
+        headless: Run Chrome headless (default: in CI only)
+        review: Keep the browser open for manual review when done
+        rate_limiter: Shared limiter acquired before each portal request
+        auto_register: Submit a registration as soon as units appear -
+                       "all" or a list of 1-based unit numbers (default: off)
+        dry_run: With auto_register, select the units but do not submit
+        probe: Fetch only the 'Get Units' response first and return the stored
+               result if it has not changed (default: $MMU_PROBE)
+        driver_pool: DriverPool to borrow a started browser from (and hand it
+                     back to) instead of starting and quitting one
+        defer: In hours the latency history marks as busy, reuse an
+               already-registered result and skip the balance read - for
+               cron and one-shot runs, never with auto_register or inside
+               the opening window (see defer_allowed)
+    
+    Returns a dict in the registration_output.json schema.
+    """
+    config = get_config()
+    registration_number = registration_number or config.registration_number
+    password = password or config.password
+    engine = engine or config.engine
+    headless = is_ci() if headless is None else headless
+    throttle = rate_limiter.acquire if rate_limiter else (lambda: None)
+    probe = probe_enabled() if probe is None else probe
+    defer = defer and defer_allowed(auto_register)
+    
+    driver = None
+    driver_broken = False
+    output_data = new_output()
+    timer = StageTimer()
+    probe_result = None
+    
+    try:
+        # Nothing is waiting on an account that has registered - keep busy hours for the checks that matter
+        previous = deferred_result(registration_number, reg_type) if defer else None
+        if previous:
+            for key in ("status", "message", "units", "error"):
+                output_data[key] = previous.get(key, output_data[key])
+            if previous.get("catalog") is not None:
+                output_data["catalog"] = previous["catalog"]
+            # Keeps its original time, so the deferral cannot outlive MMU_DEFER_MAX_HOURS
+            output_data["checked_at"] = previous["updated_at"]
+            output_data["engine"] = "deferred"
+            if previous.get("fingerprint"):
+                output_data["probe"] = {"changed": False, "fingerprint": previous["fingerprint"]}
+            return output_data
+        
+        # Cheap change check: one 'Get Units' response over the cached session
+        if probe:
+            with timer.span("probe") as span:
+                probe_result = run_probe(config.login_url, config.unit_registration_url, registration_number, password,
+                                         reg_type, rate_limiter=rate_limiter)
+                if probe_result is None:
+                    span["outcome"] = "failed"
+                else:
+                    span["outcome"] = "changed" if probe_result["changed"] else "unchanged"
+            if probe_result and not probe_result["changed"]:
+                previous = probe_result["previous"]
+                # Units that are still waiting to be registered need the full flow
+                if not (auto_register and previous.get("status") == "success"):
+                    log.info("Portal response unchanged since the last check - skipping the full check")
+                    for key in ("status", "message", "units", "error"):
+                        output_data[key] = previous.get(key, output_data[key])
+                    if previous.get("catalog") is not None:
+                        output_data["catalog"] = previous["catalog"]
+                    output_data["engine"] = "probe"
+                    return output_data
+        
+        # Try the browserless engine first when requested
+        if engine == "http":
+            log.info("Using HTTP engine")
+            if run_http_check(reg_type, output_data, registration_number, password, rate_limiter, timer,
+                              auto_register, dry_run, defer):
+                output_data["engine"] = "http"
+                return output_data
+            log.warning("HTTP engine could not complete the check, falling back to Selenium...")
+            output_data = new_output()
+        output_data["engine"] = "selenium"
         
         # Setup browser
-        driver = setup_driver(headless=headless_mode)
+        with timer.span("driver_startup") as span:
+            driver = driver_pool.acquire() if driver_pool else setup_driver(headless=headless)
+            if driver is None:
+                span["outcome"] = "failed"
+                raise RuntimeError("Could not start the browser")
+        timer.attach(driver)
         
-        # Step 1: Login
-        if not login_to_portal(driver):
-            print("\n[ERROR] Login failed. Exiting...")
-            output_data["status"] = "error"
-            output_data["error"] = "Login failed - Please check credentials"
-            output_data["message"] = "Unable to log into the MMU Student Portal"
-            return
+        # Step 1: Login (skipped while a cached session is still valid)
+        cache = SessionCache() if cache_enabled() else None
+        session_restored = False
+        if cache:
+            throttle()
+            with timer.span("session_restore") as span:
+                session_restored = restore_cached_session(driver, cache, registration_number, password)
+                span["outcome"] = "ok" if session_restored else "miss"
+        output_data["session_reused"] = session_restored
         
-        # Step 2: Navigate
-        if not navigate_to_unit_registration(driver):
-            print("\n[ERROR] Navigation failed. Exiting...")
-            output_data["status"] = "error"
-            output_data["error"] = "Navigation failed"
-            output_data["message"] = "Could not navigate to Unit Registration page"
-            return
+        if not session_restored:
+            throttle()
+            with timer.span("login") as span:
+                # Through the breaker so the outcome is recorded, but never retried. Only
+                # timeouts and error pages count against the portal - a rejected password
+                # is an answer, or a sweep with one bad account would open the breaker
+                try:
+                    logged_in = retry("login", lambda: login_to_portal(driver, registration_number, password,
+                                                                       raise_unavailable=True), retries=0)
+                except PortalUnavailable as e:
+                    log.error(f"Portal unavailable: {e}")
+                    span["outcome"] = "failed"
+                    record_portal_unavailable(output_data, e)
+                    return output_data
+                if not logged_in:
+                    span["outcome"] = "failed"
+            if span["outcome"] != "ok":
+                log.error("Login failed. Exiting...")
+                output_data["status"] = "error"
+                output_data["error"] = "Login failed - Please check credentials"
+                output_data["message"] = "Unable to log into the MMU Student Portal"
+                return output_data
+        
+        # A restored session is already cached; only a fresh login is worth encrypting again
+        if cache and not session_restored:
+            save_session(driver.get_cookies(), cache, registration_number, password)
+        
+        # Account balance, in this session (from the landing page when it shows it)
+        if balance_enabled() and not (defer and defer_non_urgent("balance check")):
+            throttle()
+            with timer.span("balance") as span:
+                output_data["balance"] = read_balance_in_browser(driver, config.balance_url)
+                if not output_data["balance"]:
+                    span["outcome"] = "not_found"
+        
+        # Step 2: Navigate (a restored session is already on the page)
+        if not session_restored:
+            throttle()
+            with timer.span("navigation") as span:
+                if not retry("navigation", lambda: navigate_to_unit_registration(driver),
+                             is_failure=lambda ok: not ok):
+                    span["outcome"] = "failed"
+            if span["outcome"] != "ok":
+                log.error("Navigation failed. Exiting...")
+                output_data["status"] = "error"
+                output_data["error"] = "Navigation failed"
+                output_data["message"] = "Could not navigate to Unit Registration page"
+                return output_data
         
         # Step 3: Select registration type
-        if not select_registration_type(driver, selected_reg_type):
-            print("\n[ERROR] Could not select registration type. Exiting...")
+        throttle()
+        with timer.span("registration_type") as span:
+            if not select_registration_type(driver, reg_type):
+                span["outcome"] = "failed"
+        if span["outcome"] != "ok":
+            log.error("Could not select registration type. Exiting...")
             output_data["status"] = "error"
             output_data["error"] = "Registration type selection failed"
-            output_data["message"] = "Could not select Course Registration type"
-            return
-        
+            output_data["message"] = f"Could not select {reg_type} type"
+            return output_data
         
         # Step 4: Click button to load units
-        success, error_category, error_message = click_get_units_button(driver)
+        from portal_parser import is_server_error_page
+        
+        throttle()
+        with timer.span("get_units") as span:
+            # Not retried (the page has moved on), but error pages count towards the circuit breaker
+            success, error_category, error_message = retry(
+                "get_units", lambda: click_get_units_button(driver), retries=0,
+                is_failure=lambda result: not result[0] and is_server_error_page(driver.page_source)
+            )
+            if not success:
+                span["outcome"] = error_category or "failed"
         
         if not success:
             # Categorize the response based on error type
-            if error_category == "already_registered":
-                output_data["status"] = "already_registered"
-                output_data["message"] = "You have already registered units for this semester"
-                output_data["error"] = error_message
-                print("\n✅ You have already registered for this semester")
-            elif error_category == "payment_required":
-                output_data["status"] = "payment_required"
-                output_data["message"] = "Payment required before registration"
-                output_data["error"] = error_message
-                print("\n💰 Payment is required before you can register")
-            elif error_category == "registration_closed":
-                output_data["status"] = "registration_closed"
-                output_data["message"] = "Registration is not currently allowed"
-                output_data["error"] = error_message
-                print("\n🔒 Registration is currently closed")
-            else:
-                output_data["status"] = "error"
-                output_data["message"] = "Could not load units for registration"
-                output_data["error"] = error_message or "Unknown error occurred"
-                print("\n⚠️ An error occurred")
+            record_portal_message(output_data, error_category, error_message)
             
-            print("[INFO] Check the message above for full details")
+            log.info("Check the message above for full details")
             
-            # Shorter wait time in CI mode
-            wait_time = 10 if is_ci else 60
-            print(f"\n[INFO] Browser will remain open for {wait_time} seconds for manual review...")
-            time.sleep(wait_time)
-            return
+            # Shorter wait time in CI mode (MMU_LINGER_SECONDS=0 skips it)
+            if review:
+                linger(60, 10, "Browser will remain open for {seconds} seconds for manual review...")
+            return output_data
         
         # Step 5: Display units and allow registration
-        print("\n" + "=" * 80)
-        print("UNITS LOADED - READY FOR REGISTRATION")
-        print("=" * 80)
+        log.detail("\n" + "=" * 80)
+        log.detail("UNITS LOADED - READY FOR REGISTRATION")
+        log.detail("=" * 80)
         
-        units = register_for_units(driver, auto_register_all=False)
+        with timer.span("extraction") as span:
+            units = extract_available_units(driver, reg_type)
+            if not units:
+                span["outcome"] = "no_units"
+        if auto_register and units:
+            unit_indices = None if auto_register == "all" else auto_register
+            with timer.span("submission") as span:
+                submission = submit_registration(driver, units, unit_indices, dry_run)
+                span["outcome"] = submission["status"]
+            output_data["registration"] = submission
+        else:
+            units = register_for_units(driver, auto_register_all=False, review=review, units=units)
         
         # Save units to output
         if units:
-            output_data["status"] = "success"
-            output_data["message"] = f"Found {len(units)} units available for registration"
-            output_data["units"] = [u if isinstance(u, str) else u.get('text', str(u)) for u in units] if units else []
+            record_units(output_data, units)
         else:
             output_data["status"] = "no_units"
             output_data["message"] = "No units found available for registration"
         
-        print("\n[INFO] Registration process complete!")
+        log.info("Registration process complete!")
         
-        # Shorter wait time in CI mode
-        wait_time = 5 if is_ci else 30
-        print(f"[INFO] Browser will remain open for {wait_time} seconds...")
-        time.sleep(wait_time)
+        # Shorter wait time in CI mode (MMU_LINGER_SECONDS=0 skips it)
+        if review:
+            linger(30, 5, "Browser will remain open for {seconds} seconds...")
+        return output_data
         
     except KeyboardInterrupt:
-        print("\n\n[INFO] Script interrupted by user.")
+        log.info("Script interrupted by user.")
         output_data["status"] = "interrupted"
         output_data["message"] = "Script interrupted by user"
+        return output_data
     except Exception as e:
-        print(f"\n[ERROR] An error occurred: {e}")
+        log.error(f"An error occurred: {e}")
         output_data["status"] = "error"
         output_data["error"] = str(e)
         output_data["message"] = "An unexpected error occurred"
+        driver_broken = True
+        if driver:
+            try:
+                save_snapshot(driver.page_source, "unexpected_error", reason=str(e))
+            except Exception:
+                pass
+        return output_data
     finally:
         if driver:
-            print("\n[INFO] Closing browser...")
-            driver.quit()
-            print("[INFO] Done!")
+            output_data["waits"] = get_wait_engine(driver).records
+            if page_loads(driver):
+                output_data["page_loads"] = page_loads(driver)
+            if locator_stats(driver):
+                output_data["locators"] = locator_stats(driver)
+            if driver_pool:
+                with timer.span("teardown"):
+                    driver_pool.release(driver, broken=driver_broken)
+            else:
+                log.info("Closing browser...")
+                with timer.span("teardown"):
+                    driver.quit()
+                log.info("Done!")
+        output_data["timings"] = timer.spans
+        observe_spans(timer.spans)
+        log.info(f"Check finished: {output_data['status']} in {timer.total_seconds()}s",
+                 extra={"account": registration_number, "reg_type": reg_type, "status": output_data["status"],
+                        "engine": output_data.get("engine"), "units": len(output_data["units"]),
+                        "latency_ms": round(timer.total_seconds() * 1000)})
+        if probe_result:
+            output_data["probe"] = {"changed": output_data.get("engine") != "probe",
+                                    "fingerprint": probe_result["fingerprint"]}
+
+def result_fingerprint(output_data):
+    """The probe fingerprint to store with a result, or None when it is not a real portal answer."""
+    # Only fingerprints of real portal answers may let the next probe skip a check
+    if output_data.get("status") in ("error", "unknown", "interrupted"):
+        return None
+    return (output_data.get("probe") or {}).get("fingerprint")
+
+def record_result(output_data, registration_number=None, reg_type="Course Registration", store=None):
+    """
+    Record a result in the state store and add what changed since the
+    previous check under output_data["changes"]. Never raises.
+    """
+    if not state_enabled():
+        return None
+    registration_number = registration_number or get_config().registration_number
+    fingerprint = result_fingerprint(output_data)
+    try:
+        if store is not None:
+            changes = store.record(registration_number, reg_type, output_data, fingerprint)
+        else:
+            with StateStore() as store:
+                changes = store.record(registration_number, reg_type, output_data, fingerprint)
+    except Exception as e:
+        log.warning(f"Could not record result in the state store: {e}")
+        return None
+    output_data["changes"] = changes
+    if changes["changed"]:
+        log.info(f"Change since last check: {changes['reason']}")
+    else:
+        log.info("No change since the last check")
+    return changes
+
+def write_output(output_data, path="registration_output.json"):
+    """Write a run result to JSON for GitHub Actions."""
+    try:
+        with open(path, "w") as f:
+            json.dump(output_data, f, indent=2)
+        log.info(f"Output saved to {path}")
+    except Exception as e:
+        log.warning(f"Could not save output file: {e}")
+
+def main(argv=None):
+    """Main execution function."""
+    load_env()
+    parser = argparse.ArgumentParser(description="MMU Student Portal course registration bot")
+    parser.add_argument("--engine", choices=["selenium", "http"], default=get_config().engine,
+                        help="Portal engine to use (default: $MMU_ENGINE or selenium)")
+    parser.add_argument("--daemon", action="store_true", default=os.getenv("MMU_DAEMON", "false").lower() == "true",
+                        help="Keep a logged-in browser open and re-check every interval")
+    parser.add_argument("--interval", type=float, default=None,
+                        help="Daemon: seconds between checks (default: $MMU_LOGIN_INTERVAL minutes)")
+    parser.add_argument("--max-browser-age", type=float, default=float(os.getenv("MMU_BROWSER_MAX_AGE", "21600")),
+                        help="Daemon: recycle the browser after this many seconds")
+    parser.add_argument("--max-browser-rss", type=float, default=float(os.getenv("MMU_BROWSER_MAX_RSS_MB", "1024")),
+                        help="Daemon: recycle the browser above this much memory (MB)")
+    parser.add_argument("--auto-register", default=os.getenv("MMU_AUTO_REGISTER"),
+                        help="Submit the registration as soon as units appear: 'all' or unit numbers like '1,3,5'")
+    parser.add_argument("--dry-run", action="store_true", default=os.getenv("MMU_DRY_RUN", "false").lower() == "true",
+                        help="With --auto-register, select the units but do not submit")
+    parser.add_argument("--probe", action="store_true", default=probe_enabled(),
+                        help="Skip the full check when the portal's response has not changed since the last run")
+    parser.add_argument("--reg-types", default=os.getenv("MMU_REG_TYPES"),
+                        help="Check several registration types on one login: 'all' or names like "
+                             "'Course Registration,Retake' (default: Course Registration)")
+    args = parser.parse_args(argv)
+    auto_register = parse_auto_register(args.auto_register)
+    
+    reg_types = ["Course Registration"]
+    if args.reg_types:
+        from type_scanner import parse_reg_types
         
-        # Write output to JSON file for GitHub Actions
         try:
-            import json
-            with open("registration_output.json", "w") as f:
-                json.dump(output_data, f, indent=2)
-            print(f"[INFO] Output saved to registration_output.json")
-        except Exception as e:
-            print(f"[WARNING] Could not save output file: {e}")
+            reg_types = parse_reg_types(args.reg_types)
+        except ValueError as e:
+            log.error(str(e))
+            return
+    
+    require_credentials()
+    
+    if args.daemon:
+        from daemon import BrowserDaemon, default_interval
+        
+        daemon = BrowserDaemon(
+            interval=args.interval or default_interval(),
+            max_age=args.max_browser_age,
+            max_rss_mb=args.max_browser_rss,
+            headless=is_ci() or os.getenv("HEADLESS", "false").lower() == "true",
+            auto_register=auto_register,
+            dry_run=args.dry_run
+        )
+        daemon.run()
+        return
+    
+    log.detail("===" * 27)
+    log.detail("MMU STUDENT PORTAL - AUTOMATED COURSE REGISTRATION BOT")
+    log.detail("===" * 27)
+    log.detail("\nThis bot will:")
+    log.detail("1. Log into the student portal")
+    log.detail("2. Navigate to Unit Registration")
+    log.detail(f"3. Select {', '.join(repr(reg_type) for reg_type in reg_types)} type")
+    log.detail("4. Load available units")
+    log.detail("5. Display units for your review")
+    log.detail("\n" + "===" * 27)
+    
+    # "Course Registration" unless --reg-types / MMU_REG_TYPES says otherwise
+    selected_reg_type = reg_types[0]
+    log.info(f"Registration Type: {', '.join(reg_types)}")
+    
+    # Detect if running in GitHub Actions or CI environment
+    if is_ci():
+        log.info("Running in CI/GitHub Actions mode (headless)")
+    else:
+        log.info("Running in local mode (with browser UI)")
+    
+    if auto_register:
+        target = "ALL units" if auto_register == "all" else f"units {auto_register}"
+        log.info(f"Auto-registration: {target}{' (dry run)' if args.dry_run else ''}")
+    
+    if len(reg_types) > 1:
+        from type_scanner import record_scan, run_scan
+        
+        if auto_register or args.probe:
+            log.warning("--auto-register and --probe apply to single-type checks; scanning only")
+        output_data = run_scan(reg_types, engine=args.engine)
+        record_scan(output_data)
+    else:
+        # A one-shot (cron) run is the place for deferring non-urgent work; the sniper and daemon never defer
+        output_data = run_check(reg_type=selected_reg_type, engine=args.engine,
+                                auto_register=auto_register, dry_run=args.dry_run, probe=args.probe, defer=True)
+        record_result(output_data, reg_type=selected_reg_type)
+    write_output(output_data)
+    write_metrics(output_data)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,276 @@
+"""
+MMU Student Portal - Warm-browser daemon
+Keeps one logged-in browser on the Unit Registration page and re-runs only
+the registration-type select and the 'Get Units' postback every interval,
+logging in again when the session is lost and recycling the browser after
+an age or memory limit.
+
+Usage:
+    python course_registration_bot.py --daemon --interval 300
+"""
+
+import os
+import time
+
+import course_registration_bot as bot
+from balance import balance_enabled, read_balance_in_browser
+from config import get_config
+from driver_pool import browser_rss_mb
+from latency_history import get_latency_history, observe_spans
+from locator_cache import locator_stats
+from notifier import get_notifier, notify_enabled
+from session_cache import SessionCache, cache_enabled
+from structured_log import get_logger
+from timing import StageTimer, write_metrics
+
+log = get_logger("daemon")
+
+
+class SessionExpired(Exception):
+    """A postback landed on the login page instead of Unit Registration."""
+
+
+class BrowserDaemon:
+    """
+    Long-running poller around a single warm browser.
+
+    Args:
+        interval: Seconds between checks
+        reg_type: Registration type to check
+        max_age: Recycle the browser after this many seconds
+        max_rss_mb: Recycle the browser when it uses more memory than this
+        headless: Run Chrome headless
+        output_path: Where each check's result is written
+        auto_register: Submit a registration as soon as units appear -
+                       "all" or a list of 1-based unit numbers (default: off)
+        dry_run: With auto_register, select the units but do not submit
+        notify: Email each change (default: $MMU_NOTIFY); with MMU_DIGEST_WINDOW
+                the changes of that period are sent as one digest
+    """
+
+    def __init__(self, interval=2700, reg_type="Course Registration", max_age=6 * 60 * 60,
+                 max_rss_mb=1024, headless=True, output_path="registration_output.json",
+                 auto_register=None, dry_run=False, notify=None):
+        self.interval = interval
+        self.reg_type = reg_type
+        self.max_age = max_age
+        self.max_rss_mb = max_rss_mb
+        self.headless = headless
+        self.output_path = output_path
+        self.auto_register = auto_register
+        self.dry_run = dry_run
+        self.notifier = get_notifier() if (notify_enabled() if notify is None else notify) else None
+        self.cache = SessionCache() if cache_enabled() else None
+
+        self.driver = None
+        self.browser_started = 0.0
+        self.check_count = 0
+
+    # --- browser lifecycle ----------------------------------------------
+
+    def start_browser(self):
+        log.info("Starting browser...")
+        self.driver = bot.setup_driver(headless=self.headless)
+        if self.driver is None:
+            raise RuntimeError("Could not start the browser")
+        self.browser_started = time.monotonic()
+        self.authenticate()
+
+    def stop_browser(self):
+        if self.driver:
+            log.info("Closing browser...")
+            try:
+                self.driver.quit()
+            except Exception as e:
+                log.warning(f"Error while closing browser: {e}")
+        self.driver = None
+
+    def authenticate(self):
+        """Log in (or reuse the cached session) and open Unit Registration."""
+        restored = bool(self.cache) and bot.restore_cached_session(self.driver, self.cache)
+        if not restored:
+            if not bot.login_to_portal(self.driver):
+                raise RuntimeError("Login failed - Please check credentials")
+            if not bot.navigate_to_unit_registration(self.driver):
+                raise RuntimeError("Could not navigate to Unit Registration page")
+            if self.cache:
+                bot.save_session(self.driver.get_cookies(), self.cache)
+
+    def recycle_reason(self):
+        """Why the browser should be replaced, or None."""
+        age = time.monotonic() - self.browser_started
+        if self.max_age and age > self.max_age:
+            return f"age {age / 60:.0f} min"
+        rss = browser_rss_mb(self.driver)
+        if self.max_rss_mb and rss > self.max_rss_mb:
+            return f"memory {rss:.0f} MB"
+        return None
+
+    def session_lost(self):
+        """Whether the portal sent us back to the login form."""
+        from selenium.webdriver.common.by import By
+
+        return "Login" in self.driver.current_url or \
+            bool(self.driver.find_elements(By.CSS_SELECTOR, "input[type='password']"))
+
+    def relogin(self):
+        """Drop the expired session and log in again."""
+        log.info("Session lost, logging in again...")
+        if self.cache:
+            self.cache.invalidate(get_config().registration_number)
+        self.driver.delete_all_cookies()
+        self.authenticate()
+
+    def ensure_registration_page(self):
+        """Make sure we are logged in and on Unit Registration, re-logging in if the session was lost."""
+        from selenium.webdriver.common.by import By
+
+        if self.driver.current_url.startswith(get_config().unit_registration_url) and \
+                self.driver.find_elements(By.ID, "Main__ddlRegFor"):
+            return
+        bot.navigate_to_unit_registration(self.driver)
+        if self.session_lost() or not self.driver.find_elements(By.ID, "Main__ddlRegFor"):
+            self.relogin()
+
+    def check_session(self, step):
+        """Raise SessionExpired if the postback for `step` ended on the login page."""
+        if self.session_lost():
+            raise SessionExpired(f"Session expired during {step}")
+
+    # --- polling --------------------------------------------------------
+
+    def poll(self):
+        """Run one check on the warm browser and return its result."""
+        output_data = bot.new_output()
+        output_data["engine"] = "selenium"
+        timer = StageTimer()
+        timer.attach(self.driver)
+        output_data["timings"] = timer.spans
+
+        with timer.span("navigation"):
+            self.ensure_registration_page()
+        with timer.span("registration_type") as span:
+            if not bot.select_registration_type(self.driver, self.reg_type):
+                # The page may be covered by a modal from the last check
+                bot.navigate_to_unit_registration(self.driver)
+                self.ensure_registration_page()
+                if not bot.select_registration_type(self.driver, self.reg_type):
+                    span["outcome"] = "failed"
+            self.check_session("registration type selection")
+        if span["outcome"] != "ok":
+            output_data["status"] = "error"
+            output_data["error"] = "Registration type selection failed"
+            output_data["message"] = f"Could not select {self.reg_type} type"
+            return output_data
+
+        with timer.span("get_units") as span:
+            success, error_category, error_message = bot.click_get_units_button(self.driver)
+            if not success:
+                span["outcome"] = error_category or "failed"
+            # An expired session shows up as a redirect, not as a portal message
+            self.check_session("Get Units")
+        if not success:
+            # The warm browser logged in long ago, so read the balance when it matters
+            if balance_enabled():
+                with timer.span("balance") as span:
+                    output_data["balance"] = read_balance_in_browser(self.driver, get_config().balance_url)
+                    if not output_data["balance"]:
+                        span["outcome"] = "not_found"
+            bot.record_portal_message(output_data, error_category, error_message)
+        else:
+            with timer.span("extraction"):
+                units = bot.extract_available_units(self.driver, self.reg_type)
+            if units:
+                bot.record_units(output_data, units)
+                if self.auto_register:
+                    unit_indices = None if self.auto_register == "all" else self.auto_register
+                    with timer.span("submission") as span:
+                        submission = bot.submit_registration(self.driver, units, unit_indices, self.dry_run)
+                        span["outcome"] = submission["status"]
+                    output_data["registration"] = submission
+            else:
+                output_data["status"] = "no_units"
+                output_data["message"] = "No units found available for registration"
+        # Navigation is usually a no-op on the warm browser, so only the postback says how the portal is doing
+        observe_spans(timer.spans, stages=("get_units",))
+        # Counted since the previous poll on this browser
+        if locator_stats(self.driver):
+            output_data["locators"] = locator_stats(self.driver, reset=True)
+        return output_data
+
+    def check(self):
+        """
+        Run one check on the warm browser (starting or recycling it first),
+        write the result and return it. Never raises.
+        """
+        started = time.monotonic()
+        try:
+            if self.driver is not None:
+                reason = self.recycle_reason()
+                if reason:
+                    log.info(f"Recycling browser ({reason})")
+                    self.stop_browser()
+            if self.driver is None:
+                self.start_browser()
+
+            try:
+                output_data = self.poll()
+            except SessionExpired as e:
+                # Log in again and poll once more rather than record the login page as a result
+                log.warning(f"{e}, retrying the check after logging in again")
+                self.relogin()
+                output_data = self.poll()
+        except Exception as e:
+            log.error(f"Check failed: {e}")
+            output_data = bot.new_output()
+            output_data["status"] = "error"
+            output_data["error"] = str(e)
+            output_data["message"] = "An unexpected error occurred"
+            # Start from a fresh browser next time
+            self.stop_browser()
+
+        self.check_count += 1
+        output_data["check_number"] = self.check_count
+        output_data["checked_at"] = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+        output_data["check_seconds"] = round(time.monotonic() - started, 3)
+        changes = bot.record_result(output_data, reg_type=self.reg_type)
+        bot.write_output(output_data, self.output_path)
+        if self.notifier and changes and changes["changed"]:
+            self.notifier.notify(output_data, reg_type=self.reg_type, changes=changes)
+        write_metrics(output_data)
+        # A long-running process should not keep its latencies to itself until it exits
+        history = get_latency_history()
+        if history:
+            history.save()
+        log.info(f"Check #{self.check_count}: {output_data['status']} "
+                 f"in {output_data['check_seconds']}s",
+                 extra={"account": get_config().registration_number, "reg_type": self.reg_type,
+                        "status": output_data["status"], "check_number": self.check_count,
+                        "latency_ms": round(output_data["check_seconds"] * 1000)})
+        return output_data
+
+    def run(self, max_checks=None):
+        """Poll until interrupted (or for `max_checks` checks)."""
+        log.info(f"Checking '{self.reg_type}' every {self.interval}s "
+                 f"(recycle after {self.max_age}s or {self.max_rss_mb} MB)")
+        try:
+            while max_checks is None or self.check_count < max_checks:
+                started = time.monotonic()
+                self.check()
+
+                if max_checks is None or self.check_count < max_checks:
+                    time.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+        except KeyboardInterrupt:
+            log.info("Stopped by user.")
+        finally:
+            self.stop_browser()
+            if self.notifier:
+                self.notifier.close()
+
+
+def default_interval():
+    """Seconds between checks, from MMU_LOGIN_INTERVAL (minutes, default 45)."""
+    try:
+        return float(os.getenv("MMU_LOGIN_INTERVAL", "45")) * 60
+    except ValueError:
+        return 45 * 60
@@ -0,0 +1,286 @@
+"""
+MMU Student Portal - Browser pool
+Keeps started browsers and hands them out again, so a batch of checks pays
+the Chrome and chromedriver startup once per browser instead of once per
+account. Between accounts a browser is wiped (cookies, storage, extra
+windows) and health-checked; it is replaced after a number of uses or when
+it grows past a memory limit, and the pool as a whole stays under a memory
+cap.
+
+    pool = DriverPool(lambda: bot.setup_driver(headless=True), size=4)
+    pool.warm()
+    result = bot.run_check(reg_number, password, driver_pool=pool)
+    pool.close()
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import psutil
+
+from structured_log import get_logger
+
+log = get_logger("pool")
+
+# Per-check state other modules keep on the driver object
+CHECK_ATTRIBUTES = ("_mmu_wait_engine", "_mmu_page_loads", "_mmu_units_seen_at", "_mmu_locator_stats")
+
+CLEAR_STORAGE_SCRIPT = """
+try { window.localStorage && window.localStorage.clear(); } catch (e) {}
+try { window.sessionStorage && window.sessionStorage.clear(); } catch (e) {}
+"""
+
+
+def browser_rss_mb(driver):
+    """Resident memory of chromedriver and every browser process it started, in MB."""
+    try:
+        process = psutil.Process(driver.service.process.pid)
+        processes = [process] + process.children(recursive=True)
+    except (AttributeError, psutil.Error):
+        return 0.0
+
+    total = 0
+    for proc in processes:
+        try:
+            total += proc.memory_info().rss
+        except psutil.Error:
+            continue
+    return total / (1024 * 1024)
+
+
+def pool_enabled():
+    """Whether multi-account runs reuse browsers (MMU_BROWSER_POOL, default true)."""
+    return os.getenv("MMU_BROWSER_POOL", "true").lower() == "true"
+
+
+def is_healthy(driver):
+    """Whether the browser still answers commands."""
+    try:
+        return driver.execute_script("return 1") == 1
+    except Exception:
+        return False
+
+
+def reset_driver(driver):
+    """
+    Leave the browser as a fresh one would be: one blank window and no
+    cookies or web storage from the previous account. Returns False if the
+    browser could not be reset.
+    """
+    try:
+        handles = driver.window_handles
+        for handle in handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(handles[0])
+
+        driver.execute_script(CLEAR_STORAGE_SCRIPT)
+        url = urlsplit(driver.current_url)
+        try:
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+            if url.scheme in ("http", "https"):
+                driver.execute_cdp_cmd("Storage.clearDataForOrigin", {
+                    "origin": f"{url.scheme}://{url.netloc}", "storageTypes": "all"
+                })
+        except Exception:
+            # Not a Chromium driver: only the current site's cookies can be removed
+            driver.delete_all_cookies()
+        driver.get("about:blank")
+    except Exception as e:
+        log.debug(f"Could not reset browser: {e}")
+        return False
+    for attribute in CHECK_ATTRIBUTES:
+        driver.__dict__.pop(attribute, None)
+    return True
+
+
+class DriverPool:
+    """
+    A bounded pool of started browsers.
+
+    Args:
+        factory: Callable starting a new driver (None when it fails)
+        size: Most browsers alive at once (default: $MMU_CONCURRENCY, 4)
+        max_uses: Replace a browser after this many checks (default: $MMU_BROWSER_MAX_USES, 20)
+        max_rss_mb: Replace a browser using more memory than this
+                    (default: $MMU_BROWSER_MAX_RSS_MB, 1024)
+        max_total_mb: Memory cap for all browsers together; no new browser
+                      is started above it (default: $MMU_BROWSER_POOL_MAX_MB, 0 = no cap)
+    """
+
+    def __init__(self, factory, size=None, max_uses=None, max_rss_mb=None, max_total_mb=None):
+        self.factory = factory
+        self.size = max(1, int(size or os.getenv("MMU_CONCURRENCY", "4")))
+        self.max_uses = int(max_uses if max_uses is not None else os.getenv("MMU_BROWSER_MAX_USES", "20"))
+        self.max_rss_mb = float(max_rss_mb if max_rss_mb is not None else os.getenv("MMU_BROWSER_MAX_RSS_MB", "1024"))
+        self.max_total_mb = float(max_total_mb if max_total_mb is not None
+                                  else os.getenv("MMU_BROWSER_POOL_MAX_MB", "0"))
+        # id(driver) -> {"driver", "uses", "started"}
+        self.entries = {}
+        self.idle = []
+        self.starting = 0
+        self.closed = False
+        self.condition = threading.Condition()
+        # Counters for the end-of-run summary
+        self.started = 0
+        self.reused = 0
+        self.recycled = 0
+
+    # --- bookkeeping ----------------------------------------------------
+
+    def _alive(self):
+        return len(self.entries) + self.starting
+
+    def total_rss_mb(self):
+        with self.condition:
+            drivers = [entry["driver"] for entry in self.entries.values()]
+        return sum(browser_rss_mb(driver) for driver in drivers)
+
+    def _over_memory_cap(self):
+        """Whether starting another browser would go past max_total_mb."""
+        if not self.max_total_mb or not self.entries:
+            return False
+        total = self.total_rss_mb()
+        return total + total / len(self.entries) > self.max_total_mb
+
+    def _start(self):
+        """Start one browser (the caller has counted it in `starting`)."""
+        started = time.perf_counter()
+        driver = None
+        try:
+            driver = self.factory()
+        finally:
+            with self.condition:
+                self.starting -= 1
+                if driver is not None:
+                    self.entries[id(driver)] = {"driver": driver, "uses": 0, "started": time.monotonic()}
+                    self.started += 1
+                self.condition.notify_all()
+        if driver is not None:
+            log.debug(f"Browser started in {time.perf_counter() - started:.1f}s")
+        return driver
+
+    def _retire(self, driver, reason):
+        with self.condition:
+            self.entries.pop(id(driver), None)
+            self.recycled += 1
+            self.condition.notify_all()
+        log.info(f"Replacing browser ({reason})")
+        try:
+            driver.quit()
+        except Exception as e:
+            log.warning(f"Error while closing browser: {e}")
+
+    # --- public API -----------------------------------------------------
+
+    def warm(self, count=None):
+        """Start browsers up front, in parallel, so the first checks do not wait for them."""
+        with self.condition:
+            count = min(self.size - self._alive(), self.size if count is None else count)
+            count = max(0, count)
+            self.starting += count
+        if not count:
+            return 0
+
+        log.info(f"Starting {count} browser(s)...")
+        with ThreadPoolExecutor(max_workers=count) as executor:
+            drivers = list(executor.map(lambda _: self._start(), range(count)))
+        with self.condition:
+            self.idle.extend(driver for driver in drivers if driver is not None)
+            self.condition.notify_all()
+        return sum(1 for driver in drivers if driver is not None)
+
+    def acquire(self):
+        """
+        A healthy browser with a clean profile, started if none is idle.
+        Blocks while every browser is in use. Returns None if a new
+        browser could not be started.
+        """
+        while True:
+            start = False
+            with self.condition:
+                while True:
+                    if self.closed:
+                        raise RuntimeError("The browser pool is closed")
+                    if self.idle:
+                        driver = self.idle.pop()
+                        break
+                    if self._alive() < self.size and not self._over_memory_cap():
+                        self.starting += 1
+                        start = True
+                        break
+                    self.condition.wait(1.0)
+            if start:
+                return self._start()
+            if is_healthy(driver):
+                with self.condition:
+                    self.reused += 1
+                return driver
+            self._retire(driver, "not responding")
+
+    def release(self, driver, broken=False):
+        """Hand a browser back, replacing it when it is worn out; `broken` always replaces it."""
+        with self.condition:
+            entry = self.entries.get(id(driver))
+        if entry is None:
+            return
+        entry["uses"] += 1
+
+        reason = None
+        if broken:
+            reason = "failed check"
+        elif self.max_uses and entry["uses"] >= self.max_uses:
+            reason = f"{entry['uses']} uses"
+        else:
+            rss = browser_rss_mb(driver)
+            if self.max_rss_mb and rss > self.max_rss_mb:
+                reason = f"memory {rss:.0f} MB"
+            elif self.max_total_mb and self.total_rss_mb() > self.max_total_mb:
+                reason = f"pool above {self.max_total_mb:.0f} MB"
+        if reason is None and not reset_driver(driver):
+            reason = "reset failed"
+        if reason or self.closed:
+            self._retire(driver, reason or "pool closed")
+            return
+        with self.condition:
+            self.idle.append(driver)
+            self.condition.notify_all()
+
+    @contextmanager
+    def lease(self):
+        """acquire() and release() around a block; an exception in the block replaces the browser."""
+        driver = self.acquire()
+        if driver is None:
+            raise RuntimeError("Could not start the browser")
+        try:
+            yield driver
+        except BaseException:
+            self.release(driver, broken=True)
+            raise
+        self.release(driver)
+
+    def close(self):
+        """Quit every idle browser; browsers still in use are quit when released."""
+        with self.condition:
+            self.closed = True
+            idle, self.idle = self.idle, []
+            for driver in idle:
+                self.entries.pop(id(driver), None)
+            self.condition.notify_all()
+        for driver in idle:
+            try:
+                driver.quit()
+            except Exception as e:
+                log.warning(f"Error while closing browser: {e}")
+        if self.started:
+            log.info(f"Browser pool: {self.started} started, {self.reused} reuses, {self.recycled} replaced")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
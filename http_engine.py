@@ -0,0 +1,324 @@
+"""
+MMU Student Portal - Browserless HTTP engine
+Runs the login -> Unit Registration -> "Get Units" flow as plain ASP.NET
+WebForms postbacks over a pooled HTTP session instead of a Chrome browser.
+"""
+
+import copy
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from portal_parser import (
+    REGISTRATION_TYPE_VALUES,
+    is_server_error_page,
+    parse_available_units,
+    parse_form,
+    parse_get_units_response,
+    parse_registration_response,
+)
+from resilience import PortalUnavailable, observe_latency, retry, step_timeout
+from snapshot_store import save_snapshot
+from structured_log import get_logger
+
+log = get_logger("http")
+
+
+class HttpEngineError(Exception):
+    """The HTTP engine could not drive the page (as opposed to a portal message)."""
+
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+)
+
+
+class HttpPortalSession:
+    """
+    A logged-in conversation with the portal over HTTP.
+
+    Each postback carries the hidden __VIEWSTATE/__EVENTVALIDATION fields of
+    the previous response forward, exactly like the browser form would.
+    """
+
+    def __init__(self, login_url, unit_registration_url, timeout=20, pool_size=4, rate_limiter=None):
+        self.login_url = login_url
+        self.unit_registration_url = unit_registration_url
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"User-Agent": USER_AGENT})
+
+        self.current_url = None
+        self.page_source = ""
+        self.form = None
+        # perf_counter() when the registration was (or, in a dry run, would have been) posted
+        self.submitted_at = None
+
+    def _record(self, response):
+        """Remember the page we landed on and its form state."""
+        response.raise_for_status()
+        self.current_url = response.url
+        self.page_source = response.text
+        self.form = parse_form(self.page_source)
+        return response
+
+    def _request(self, method, url, step, **kwargs):
+        """
+        Send one request with the step's (adaptive) timeout.
+
+        Raises PortalUnavailable when the portal times out, drops the
+        connection or answers with a 5xx / ASP.NET error page.
+        """
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, url, timeout=step_timeout(f"http_{step}", self.timeout),
+                                             **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            raise PortalUnavailable(f"{step}: {e}") from e
+        if response.status_code >= 500 or is_server_error_page(response.text):
+            raise PortalUnavailable(f"{step}: HTTP {response.status_code} error page")
+        observe_latency(f"http_{step}", time.perf_counter() - started)
+        return response
+
+    def get(self, url, step="navigation"):
+        """Load a page (retried: page loads are idempotent)."""
+        return self._record(retry(step, lambda: self._request("GET", url, step)))
+
+    def fetch_page(self, url, step="fetch_page"):
+        """Load a page on this session without making it the current page."""
+        response = retry(step, lambda: self._request("GET", url, step))
+        if not response.ok or "Login" in response.url:
+            return None
+        return response.text
+
+    def postback(self, submit=None, event_target=None, overrides=None, step="postback", idempotent=False):
+        """
+        Post the current form back to the page it came from.
+
+        Only postbacks marked `idempotent` (they change nothing on the
+        portal) are retried.
+        """
+        data = self.form.payload(submit=submit, event_target=event_target, overrides=overrides)
+        action_url = requests.compat.urljoin(self.current_url, self.form.action or self.current_url)
+        response = retry(step, lambda: self._request("POST", action_url, step, data=data),
+                         retries=None if idempotent else 0)
+        return self._record(response)
+
+    def fork(self):
+        """
+        A second page on the same login, like another browser tab: it shares
+        the cookies and connection pool but posts back its own form state.
+        """
+        other = copy.copy(self)
+        other.form = copy.deepcopy(self.form)
+        other.submitted_at = None
+        return other
+
+    def _password_input(self):
+        for inp in self.form.inputs:
+            if inp["type"] == "password":
+                return inp
+        return None
+
+    def login(self, registration_number, password):
+        """Log into the MMU Student Portal."""
+        try:
+            log.info(f"Loading: {self.login_url}")
+            self.get(self.login_url, step="login_page")
+
+            # The login form sits behind the "Student Login" button
+            if not self._password_input():
+                student_login = self.form.find_submit("ContentPlaceHolder1_btnStudentLogin")
+                if student_login:
+                    log.info("Posting 'Student Login' button...")
+                    self.postback(submit=student_login, step="login_page", idempotent=True)
+
+            text_inputs = [inp for inp in self.form.inputs if inp["type"] in ["text", "password"] and inp["name"]]
+            password_field = self._password_input()
+            if not text_inputs or not password_field or not password_field["name"]:
+                log.error("Could not locate login form fields!")
+                return False
+
+            submits = [s for s in self.form.submits if s["id"] != "ContentPlaceHolder1_btnStudentLogin"]
+            submits = submits or self.form.submits
+
+            log.info("Submitting credentials...")
+            self.postback(
+                submit=submits[0] if submits else None,
+                overrides={text_inputs[0]["name"]: registration_number, password_field["name"]: password},
+                step="login"
+            )
+
+            if "Login" not in self.current_url and not self._password_input():
+                log.success("Login successful!")
+                return True
+            log.warning("Login may have failed.")
+            return False
+
+        except (requests.RequestException, ValueError) as e:
+            log.error(f"Login failed: {e}")
+            return False
+
+    def export_cookies(self):
+        """Return the session cookies in the same shape as Selenium's get_cookies()."""
+        return [
+            {
+                "name": cookie.name,
+                "value": cookie.value,
+                "domain": cookie.domain,
+                "path": cookie.path,
+                "secure": cookie.secure,
+                "expiry": cookie.expires
+            }
+            for cookie in self.session.cookies
+        ]
+
+    def import_cookies(self, cookies):
+        """Load cookies saved by export_cookies() or Selenium's get_cookies()."""
+        for cookie in cookies:
+            self.session.cookies.set(
+                cookie["name"], cookie["value"],
+                domain=cookie.get("domain", ""), path=cookie.get("path", "/")
+            )
+
+    def resume_session(self, cookies):
+        """
+        Try to reuse saved cookies with one request to Unit Registration.
+        Returns True (and leaves us on that page) if the session is still valid.
+        """
+        self.import_cookies(cookies)
+        if self.navigate_to_unit_registration():
+            return True
+        self.session.cookies.clear()
+        return False
+
+    def navigate_to_unit_registration(self):
+        """Load the Unit Registration page."""
+        try:
+            self.get(self.unit_registration_url)
+            if "Login" in self.current_url:
+                log.error("Redirected back to the login page")
+                return False
+            if "Main__ddlRegFor" not in self.form.selects:
+                log.error("Registration type dropdown not found")
+                return False
+            log.success("On Unit Registration page")
+            return True
+        except (requests.RequestException, ValueError) as e:
+            log.error(f"Failed to navigate: {e}")
+            return False
+
+    def select_registration_type(self, reg_type="Course Registration"):
+        """Select the registration type, posting back if the dropdown auto-posts."""
+        if reg_type not in REGISTRATION_TYPE_VALUES:
+            log.error(f"Invalid registration type: {reg_type}")
+            return False
+        try:
+            dropdown = self.form.selects["Main__ddlRegFor"]
+            value = REGISTRATION_TYPE_VALUES[reg_type]
+            if value not in [opt["value"] for opt in dropdown["options"]]:
+                log.error(f"Registration type not offered: {reg_type}")
+                return False
+
+            self.form.fields[dropdown["name"]] = value
+            if "__doPostBack" in dropdown["onchange"]:
+                self.postback(event_target=dropdown["name"], step="registration_type", idempotent=True)
+            log.success(f"Selected: {reg_type}")
+            return True
+        except (KeyError, requests.RequestException, ValueError) as e:
+            log.error(f"Could not select registration type: {e}")
+            return False
+
+    def click_get_units_button(self):
+        """
+        Post the 'Get Units To Register' button and categorize the response.
+        Returns the same (success, error_category, error_message) tuple as the
+        Selenium flow.
+
+        Raises HttpEngineError if the button could not be posted at all.
+        """
+        button = self.form.find_submit("Main__btnRegister")
+        if not button:
+            raise HttpEngineError("Get Units button not found")
+        try:
+            self.postback(submit=button, step="get_units", idempotent=True)
+        except (requests.RequestException, ValueError) as e:
+            raise HttpEngineError(f"Could not post button: {e}") from e
+
+        success, error_category, error_message = parse_get_units_response(self.page_source)
+        if not success:
+            save_snapshot(self.page_source, f"get_units_{error_category}", reason=error_message)
+            log.info(f"Portal message ({error_category}): {error_message}", extra={"category": error_category})
+        return (success, error_category, error_message)
+
+    def extract_available_units(self):
+        """Return the units offered on the current page (dropdown, then checkboxes)."""
+        units = parse_available_units(self.page_source)
+        if not units:
+            save_snapshot(self.page_source, "http_no_units")
+        for unit in units:
+            log.detail(f"  - {unit['text']}")
+        return units
+
+    def submit_registration(self, units, dry_run=False):
+        """
+        Post the chosen units with 'Submit Registration' and categorize the response.
+        Returns (registered, category, message) like parse_registration_response();
+        a dry run builds the postback without sending it.
+
+        Raises HttpEngineError if the units or the button could not be posted.
+        """
+        submit = self.form.find_submit("Main__btnRegisterCourse")
+        if not submit:
+            raise HttpEngineError("Submit Registration button not found")
+
+        overrides = {unit["name"]: unit.get("value") or "on" for unit in units if unit.get("name")}
+        values = [unit["value"] for unit in units if not unit.get("name") and unit.get("value")]
+        try:
+            if values:
+                dropdown = self.form.selects.get("Main__ddlUnits")
+                if not dropdown:
+                    raise HttpEngineError("Units dropdown not found")
+                add_button = self.form.find_submit("Main__btnAddUnit")
+                if add_button and not dry_run:
+                    # One postback per unit, like clicking 'Add' in the browser
+                    for value in values:
+                        add_button = self.form.find_submit("Main__btnAddUnit")
+                        if not add_button:
+                            raise HttpEngineError("Add unit button disappeared")
+                        self.postback(submit=add_button, overrides={dropdown["name"]: value}, step="add_unit")
+                    submit = self.form.find_submit("Main__btnRegisterCourse")
+                    if not submit:
+                        raise HttpEngineError("Submit Registration button not found")
+                elif add_button or dropdown["multiple"] or len(values) == 1:
+                    overrides[dropdown["name"]] = values if len(values) > 1 else values[0]
+                else:
+                    raise HttpEngineError("The units dropdown only takes one unit at a time")
+
+            self.submitted_at = time.perf_counter()
+            if dry_run:
+                log.info(f"Dry run - {len(units)} units selected, registration not posted")
+                return (False, None, f"{len(units)} units selected; registration was not submitted")
+
+            log.info(f"Submitting registration for {len(units)} units...")
+            self.postback(submit=submit, overrides=overrides, step="registration_submit")
+        except (requests.RequestException, PortalUnavailable, ValueError) as e:
+            raise HttpEngineError(f"Could not submit registration: {e}") from e
+
+        registered, category, message = parse_registration_response(self.page_source)
+        if not registered:
+            save_snapshot(self.page_source, f"registration_{category}", reason=message)
+        log.info(f"Registration {'confirmed' if registered else 'not confirmed'}: {message}")
+        return (registered, category, message)
+
+    def close(self):
+        self.session.close()
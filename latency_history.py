@@ -0,0 +1,379 @@
+"""
+MMU Student Portal - Portal latency history
+Remembers how fast the portal's three endpoints (login, UnitRegistration.aspx
+and the 'Get Units' postback) answered across runs, as compact histograms
+per UTC hour of the day, and uses them to:
+
+- report p50 / p95 / p99 per endpoint, overall or for one hour
+- tell quiet hours from busy ones, so non-urgent work (balance reads,
+  re-checking an account that has already registered) is left for a quiet
+  hour and the slow sniper polls less during peak hours
+- give a fresh process per-step timeouts before resilience.LatencyTracker
+  has seen enough requests of its own, from the latencies earlier runs saw
+  for that same request or wait (kept under "step:<name>")
+
+The history is a small JSON file ($MMU_LATENCY_HISTORY_FILE). Each
+endpoint and hour holds request counts in log-spaced latency buckets; once
+an hour has MMU_LATENCY_HISTORY_SAMPLES observations its counts are halved,
+so older runs fade out.
+
+Usage:
+    python latency_history.py report --by-hour
+    python latency_history.py quiet-hours --count 4
+"""
+
+import argparse
+import atexit
+import json
+import os
+import threading
+import time
+
+from structured_log import get_logger
+
+log = get_logger("latency")
+
+DEFAULT_HISTORY_FILE = ".latency_history.json"
+DEFAULT_MAX_SAMPLES = 200
+HISTORY_VERSION = 1
+
+# Bucket i holds latencies up to FIRST_BUCKET_MS * BUCKET_RATIO ** i (25 ms .. ~2 min, then overflow)
+FIRST_BUCKET_MS = 25
+BUCKET_RATIO = 1.25
+BUCKET_COUNT = 39
+BUCKET_BOUNDS_MS = [FIRST_BUCKET_MS * BUCKET_RATIO ** i for i in range(BUCKET_COUNT)]
+
+ENDPOINTS = ("login", "unit_registration", "get_units")
+
+# StageTimer stages that time a whole request to an endpoint
+ENDPOINT_STAGES = {
+    "login": "login",
+    "http_login": "login",
+    "navigation": "unit_registration",
+    "http_navigation": "unit_registration",
+    "get_units": "get_units",
+    "http_get_units": "get_units",
+}
+
+# Span outcomes that did not get a full answer from the portal
+UNTIMED_OUTCOMES = ("error", "failed", "interrupted", "technical_error")
+
+# LatencyTracker steps (one HTTP request or WaitEngine wait each) are kept under this prefix
+STEP_PREFIX = "step:"
+
+
+def _env_float(name, default):
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        log.warning(f"Ignoring invalid {name}: {os.getenv(name)}")
+        return float(default)
+
+
+def history_enabled():
+    """Whether portal latencies are kept across runs (MMU_LATENCY_HISTORY, default true)."""
+    return os.getenv("MMU_LATENCY_HISTORY", "true").lower() == "true"
+
+
+def defer_enabled():
+    """Whether non-urgent work waits for a quiet hour (MMU_DEFER_NON_URGENT, default true)."""
+    return os.getenv("MMU_DEFER_NON_URGENT", "true").lower() == "true"
+
+
+def bucket_index(seconds):
+    ms = seconds * 1000
+    for index, bound in enumerate(BUCKET_BOUNDS_MS):
+        if ms <= bound:
+            return index
+    return BUCKET_COUNT
+
+
+def bucket_seconds(index):
+    """Upper bound of a bucket in seconds (the overflow bucket reports one ratio step past the last)."""
+    return FIRST_BUCKET_MS * BUCKET_RATIO ** index / 1000
+
+
+def _hour(when=None):
+    return time.gmtime(when if when is not None else time.time()).tm_hour
+
+
+def _add(target, counts):
+    if len(target) < len(counts):
+        target.extend([0] * (len(counts) - len(target)))
+    for index, count in enumerate(counts):
+        target[index] += count
+
+
+def _trim(counts):
+    while counts and not counts[-1]:
+        counts.pop()
+    return counts
+
+
+class LatencyHistory:
+    """
+    Latency histograms per endpoint and UTC hour, kept on disk.
+
+    Args:
+        path: JSON file (default: $MMU_LATENCY_HISTORY_FILE or .latency_history.json)
+        max_samples: Observations per endpoint and hour before its counts are halved
+                     (default: $MMU_LATENCY_HISTORY_SAMPLES, 200)
+        min_samples: Observations needed before an hour (or endpoint) is trusted
+        busy_factor: An hour whose p95 is this many times the endpoint's typical
+                     hourly p95 is busy (default: $MMU_BUSY_FACTOR, 1.5)
+    """
+
+    def __init__(self, path=None, max_samples=None, min_samples=5, busy_factor=None):
+        self.path = path or os.getenv("MMU_LATENCY_HISTORY_FILE", DEFAULT_HISTORY_FILE)
+        self.max_samples = int(max_samples or _env_float("MMU_LATENCY_HISTORY_SAMPLES", DEFAULT_MAX_SAMPLES))
+        self.min_samples = min_samples
+        self.busy_factor = busy_factor if busy_factor is not None else _env_float("MMU_BUSY_FACTOR", "1.5")
+        self.lock = threading.Lock()
+        # {endpoint: {hour: [count per bucket]}}; `pending` holds what this process added since the last save
+        self.counts = self._load()
+        self.pending = {}
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (ValueError, OSError) as e:
+            log.debug(f"Ignoring unreadable latency history {self.path}: {e}")
+            return {}
+        if data.get("version") != HISTORY_VERSION or data.get("buckets") != [FIRST_BUCKET_MS, BUCKET_RATIO]:
+            log.info("Latency history was written with other buckets - starting a new one")
+            return {}
+        return {endpoint: {int(hour): counts for hour, counts in hours.items()}
+                for endpoint, hours in data.get("endpoints", {}).items()}
+
+    def observe(self, endpoint, seconds, when=None):
+        """Count one request to `endpoint` that took `seconds`."""
+        hour = _hour(when)
+        index = bucket_index(seconds)
+        with self.lock:
+            for counts in (self.counts, self.pending):
+                histogram = counts.setdefault(endpoint, {}).setdefault(hour, [])
+                _add(histogram, [0] * index + [1])
+            histogram = self.counts[endpoint][hour]
+            if sum(histogram) > self.max_samples:
+                self.counts[endpoint][hour] = _trim([count // 2 for count in histogram])
+
+    def histogram(self, endpoint, hour=None):
+        """Bucket counts for an endpoint, in one hour or across all of them."""
+        with self.lock:
+            hours = self.counts.get(endpoint, {})
+            if hour is not None:
+                return list(hours.get(hour, []))
+            total = []
+            for counts in hours.values():
+                _add(total, counts)
+            return total
+
+    def samples(self, endpoint, hour=None):
+        return sum(self.histogram(endpoint, hour))
+
+    def percentile(self, endpoint, q, hour=None):
+        """The q-th percentile (0-100) latency in seconds (a bucket's upper bound), or None without data."""
+        histogram = self.histogram(endpoint, hour)
+        total = sum(histogram)
+        if not total:
+            return None
+        rank = q / 100 * total
+        seen = 0
+        for index, count in enumerate(histogram):
+            seen += count
+            if count and seen >= rank:
+                return bucket_seconds(index)
+        return bucket_seconds(len(histogram) - 1)
+
+    def summary(self, endpoint, hour=None):
+        """{'samples', 'p50_ms', 'p95_ms', 'p99_ms'} for an endpoint."""
+        result = {"samples": self.samples(endpoint, hour)}
+        for q in (50, 95, 99):
+            value = self.percentile(endpoint, q, hour)
+            result[f"p{q}_ms"] = None if value is None else round(value * 1000)
+        return result
+
+    def observe_step(self, step, seconds, when=None):
+        """Count one LatencyTracker step (e.g. "http_get_units" or "get_units_render:units")."""
+        self.observe(STEP_PREFIX + step, seconds, when)
+
+    def timeout_hint(self, step, when=None):
+        """
+        The p95 in seconds earlier runs saw for this exact LatencyTracker
+        step, in the current hour when it has enough observations or else
+        across all hours; None when there is too little data.
+        """
+        for hour in (_hour(when), None):
+            if self.samples(STEP_PREFIX + step, hour) >= self.min_samples:
+                return self.percentile(STEP_PREFIX + step, 95, hour)
+        return None
+
+    def typical_p95(self, endpoint):
+        """The median over hours (with enough data) of an endpoint's hourly p95, or None."""
+        values = sorted(self.percentile(endpoint, 95, hour) for hour in range(24)
+                        if self.samples(endpoint, hour) >= self.min_samples)
+        return values[len(values) // 2] if values else None
+
+    def hour_load(self, hour):
+        """
+        How slow an hour is compared with the rest of the day: the mean over
+        endpoints of the hour's p95 divided by the endpoint's typical hourly
+        p95 (1.0 is typical). None when no endpoint has enough data for the hour.
+        """
+        ratios = []
+        for endpoint in ENDPOINTS:
+            if self.samples(endpoint, hour) < self.min_samples:
+                continue
+            ratios.append(self.percentile(endpoint, 95, hour) / self.typical_p95(endpoint))
+        return sum(ratios) / len(ratios) if ratios else None
+
+    def is_busy(self, when=None):
+        """Whether the portal is usually slow at this hour (unknown hours are not busy)."""
+        load = self.hour_load(_hour(when))
+        return load is not None and load >= self.busy_factor
+
+    def quiet_hours(self, count=None):
+        """UTC hours with data that are not busy, quietest first."""
+        loads = {hour: self.hour_load(hour) for hour in range(24)}
+        hours = sorted((hour for hour, load in loads.items() if load is not None and load < self.busy_factor),
+                       key=lambda hour: (loads[hour], hour))
+        return hours[:count] if count else hours
+
+    def seconds_until_quiet(self, when=None):
+        """Seconds until the next quiet hour begins (0 if this hour is not busy), or None if none is known."""
+        when = time.time() if when is None else when
+        if not self.is_busy(when):
+            return 0.0
+        quiet = set(self.quiet_hours())
+        if not quiet:
+            return None
+        hour = _hour(when)
+        for ahead in range(1, 24):
+            if (hour + ahead) % 24 in quiet:
+                return ahead * 3600 - when % 3600
+        return None
+
+    def save(self):
+        """Add what this process observed to the file (merging with other runs'); never raises."""
+        with self.lock:
+            if not self.pending:
+                return
+            pending, self.pending = self.pending, {}
+        merged = self._load()
+        for endpoint, hours in pending.items():
+            for hour, counts in hours.items():
+                histogram = merged.setdefault(endpoint, {}).setdefault(hour, [])
+                _add(histogram, counts)
+                if sum(histogram) > self.max_samples:
+                    merged[endpoint][hour] = _trim([count // 2 for count in histogram])
+        data = {
+            "version": HISTORY_VERSION,
+            "buckets": [FIRST_BUCKET_MS, BUCKET_RATIO],
+            "updated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "endpoints": {endpoint: {str(hour): _trim(list(counts)) for hour, counts in sorted(hours.items())}
+                          for endpoint, hours in sorted(merged.items())},
+        }
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(temporary, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(temporary, self.path)
+        except OSError as e:
+            log.warning(f"Could not save the latency history: {e}")
+            return
+        with self.lock:
+            # Keep this process's view in step with what other runs added meanwhile
+            self.counts = merged
+
+
+_history = None
+_history_lock = threading.Lock()
+
+
+def get_latency_history():
+    """The process-wide history (saved at exit), or None when MMU_LATENCY_HISTORY=false."""
+    global _history
+    if not history_enabled():
+        return None
+    with _history_lock:
+        if _history is None:
+            _history = LatencyHistory()
+            atexit.register(_history.save)
+        return _history
+
+
+def observe_spans(spans, stages=None):
+    """
+    Add a check's endpoint requests to the history. Spans the portal
+    answered count, whatever the answer ("already_registered" and the
+    like); failed ones (UNTIMED_OUTCOMES) do not.
+
+    Args:
+        spans: StageTimer.spans
+        stages: Only these stages (default: every stage in ENDPOINT_STAGES)
+    """
+    history = get_latency_history()
+    if history is None:
+        return
+    for span in spans:
+        endpoint = ENDPOINT_STAGES.get(span["stage"])
+        if endpoint and span["outcome"] not in UNTIMED_OUTCOMES and (stages is None or span["stage"] in stages):
+            history.observe(endpoint, span["seconds"])
+
+
+def defer_non_urgent(task, when=None):
+    """Whether to leave `task` for a quieter hour; logs the decision."""
+    if not defer_enabled():
+        return False
+    history = get_latency_history()
+    if history is None or not history.is_busy(when):
+        return False
+    log.info(f"Portal is usually slow at this hour - leaving the {task} for a quieter one",
+             extra={"stage": task})
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect the portal latency history")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    report = subparsers.add_parser("report", help="p50/p95/p99 per endpoint")
+    report.add_argument("--by-hour", action="store_true", help="Also show every UTC hour with data")
+    report.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+    quiet = subparsers.add_parser("quiet-hours", help="Quietest UTC hours, e.g. for the workflow's cron")
+    quiet.add_argument("--count", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    history = LatencyHistory()
+    if args.command == "quiet-hours":
+        hours = sorted(history.quiet_hours(args.count))
+        if not hours:
+            print("Not enough history yet")
+            return 1
+        print(f"Quiet hours (UTC): {', '.join(f'{hour:02d}:00' for hour in hours)}")
+        print(f"cron: 0 {','.join(str(hour) for hour in hours)} * * *")
+        return 0
+
+    rows = [(endpoint, None) for endpoint in ENDPOINTS]
+    if args.by_hour:
+        rows += [(endpoint, hour) for endpoint in ENDPOINTS for hour in range(24) if history.samples(endpoint, hour)]
+    if args.json:
+        print(json.dumps([dict(history.summary(endpoint, hour), endpoint=endpoint, hour=hour)
+                          for endpoint, hour in rows], indent=2))
+        return 0
+    print(f"{'endpoint':>18} | {'hour':>4} | {'samples':>7} | {'p50 ms':>7} | {'p95 ms':>7} | {'p99 ms':>7} | load")
+    print("-" * 76)
+    for endpoint, hour in rows:
+        summary = history.summary(endpoint, hour)
+        load = history.hour_load(hour) if hour is not None else None
+        print(f"{endpoint:>18} | {'all' if hour is None else f'{hour:02d}':>4} | {summary['samples']:>7} | "
+              + " | ".join(f"{'-' if summary[key] is None else summary[key]:>7}" for key in ("p50_ms", "p95_ms", "p99_ms"))
+              + f" | {'' if load is None else f'{load:.2f}'}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
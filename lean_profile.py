@@ -0,0 +1,129 @@
+"""
+MMU Student Portal - Lean browser profile
+Chrome settings that skip everything the bot does not need: `eager` page
+loads, no extensions/background networking/component updates, and
+non-essential resources (images, fonts, media, trackers) blocked through
+the DevTools Protocol. Also reports bytes transferred and load time per page.
+"""
+
+import os
+
+from structured_log import get_logger
+
+log = get_logger()
+
+# Chrome features the bot never uses
+LEAN_ARGUMENTS = [
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-translate",
+    "--disable-client-side-phishing-detection",
+    "--disable-domain-reliability",
+    "--disable-features=OptimizationHints,MediaRouter,Translate",
+    "--metrics-recording-only",
+    "--mute-audio",
+    "--no-default-browser-check",
+    "--no-first-run",
+]
+
+# URL patterns blocked per category (Network.setBlockedURLs wildcards).
+# Stylesheets and scripts stay allowed: SweetAlert and the units modal need them.
+BLOCKED_RESOURCES = {
+    "images": ["*.png", "*.jpg", "*.jpeg", "*.gif", "*.svg", "*.ico", "*.webp", "*.bmp"],
+    "fonts": ["*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot", "*fonts.googleapis.com*", "*fonts.gstatic.com*"],
+    "media": ["*.mp4", "*.webm", "*.mp3", "*.ogg", "*.wav"],
+    "trackers": [
+        "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+        "*facebook.net*", "*connect.facebook.com*", "*hotjar.com*", "*clarity.ms*",
+    ],
+}
+
+PAGE_LOAD_SCRIPT = """
+const nav = performance.getEntriesByType('navigation')[0];
+const resources = performance.getEntriesByType('resource');
+let resourceBytes = 0;
+for (const entry of resources) resourceBytes += entry.transferSize || 0;
+return {
+    url: location.href,
+    dom_ready_ms: nav ? Math.round(nav.domContentLoadedEventEnd - nav.startTime) : null,
+    load_ms: nav && nav.loadEventEnd ? Math.round(nav.loadEventEnd - nav.startTime) : null,
+    document_bytes: nav ? (nav.transferSize || 0) : 0,
+    resource_bytes: resourceBytes,
+    resource_count: resources.length
+};
+"""
+
+
+def lean_enabled():
+    """Whether the lean profile is switched on (MMU_LEAN_BROWSER, default false)."""
+    return os.getenv("MMU_LEAN_BROWSER", "false").lower() == "true"
+
+
+def allowed_resources():
+    """Categories and patterns let through by MMU_LEAN_ALLOW (comma-separated)."""
+    return {item.strip() for item in os.getenv("MMU_LEAN_ALLOW", "").split(",") if item.strip()}
+
+
+def blocked_url_patterns(allow=None):
+    """
+    The URL patterns to block.
+
+    Args:
+        allow: Categories (e.g. "fonts") or individual patterns (e.g. "*.svg")
+               to keep; defaults to the comma-separated MMU_LEAN_ALLOW.
+    """
+    allow = allowed_resources() if allow is None else set(allow)
+
+    patterns = []
+    for category, category_patterns in BLOCKED_RESOURCES.items():
+        if category in allow:
+            continue
+        patterns.extend(pattern for pattern in category_patterns if pattern not in allow)
+    return patterns
+
+
+def apply_lean_options(chrome_options):
+    """Add the lean settings to ChromeOptions before the driver starts."""
+    chrome_options.page_load_strategy = "eager"
+    for argument in LEAN_ARGUMENTS:
+        chrome_options.add_argument(argument)
+    if "images" not in allowed_resources():
+        chrome_options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+
+
+def enable_request_blocking(driver, allow=None):
+    """Block non-essential requests through the DevTools Protocol."""
+    patterns = blocked_url_patterns(allow)
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+        driver._mmu_lean = True
+        log.info(f"Lean profile: blocking {len(patterns)} resource patterns")
+    except Exception as e:
+        log.warning(f"Could not enable request blocking: {e}")
+
+
+def record_page_load(driver, label):
+    """Record bytes transferred and load time of the current page (lean profile only)."""
+    if not getattr(driver, "_mmu_lean", False):
+        return None
+    try:
+        report = driver.execute_script(PAGE_LOAD_SCRIPT)
+    except Exception as e:
+        log.debug(f"Could not read page load timing: {e}")
+        return None
+    report["page"] = label
+    if not hasattr(driver, "_mmu_page_loads"):
+        driver._mmu_page_loads = []
+    driver._mmu_page_loads.append(report)
+    kb = (report["document_bytes"] + report["resource_bytes"]) / 1024
+    log.info(f"Page '{label}': {kb:.1f} KB in {report['dom_ready_ms']} ms")
+    return report
+
+
+def page_loads(driver):
+    """All page load reports recorded on this driver."""
+    return list(getattr(driver, "_mmu_page_loads", []))
@@ -0,0 +1,196 @@
+"""
+MMU Student Portal - Locator cache
+Remembers which lookup strategy (and selector) found the login fields and
+the units on each page, per registration type, so the next run tries it
+first instead of walking every fallback. A cached strategy that misses is
+dropped and the fallbacks run as before, so a markup change shows up as a
+miss and the new strategy is learned on the same run.
+
+The cache is a small JSON file ($MMU_LOCATOR_CACHE_FILE):
+
+    {"login": {"strategy": "css", "selector": ["#ContentPlaceHolder1_txtRegNo", "#ContentPlaceHolder1_txtPassword"]},
+     "unit_registration:Retake": {"strategy": "checkboxes", "selector": "#myModalCourseRegister input[type='checkbox']"}}
+
+Hits, misses and newly learned entries are counted on the driver and saved
+under "locators" in the run output.
+"""
+
+import json
+import os
+import threading
+import time
+
+from structured_log import get_logger
+
+log = get_logger("locators")
+
+DEFAULT_CACHE_FILE = ".locator_cache.json"
+
+# Per-check counters kept on the driver (cleared by driver_pool.reset_driver)
+STATS_ATTRIBUTE = "_mmu_locator_stats"
+
+
+def locator_cache_enabled():
+    """Whether learned locators are used and saved (MMU_LOCATOR_CACHE, default true)."""
+    return os.getenv("MMU_LOCATOR_CACHE", "true").lower() == "true"
+
+
+class LocatorCache:
+    """
+    Learned lookup strategies keyed by page and registration type.
+
+    Args:
+        path: JSON file the cache is kept in (default: $MMU_LOCATOR_CACHE_FILE or .locator_cache.json)
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv("MMU_LOCATOR_CACHE_FILE", DEFAULT_CACHE_FILE)
+        self.lock = threading.Lock()
+        self.entries = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+            return entries if isinstance(entries, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except (ValueError, OSError) as e:
+            log.debug(f"Ignoring unreadable locator cache {self.path}: {e}")
+            return {}
+
+    def _save(self):
+        """Write the cache atomically; called with the lock held."""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(directory, exist_ok=True)
+            with open(temporary, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f, indent=2, sort_keys=True)
+            os.replace(temporary, self.path)
+        except OSError as e:
+            log.debug(f"Could not save the locator cache: {e}")
+
+    @staticmethod
+    def key(page, context=None):
+        return f"{page}:{context}" if context else page
+
+    def lookup(self, page, context=None):
+        """The learned {'strategy', 'selector'} for a page, or None."""
+        with self.lock:
+            entry = self.entries.get(self.key(page, context))
+            return dict(entry) if entry else None
+
+    def learn(self, page, strategy, selector=None, context=None):
+        """Remember the strategy that worked; returns True if it was not already cached."""
+        key = self.key(page, context)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry.get("strategy") == strategy and entry.get("selector") == selector:
+                return False
+            self.entries[key] = {"strategy": strategy, "selector": selector,
+                                 "learned_at": time.strftime("%Y-%m-%dT%H:%M:%S%z")}
+            self._save()
+        log.info(f"Learned locator for {key}: {strategy}", extra={"page": page, "strategy": strategy})
+        return True
+
+    def forget(self, page, context=None):
+        """Drop the learned strategy for a page."""
+        key = self.key(page, context)
+        with self.lock:
+            if self.entries.pop(key, None) is not None:
+                self._save()
+
+    def clear(self):
+        with self.lock:
+            self.entries = {}
+            self._save()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_locator_cache():
+    """The process-wide cache, or None when MMU_LOCATOR_CACHE=false."""
+    global _cache
+    if not locator_cache_enabled():
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = LocatorCache()
+        return _cache
+
+
+def count_lookup(driver, outcome):
+    """Count a 'hits', 'misses' or 'learned' outcome on the driver."""
+    stats = getattr(driver, STATS_ATTRIBUTE, None)
+    if stats is None:
+        stats = {"hits": 0, "misses": 0, "learned": 0}
+        setattr(driver, STATS_ATTRIBUTE, stats)
+    stats[outcome] += 1
+
+
+def locator_stats(driver, reset=False):
+    """The hit / miss / learned counts recorded on this driver ({} if there were no lookups)."""
+    stats = dict(getattr(driver, STATS_ATTRIBUTE, None) or {})
+    if reset and hasattr(driver, STATS_ATTRIBUTE):
+        delattr(driver, STATS_ATTRIBUTE)
+    return stats
+
+
+def settle(driver, page, cached, found, context=None, cache=None):
+    """
+    Record the outcome of a lookup that started from the cached entry.
+
+    Args:
+        driver: WebDriver the counters are kept on
+        page, context: What was looked up
+        cached: The entry lookup() returned (None if nothing was cached)
+        found: (strategy, selector) that succeeded, or None
+        cache: LocatorCache (default: get_locator_cache())
+    """
+    cache = cache or get_locator_cache()
+    if cache is None:
+        return
+    if cached is not None:
+        if found is not None and found[0] == cached["strategy"] and found[1] == cached.get("selector"):
+            count_lookup(driver, "hits")
+            return
+        count_lookup(driver, "misses")
+        log.warning(f"Cached locator for {cache.key(page, context)} missed ({cached['strategy']}) - "
+                    f"the portal markup may have changed", extra={"page": page, "strategy": cached["strategy"]})
+        cache.forget(page, context)
+    if found is not None and cache.learn(page, found[0], found[1], context):
+        count_lookup(driver, "learned")
+
+
+def run_strategies(driver, page, strategies, context=None):
+    """
+    Try lookup strategies in order, the one cached for this page first.
+
+    Args:
+        driver: WebDriver the counters are kept on
+        page, context: What is being looked up (e.g. "login")
+        strategies: [(name, lookup)] in fallback order; lookup(selector) is
+            given the cached selector, then None for its default one, and
+            returns (result, selector) or None on a miss
+
+    Returns the first result, or None if every strategy missed.
+    """
+    cache = get_locator_cache()
+    cached = cache.lookup(page, context) if cache else None
+    if cached:
+        strategies = sorted(strategies, key=lambda strategy: strategy[0] != cached["strategy"])
+    for name, lookup in strategies:
+        found = None
+        if cached and name == cached["strategy"] and cached.get("selector") is not None:
+            found = lookup(cached["selector"])
+        if found is None:
+            found = lookup(None)
+        if found is not None:
+            result, selector = found
+            settle(driver, page, cached, (name, selector), context, cache)
+            return result
+    settle(driver, page, cached, None, context, cache)
+    return None
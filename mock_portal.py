@@ -0,0 +1,499 @@
+"""
+MMU Student Portal - Local stand-in portal
+A small ASP.NET WebForms look-alike used to exercise the bot offline.
+
+Usage:
+    python mock_portal.py --port 8085 --scenario units --units 40 --latency 150
+    python mock_portal.py --scenario already_registered --type-scenario Supplementary=units
+    set MMU_PORTAL_URL=http://127.0.0.1:8085
+"""
+
+import argparse
+import html
+import random
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+SCENARIOS = {
+    "already_registered": ("Error", "You have already registered units for this semester, SEM1 25/26"),
+    "payment_required": ("Error", "Please clear your fee balance before registering units"),
+    "registration_closed": ("Error", "Unit registration is closed for this semester"),
+    "technical_error": ("Error", "An error occurred while processing your request"),
+    "units": None,
+    "units_modal": None,
+}
+
+LOGIN_PATH = "/Student Login.aspx"
+UNIT_REGISTRATION_PATH = "/UnitRegistration.aspx"
+HOME_PATH = "/Home.aspx"
+SWEETALERT_PATH = "/Scripts/sweetalert2.min.js"
+
+# Minimal SweetAlert2 stand-in: swal(title, text, icon), swal({...}) and
+# Swal.fire(...) render a .swal2-popup the way the real library does, so the
+# browser engine's alert detection and closing can be exercised.
+SWEETALERT_JS = """(function () {
+    function show(options) {
+        var container = document.createElement('div');
+        container.className = 'swal2-container swal2-center swal2-backdrop-show';
+        container.style.cssText = 'position:fixed;top:0;left:0;right:0;bottom:0;z-index:1060;background:rgba(0,0,0,.4)';
+        var popup = document.createElement('div');
+        popup.className = 'swal2-popup swal2-modal swal2-icon-' + (options.icon || options.type || 'info') + ' swal2-show';
+        popup.setAttribute('role', 'dialog');
+        popup.setAttribute('aria-hidden', 'false');
+        popup.style.cssText = 'display:block;width:32em;margin:10em auto;padding:1em;background:#fff';
+        var title = document.createElement('h2');
+        title.className = 'swal2-title';
+        title.id = 'swal2-title';
+        title.textContent = options.title || '';
+        var content = document.createElement('div');
+        content.className = 'swal2-html-container';
+        content.id = 'swal2-content';
+        if (options.html) { content.innerHTML = options.html; } else { content.textContent = options.text || ''; }
+        var confirm = document.createElement('button');
+        confirm.type = 'button';
+        confirm.className = 'swal2-confirm swal2-styled';
+        confirm.textContent = options.confirmButtonText || 'OK';
+        popup.appendChild(title);
+        popup.appendChild(content);
+        popup.appendChild(confirm);
+        container.appendChild(popup);
+        document.body.appendChild(container);
+        return new Promise(function (resolve) {
+            confirm.addEventListener('click', function () {
+                container.parentNode.removeChild(container);
+                resolve({isConfirmed: true, value: true});
+            });
+        });
+    }
+    function normalize(args) {
+        if (typeof args[0] === 'object') { return args[0]; }
+        return {title: args[0], text: args[1], icon: args[2]};
+    }
+    window.swal = function () { return show(normalize(arguments)); };
+    window.Swal = {fire: function () { return show(normalize(arguments)); }};
+})();
+"""
+
+# Registration type dropdown (Main__ddlRegFor) values
+REGISTRATION_TYPES = {"Course Registration": "0", "Supplementary": "2", "Retake": "3"}
+
+UNIT_TITLES = [
+    "Data Structures and Algorithms", "Database Systems", "Computer Networks",
+    "Operating Systems", "Software Engineering", "Discrete Mathematics",
+    "Web Development", "Artificial Intelligence", "Computer Architecture",
+    "Human Computer Interaction",
+]
+
+
+def make_units(count):
+    """Build `count` (code, title, credit hours) unit tuples."""
+    return [
+        (f"BIT {2101 + i}", f"{UNIT_TITLES[i % len(UNIT_TITLES)]} {i // len(UNIT_TITLES) + 1}", "3")
+        for i in range(count)
+    ]
+
+
+class MockPortal:
+    """
+    The stand-in portal server, run on a background thread.
+
+    Usable as a context manager:
+
+        with MockPortal(scenario="already_registered") as portal:
+            ... portal.base_url ...
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, scenario="units", unit_count=8,
+                 registration_number="TEST/001/2024", password="secret", accounts=None,
+                 latency=0.0, jitter=0.0, type_scenarios=None, balance=0.0, error_rate=0.0):
+        if scenario not in SCENARIOS:
+            raise ValueError(f"Unknown scenario: {scenario}")
+        self.scenario = scenario
+        # registration type value -> scenario, for types that differ from `scenario`
+        self.type_scenarios = {}
+        self.configure(type_scenarios=type_scenarios)
+        self.units = make_units(unit_count)
+        # Fee balance shown on the home page (positive = owed)
+        self.balance = balance
+        # Seconds added to every response (plus up to `jitter` at random)
+        self.latency = latency
+        self.jitter = jitter
+        # Share of requests answered with an ASP.NET error page, like the real portal under load
+        self.error_rate = error_rate
+        self.error_count = 0
+        self.accounts = dict(accounts or {registration_number: password})
+        # session id -> registration number
+        self.sessions = {}
+        # session id -> unit codes added from the dropdown
+        self.added_units = {}
+        # registration number -> registered unit codes
+        self.registrations = {}
+        self.viewstates = set()
+        self.request_count = 0
+        self.lock = threading.Lock()
+
+        handler = type("BoundMockPortalHandler", (MockPortalHandler,), {"portal": self})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def configure(self, scenario=None, unit_count=None, type_scenarios=None, balance=None, error_rate=None):
+        """
+        Switch the scenario or unit list size between runs.
+
+        Args:
+            type_scenarios: {registration type name: scenario} for types that
+                            answer differently from `scenario` ({} resets them)
+            balance: Fee balance shown on the home page (positive = owed)
+            error_rate: Share of requests (0-1) answered with a server error page
+        """
+        if scenario is not None:
+            if scenario not in SCENARIOS:
+                raise ValueError(f"Unknown scenario: {scenario}")
+            self.scenario = scenario
+        if unit_count is not None:
+            self.units = make_units(unit_count)
+        if balance is not None:
+            self.balance = balance
+        if error_rate is not None:
+            self.error_rate = error_rate
+        if type_scenarios is not None:
+            for reg_type, type_scenario in type_scenarios.items():
+                if reg_type not in REGISTRATION_TYPES or type_scenario not in SCENARIOS:
+                    raise ValueError(f"Unknown registration type or scenario: {reg_type}={type_scenario}")
+            self.type_scenarios = {REGISTRATION_TYPES[reg_type]: type_scenario
+                                   for reg_type, type_scenario in type_scenarios.items()}
+
+    def scenario_for(self, reg_for):
+        """The scenario answering 'Get Units' for a registration type value."""
+        return self.type_scenarios.get(reg_for, self.scenario)
+
+    def delay(self):
+        """Simulate server and network latency."""
+        seconds = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0)
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def overloaded(self):
+        """Whether to fail this request (see error_rate)."""
+        if self.error_rate and random.random() < self.error_rate:
+            with self.lock:
+                self.error_count += 1
+            return True
+        return False
+
+    def issue_viewstate(self):
+        token = secrets.token_urlsafe(24)
+        with self.lock:
+            self.viewstates.add(token)
+        return token
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class MockPortalHandler(BaseHTTPRequestHandler):
+    portal = None
+
+    def log_message(self, format, *args):
+        pass
+
+    # --- plumbing -------------------------------------------------------
+
+    def _session_id(self):
+        for part in self.headers.get("Cookie", "").split(";"):
+            name, _, value = part.strip().partition("=")
+            if name == ".ASPXAUTH":
+                return value
+        return None
+
+    def _is_authenticated(self):
+        return self._session_id() in self.portal.sessions
+
+    def _send_html(self, body, status=200, headers=None):
+        payload = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or []):
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _redirect(self, path, headers=None):
+        self.send_response(302)
+        self.send_header("Location", path.replace(" ", "%20"))
+        self.send_header("Content-Length", "0")
+        for name, value in (headers or []):
+            self.send_header(name, value)
+        self.end_headers()
+
+    def _read_form(self):
+        length = int(self.headers.get("Content-Length", 0) or 0)
+        body = self.rfile.read(length).decode("utf-8")
+        return {key: values[0] for key, values in parse_qs(body, keep_blank_values=True).items()}
+
+    def _page(self, title, action, body, script=""):
+        viewstate = self.portal.issue_viewstate()
+        return f"""<!DOCTYPE html>
+<html>
+<head><title>{title}</title><script src="{SWEETALERT_PATH}"></script></head>
+<body>
+<form method="post" action="{action}" id="form1">
+<input type="hidden" name="__EVENTTARGET" id="__EVENTTARGET" value="" />
+<input type="hidden" name="__EVENTARGUMENT" id="__EVENTARGUMENT" value="" />
+<input type="hidden" name="__VIEWSTATE" id="__VIEWSTATE" value="{viewstate}" />
+<input type="hidden" name="__VIEWSTATEGENERATOR" id="__VIEWSTATEGENERATOR" value="C2EE9ABB" />
+<input type="hidden" name="__EVENTVALIDATION" id="__EVENTVALIDATION" value="{viewstate}" />
+{body}
+</form>
+{script}
+</body>
+</html>"""
+
+    def _alert_script(self, title, text, icon):
+        return f"<script type=\"text/javascript\">swal('{title}', '{text}', '{icon}');</script>"
+
+    def _server_error(self):
+        self._send_html(
+            "<html><head><title>Runtime Error</title></head><body>"
+            "<h1>Server Error in '/' Application.</h1>"
+            "<h2><i>Runtime Error</i></h2></body></html>",
+            status=500
+        )
+
+    def _viewstate_error(self):
+        self._send_html(
+            "<html><body><h1>Server Error in '/' Application.</h1>"
+            "<p>Validation of viewstate MAC failed.</p></body></html>",
+            status=500,
+        )
+
+    # --- pages ----------------------------------------------------------
+
+    def _landing_page(self):
+        return self._page("Student Login", "./Student%20Login.aspx", """
+<input type="submit" name="ctl00$ContentPlaceHolder1$btnStudentLogin" value="Student Login"
+       id="ContentPlaceHolder1_btnStudentLogin" />""")
+
+    def _home_page(self):
+        balance = self.portal.balance
+        amount = f"({-balance:,.2f})" if balance < 0 else f"{balance:,.2f}"
+        return f"""<html><body><h1>Welcome</h1>
+<p>Fee Balance: <span id="Main_lblFeeBalance">KES {amount}</span></p>
+</body></html>"""
+
+    def _login_form_page(self, error=""):
+        message = f'<span style="color: red">{html.escape(error)}</span>' if error else ""
+        return self._page("Student Login", "./Student%20Login.aspx", f"""
+<input name="ctl00$ContentPlaceHolder1$txtRegNo" type="text" id="ContentPlaceHolder1_txtRegNo" />
+<input name="ctl00$ContentPlaceHolder1$txtPassword" type="password" id="ContentPlaceHolder1_txtPassword" />
+<input type="submit" name="ctl00$ContentPlaceHolder1$btnLogin" value="Login" id="ContentPlaceHolder1_btnLogin" />
+{message}""")
+
+    def _registration_page(self, reg_for="0", script="", units_html=""):
+        selected = ' selected="selected"'
+        options = "".join(
+            f'<option{selected if value == reg_for else ""} value="{value}">{label}</option>'
+            for label, value in REGISTRATION_TYPES.items()
+        )
+        return self._page("Unit Registration", "./UnitRegistration.aspx", f"""
+<select name="ctl00$Main$_ddlRegFor" id="Main__ddlRegFor">{options}</select>
+<input type="submit" name="ctl00$Main$_btnRegister" value="Get Units To Register" id="Main__btnRegister" />
+{units_html}""", script)
+
+    def _units_html(self, reg_for="0"):
+        if self.portal.scenario_for(reg_for) == "units":
+            options = "".join(
+                f'<option value="{html.escape(code)}">{html.escape(code)} - {html.escape(title)}</option>'
+                for code, title, _ in self.portal.units
+            )
+            added = "".join(
+                f"<tr><td>{html.escape(code)}</td></tr>"
+                for code in self.portal.added_units.get(self._session_id(), [])
+            )
+            return f"""
+<select name="ctl00$Main$_ddlUnits" id="Main__ddlUnits"><option value="">--Select--</option>{options}</select>
+<input type="submit" name="ctl00$Main$btnAddUnit" value="Add" id="Main__btnAddUnit" />
+<table id="Main_gvSelected"><tr><th>Selected</th></tr>{added}</table>
+<input type="submit" name="ctl00$Main$btnRegisterCourse" value="Submit Registration" id="Main__btnRegisterCourse" />"""
+
+        rows = "".join(
+            f'<tr><td><input type="checkbox" id="Main_chkUnit_{i}" name="ctl00$Main$chkUnit{i}" /></td>'
+            f'<td>{html.escape(code)}</td><td>{html.escape(title)}</td><td>{hours}</td></tr>'
+            for i, (code, title, hours) in enumerate(self.portal.units)
+        )
+        return f"""
+<div class="modal" id="myModalCourseRegister" style="display: block">
+<table><tr><th>Select</th><th>Unit Code</th><th>Unit Name</th><th>Credit Hours</th></tr>{rows}</table>
+<input type="submit" name="ctl00$Main$btnRegisterCourse" value="Submit Registration" id="Main__btnRegisterCourse" />
+</div>"""
+
+    # --- routing --------------------------------------------------------
+
+    def do_GET(self):
+        with self.portal.lock:
+            self.portal.request_count += 1
+        self.portal.delay()
+        path = unquote(urlsplit(self.path).path)
+        if path != SWEETALERT_PATH and self.portal.overloaded():
+            self._server_error()
+            return
+
+        if path == SWEETALERT_PATH:
+            payload = SWEETALERT_JS.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/javascript")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        elif path == LOGIN_PATH:
+            self._send_html(self._landing_page())
+        elif path in (HOME_PATH, UNIT_REGISTRATION_PATH):
+            if not self._is_authenticated():
+                self._redirect(LOGIN_PATH)
+            elif path == HOME_PATH:
+                self._send_html(self._home_page())
+            else:
+                self._send_html(self._registration_page())
+        else:
+            self._send_html("<html><body>Not Found</body></html>", status=404)
+
+    def do_POST(self):
+        with self.portal.lock:
+            self.portal.request_count += 1
+        self.portal.delay()
+        path = unquote(urlsplit(self.path).path)
+        form = self._read_form()
+        if self.portal.overloaded():
+            self._server_error()
+            return
+
+        if form.get("__VIEWSTATE") not in self.portal.viewstates:
+            self._viewstate_error()
+            return
+
+        if path == LOGIN_PATH:
+            if "ctl00$ContentPlaceHolder1$btnStudentLogin" in form:
+                self._send_html(self._login_form_page())
+                return
+            reg_number = form.get("ctl00$ContentPlaceHolder1$txtRegNo")
+            password = form.get("ctl00$ContentPlaceHolder1$txtPassword")
+            if reg_number in self.portal.accounts and self.portal.accounts[reg_number] == password:
+                session_id = secrets.token_hex(16)
+                with self.portal.lock:
+                    self.portal.sessions[session_id] = reg_number
+                self._redirect(HOME_PATH, headers=[
+                    ("Set-Cookie", f"ASP.NET_SessionId={secrets.token_hex(12)}; path=/; HttpOnly"),
+                    ("Set-Cookie", f".ASPXAUTH={session_id}; path=/; HttpOnly"),
+                ])
+            else:
+                self._send_html(self._login_form_page("Invalid registration number or password"))
+            return
+
+        if path == UNIT_REGISTRATION_PATH:
+            if not self._is_authenticated():
+                self._redirect(LOGIN_PATH)
+                return
+            reg_for = form.get("ctl00$Main$_ddlRegFor", "0")
+            session_id = self._session_id()
+            reg_number = self.portal.sessions[session_id]
+
+            if "ctl00$Main$btnAddUnit" in form:
+                code = form.get("ctl00$Main$_ddlUnits", "")
+                if code in [unit[0] for unit in self.portal.units]:
+                    with self.portal.lock:
+                        added = self.portal.added_units.setdefault(session_id, [])
+                        if code not in added:
+                            added.append(code)
+                self._send_html(self._registration_page(reg_for, units_html=self._units_html(reg_for)))
+                return
+
+            if "ctl00$Main$btnRegisterCourse" in form:
+                codes = [code for i, (code, _, _) in enumerate(self.portal.units)
+                         if form.get(f"ctl00$Main$chkUnit{i}")]
+                with self.portal.lock:
+                    codes += self.portal.added_units.pop(session_id, [])
+                if not codes:
+                    self._send_html(self._registration_page(
+                        reg_for, units_html=self._units_html(reg_for),
+                        script=self._alert_script("Error", "Please select at least one unit to register", "error")))
+                    return
+                with self.portal.lock:
+                    self.portal.registrations[reg_number] = codes
+                self._send_html(self._registration_page(reg_for, script=self._alert_script(
+                    "Success", f"You have successfully registered {len(codes)} units: {', '.join(codes)}",
+                    "success")))
+                return
+
+            if "ctl00$Main$_btnRegister" not in form:
+                self._send_html(self._registration_page(reg_for))
+                return
+
+            alert = SCENARIOS[self.portal.scenario_for(reg_for)]
+            if reg_number in self.portal.registrations:
+                alert = SCENARIOS["already_registered"]
+            if alert:
+                title, text = alert
+                self._send_html(self._registration_page(reg_for, script=self._alert_script(title, text, "error")))
+            else:
+                self._send_html(self._registration_page(reg_for, units_html=self._units_html(reg_for)))
+            return
+
+        self._send_html("<html><body>Not Found</body></html>", status=404)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local stand-in MMU student portal")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8085)
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="units")
+    parser.add_argument("--units", type=int, default=8, help="Number of units to offer")
+    parser.add_argument("--reg-number", default="TEST/001/2024")
+    parser.add_argument("--password", default="secret")
+    parser.add_argument("--latency", type=float, default=0, help="Milliseconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0, help="Up to this many extra milliseconds at random")
+    parser.add_argument("--balance", type=float, default=0, help="Fee balance on the home page (positive = owed)")
+    parser.add_argument("--error-rate", type=float, default=0,
+                        help="Share of requests (0-1) answered with an ASP.NET error page")
+    parser.add_argument("--type-scenario", action="append", default=[], metavar="TYPE=SCENARIO",
+                        help="Answer one registration type with another scenario, e.g. Supplementary=units")
+    args = parser.parse_args()
+
+    type_scenarios = dict(item.split("=", 1) for item in args.type_scenario if "=" in item)
+    portal = MockPortal(args.host, args.port, args.scenario, args.units, args.reg_number, args.password,
+                        latency=args.latency / 1000, jitter=args.jitter / 1000, type_scenarios=type_scenarios,
+                        balance=args.balance, error_rate=args.error_rate)
+    print(f"[INFO] Mock portal running at {portal.base_url} (scenario: {args.scenario}, "
+          f"{len(portal.units)} units, {args.latency:.0f}+{args.jitter:.0f} ms latency)")
+    print(f"[INFO] Credentials: {args.reg_number} / {args.password}")
+    try:
+        portal.server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n[INFO] Stopping mock portal")
+    finally:
+        portal.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+MMU Student Portal - Local SMTP sink
+Accepts every message the notifier sends and keeps it, so notifications can
+be tried without a real mail account.
+
+Usage:
+    python mock_smtp.py --port 8025 --dir sent_mail
+    set SMTP_SERVER=127.0.0.1 SMTP_PORT=8025 MMU_SMTP_SECURITY=none EMAIL_USERNAME=bot@example.com
+"""
+
+import argparse
+import os
+import socketserver
+import threading
+import time
+from email import message_from_bytes, policy
+
+
+class SmtpSink:
+    """
+    The sink server, run on a background thread.
+
+    Usable as a context manager:
+
+        with SmtpSink() as sink:
+            ... sink.host, sink.port, sink.messages ...
+
+    Args:
+        directory: Also save each message there as an .eml file
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, directory=None):
+        self.directory = directory
+        # email.message.EmailMessage objects, in the order received
+        self.messages = []
+        self.connection_count = 0
+        self.lock = threading.Lock()
+
+        handler = type("BoundSmtpSinkHandler", (SmtpSinkHandler,), {"sink": self})
+        self.server = socketserver.ThreadingTCPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def host(self):
+        return self.server.server_address[0]
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def deliver(self, data):
+        message = message_from_bytes(data, policy=policy.default)
+        with self.lock:
+            self.messages.append(message)
+            number = len(self.messages)
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, f"{int(time.time())}-{number}.eml"), "wb") as f:
+                f.write(data)
+        return message
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class SmtpSinkHandler(socketserver.StreamRequestHandler):
+    sink = None
+
+    def reply(self, line):
+        self.wfile.write(line.encode("ascii") + b"\r\n")
+
+    def read_data(self):
+        """The message lines up to the lone '.', with dot-stuffing undone."""
+        lines = []
+        while True:
+            line = self.rfile.readline()
+            if not line or line.rstrip(b"\r\n") == b".":
+                break
+            if line.startswith(b".."):
+                line = line[1:]
+            lines.append(line)
+        return b"".join(lines)
+
+    def handle(self):
+        with self.sink.lock:
+            self.sink.connection_count += 1
+        self.reply("220 mock-smtp ready")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode("utf-8", "replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb == "EHLO":
+                self.reply("250-mock-smtp")
+                self.reply("250-AUTH PLAIN LOGIN")
+                self.reply("250 8BITMIME")
+            elif verb == "HELO":
+                self.reply("250 mock-smtp")
+            elif verb == "AUTH":
+                # Any credentials are accepted; AUTH LOGIN sends them on two more lines
+                if command.upper().startswith("AUTH LOGIN"):
+                    self.reply("334 VXNlcm5hbWU6")
+                    self.rfile.readline()
+                    self.reply("334 UGFzc3dvcmQ6")
+                    self.rfile.readline()
+                elif len(command.split()) < 3:
+                    self.reply("334 ")
+                    self.rfile.readline()
+                self.reply("235 Authentication successful")
+            elif verb in ("MAIL", "RCPT", "RSET", "NOOP"):
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                self.sink.deliver(self.read_data())
+                self.reply("250 OK queued")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local SMTP server that keeps every message")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--dir", default=None, help="Save each message as an .eml file in this directory")
+    args = parser.parse_args()
+
+    sink = SmtpSink(args.host, args.port, args.dir)
+    print(f"[INFO] SMTP sink listening on {sink.host}:{sink.port}")
+    print(f"[INFO] Use SMTP_SERVER={sink.host} SMTP_PORT={sink.port} MMU_SMTP_SECURITY=none")
+    original = sink.deliver
+
+    def deliver_and_print(data):
+        message = original(data)
+        print(f"[INFO] {message['To']}: {message['Subject']}")
+        return message
+
+    sink.deliver = deliver_and_print
+    try:
+        sink.server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n[INFO] Stopping SMTP sink")
+    finally:
+        sink.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+MMU Student Portal - Multi-account runner
+Checks course registration for every account in a credentials file with
+bounded concurrency and a global portal rate limit.
+
+Usage:
+    python multi_account.py accounts.csv --concurrency 8 --rate 4 --engine http
+
+The credentials file is CSV with `reg_number,password` columns, or YAML:
+
+    accounts:
+      - reg_number: CIT-223-001/2023
+        password: secret
+
+Writes one result per account (registration_output.json schema) plus an
+aggregate summary.json to --output-dir, and records all results in the state
+store in a single transaction.
+"""
+
+import argparse
+import csv
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import course_registration_bot as bot
+from config import get_config, load_env
+from driver_pool import DriverPool, pool_enabled
+from notifier import Notifier, notify_enabled
+from state_store import StateStore, state_enabled
+from structured_log import flush_logs, get_logger, log_context
+
+log = get_logger()
+
+
+class RateLimiter:
+    """
+    Token bucket shared by all workers.
+
+    `rate` requests per second on average, with bursts of up to `burst`.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def load_accounts(path):
+    """
+    Read accounts from a CSV or YAML file.
+
+    Returns a list of {'reg_number', 'password'} dicts.
+    """
+    if path.lower().endswith((".yml", ".yaml")):
+        import yaml
+
+        with open(path, "r", encoding="utf-8") as f:
+            data = yaml.safe_load(f) or []
+        rows = data.get("accounts", []) if isinstance(data, dict) else data
+    else:
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            rows = list(csv.DictReader(f))
+
+    accounts = []
+    seen = set()
+    for row in rows:
+        reg_number = str(row.get("reg_number") or row.get("registration_number") or "").strip()
+        password = str(row.get("password") or "")
+        if not reg_number or not password:
+            log.warning(f"Skipping incomplete account entry: {reg_number or '<missing reg_number>'}")
+            continue
+        if reg_number in seen:
+            log.warning(f"Skipping duplicate account: {reg_number}")
+            continue
+        seen.add(reg_number)
+        accounts.append({"reg_number": reg_number, "password": password})
+    return accounts
+
+
+def account_filename(reg_number):
+    """A filesystem-safe file name for an account's result."""
+    return re.sub(r"[^A-Za-z0-9_-]+", "_", reg_number).strip("_") + ".json"
+
+
+def check_account(account, reg_type, engine, rate_limiter, driver_pool=None):
+    """Run one isolated check; never raises."""
+    started = time.perf_counter()
+    try:
+        with log_context(account=account["reg_number"], reg_type=reg_type):
+            result = bot.run_check(
+                account["reg_number"], account["password"],
+                reg_type=reg_type, engine=engine, headless=True, review=False,
+                rate_limiter=rate_limiter, driver_pool=driver_pool, defer=True
+            )
+    except Exception as e:
+        result = bot.new_output()
+        result["status"] = "error"
+        result["error"] = str(e)
+        result["message"] = "An unexpected error occurred"
+    result["duration_seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def run_accounts(accounts, output_dir, concurrency=4, rate=2.0, reg_type="Course Registration", engine=None,
+                 notifier=None, driver_pool=None):
+    """
+    Check every account and write per-account results and summary.json.
+    With a `notifier`, the accounts that changed are emailed as one digest;
+    with a `driver_pool`, browser checks reuse its browsers.
+
+    Returns the summary dict.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    rate_limiter = RateLimiter(rate) if rate else None
+    started = time.perf_counter()
+    results = []
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = {
+            executor.submit(check_account, account, reg_type, engine, rate_limiter, driver_pool): account
+            for account in accounts
+        }
+        for future in as_completed(futures):
+            account = futures[future]
+            result = future.result()
+            results.append((account, result))
+            log.info(f"[{len(results)}/{len(accounts)}] {account['reg_number']}: {result['status']}",
+                     extra={"account": account["reg_number"], "status": result["status"],
+                            "latency_ms": round(result["duration_seconds"] * 1000)})
+
+    changes = {}
+    if state_enabled():
+        try:
+            with StateStore() as store:
+                changes = store.record_many(
+                    (account["reg_number"], reg_type, result, bot.result_fingerprint(result))
+                    for account, result in results
+                )
+        except Exception as e:
+            log.warning(f"Could not record results in the state store: {e}")
+
+    entries = []
+    for account, result in results:
+        change = changes.get((account["reg_number"], reg_type))
+        if change:
+            result["changes"] = change
+        filename = account_filename(account["reg_number"])
+        bot.write_output(result, os.path.join(output_dir, filename))
+        if notifier and change and change["changed"]:
+            notifier.notify(result, account=account["reg_number"], reg_type=reg_type, changes=change)
+        entries.append({
+            "reg_number": account["reg_number"],
+            "status": result["status"],
+            "message": result["message"],
+            "unit_count": len(result.get("units", [])),
+            "changed": change["changed"] if change else None,
+            "change_reason": change["reason"] if change else "",
+            "duration_seconds": result["duration_seconds"],
+            "file": filename
+        })
+
+    by_status = {}
+    for entry in entries:
+        by_status[entry["status"]] = by_status.get(entry["status"], 0) + 1
+
+    summary = {
+        "total": len(accounts),
+        "by_status": by_status,
+        "changed": sum(1 for entry in entries if entry["changed"]),
+        "duration_seconds": round(time.perf_counter() - started, 3),
+        "concurrency": concurrency,
+        "rate_limit_per_second": rate,
+        "accounts": sorted(entries, key=lambda entry: entry["reg_number"])
+    }
+    with open(os.path.join(output_dir, "summary.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+    if notifier:
+        notifier.flush()
+    return summary
+
+
+def main(argv=None):
+    from portal_parser import REGISTRATION_TYPE_VALUES
+
+    load_env()
+    parser = argparse.ArgumentParser(description="Check course registration for many accounts")
+    parser.add_argument("credentials", help="CSV or YAML file with reg_number/password entries")
+    parser.add_argument("--output-dir", default="results", help="Where to write per-account results")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("MMU_CONCURRENCY", "4")),
+                        help="Accounts checked at the same time")
+    parser.add_argument("--rate", type=float, default=float(os.getenv("MMU_RATE_LIMIT", "2")),
+                        help="Portal requests per second across all accounts (0 = unlimited)")
+    parser.add_argument("--engine", choices=["selenium", "http"], default=get_config().engine)
+    parser.add_argument("--reg-type", default="Course Registration",
+                        choices=sorted(REGISTRATION_TYPE_VALUES))
+    parser.add_argument("--no-browser-pool", dest="browser_pool", action="store_false", default=pool_enabled(),
+                        help="Start a new browser for every account (default: reuse them, $MMU_BROWSER_POOL)")
+    parser.add_argument("--notify", action="store_true", default=notify_enabled(),
+                        help="Email one digest of the accounts that changed (default: $MMU_NOTIFY)")
+    args = parser.parse_args(argv)
+
+    accounts = load_accounts(args.credentials)
+    if not accounts:
+        log.error("No accounts found in the credentials file")
+        return 1
+
+    log.info(f"Checking {len(accounts)} accounts "
+             f"(concurrency {args.concurrency}, {args.rate or 'unlimited'} req/s, engine {args.engine})")
+    # Digest the whole sweep: flushed once every account has been recorded
+    notifier = Notifier.from_env(window=float("inf")) if args.notify else None
+    driver_pool = None
+    if args.browser_pool:
+        # The HTTP engine only needs browsers to fall back on, so start those on demand
+        driver_pool = DriverPool(lambda: bot.setup_driver(headless=True), size=min(args.concurrency, len(accounts)))
+        if args.engine == "selenium":
+            driver_pool.warm()
+    try:
+        summary = run_accounts(accounts, args.output_dir, args.concurrency, args.rate, args.reg_type, args.engine,
+                               notifier, driver_pool)
+    finally:
+        if notifier:
+            notifier.close()
+        if driver_pool:
+            driver_pool.close()
+
+    flush_logs()
+    print("\n" + "=" * 80)
+    print(f"Checked {summary['total']} accounts in {summary['duration_seconds']}s "
+          f"({summary['changed']} changed since the last run)")
+    for status, count in sorted(summary["by_status"].items()):
+        print(f"  {status}: {count}")
+    print(f"Results saved to {args.output_dir}/")
+    print("=" * 80)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,496 @@
+"""
+MMU Student Portal - Notifications
+Renders the notification email from a check result and sends it over one
+SMTP connection that is kept open between messages. Alerts can be collected
+into a digest over a time window (one email for a whole multi-account sweep
+or a busy polling hour), and an alert identical to one already sent is
+dropped - also by later runs, which find the keys of sent alerts in the
+state store. Alerts whose email could not be sent stay queued for the next
+attempt.
+
+Usage:
+    python notifier.py send registration_output.json
+    python notifier.py send results/*.json --digest
+
+Settings come from the same variables as the GitHub workflow (SMTP_SERVER,
+SMTP_PORT, EMAIL_USERNAME, EMAIL_PASSWORD, NOTIFICATION_EMAIL); point them at
+mock_smtp.py to try notifications locally.
+"""
+
+import argparse
+import atexit
+import glob
+import hashlib
+import html
+import json
+import os
+import smtplib
+import ssl
+import threading
+import time
+from email.message import EmailMessage
+
+from state_store import StateStore, diff_results, format_balance, state_enabled
+from structured_log import get_logger
+
+log = get_logger("notify")
+
+PORTAL_LINK = "https://studentportal.mmu.ac.ke/UnitRegistration.aspx"
+DEFAULT_SUBJECT = "📊 Course Registration Update"
+
+STYLE = """
+body { font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; line-height: 1.6; color: #333; margin: 0; padding: 0; background: #f4f4f4; }
+.container { max-width: 600px; margin: 20px auto; background: white; border-radius: 10px; overflow: hidden; box-shadow: 0 0 20px rgba(0,0,0,0.1); }
+.header { background: linear-gradient(135deg, #4CAF50 0%, #45a049 100%); color: white; padding: 30px 20px; text-align: center; }
+.header.error { background: linear-gradient(135deg, #FF9800 0%, #F57C00 100%); }
+.header.warning { background: linear-gradient(135deg, #2196F3 0%, #1976D2 100%); }
+.header h2 { margin: 0; font-size: 24px; }
+.header p { margin: 5px 0 0 0; opacity: 0.9; }
+.content { padding: 30px; }
+.alert { border-top: 1px solid #eee; padding-top: 10px; margin-top: 20px; }
+.status-badge { display: inline-block; padding: 8px 16px; border-radius: 20px; font-weight: bold; margin: 15px 0; }
+.status-success { background: #E8F5E9; color: #2E7D32; }
+.status-error { background: #FFF3E0; color: #E65100; }
+.units-box { background: #E3F2FD; border-left: 4px solid #2196F3; padding: 20px; margin: 20px 0; border-radius: 5px; }
+.units-box h4 { margin-top: 0; color: #1976D2; }
+.units-list { list-style: none; padding: 0; margin: 10px 0; }
+.units-list li { padding: 10px; margin: 5px 0; background: white; border-radius: 5px; border-left: 3px solid #4CAF50; }
+.error-box { background: #FFF3E0; border-left: 4px solid #FF9800; padding: 20px; margin: 20px 0; border-radius: 5px; }
+.error-box h4 { margin-top: 0; color: #E65100; }
+.info-box { background: #f5f5f5; padding: 15px; border-radius: 5px; margin: 15px 0; }
+.button { display: inline-block; padding: 12px 30px; background: #2196F3; color: white !important; text-decoration: none; border-radius: 5px; margin: 15px 0; font-weight: bold; }
+.footer { background: #f5f5f5; padding: 20px; text-align: center; font-size: 13px; color: #666; }
+.highlight { background: #FFF59D; padding: 2px 6px; border-radius: 3px; }
+"""
+
+
+def email_settings():
+    """
+    SMTP settings from the same variables the GitHub workflow uses, or None.
+
+    MMU_SMTP_SECURITY picks "ssl" (default, port 465), "starttls" or "none"
+    (e.g. for mock_smtp.py); EMAIL_PASSWORD is only needed to log in.
+    """
+    username = os.getenv("EMAIL_USERNAME")
+    security = os.getenv("MMU_SMTP_SECURITY", "ssl").lower()
+    password = os.getenv("EMAIL_PASSWORD")
+    if not username or (not password and security != "none"):
+        return None
+    return {
+        "host": os.getenv("SMTP_SERVER", "smtp.gmail.com"),
+        "port": int(os.getenv("SMTP_PORT", "465")),
+        "security": security,
+        "username": username,
+        "password": password,
+        "to": os.getenv("NOTIFICATION_EMAIL") or username,
+    }
+
+
+def notify_enabled():
+    """Whether long-running modes email changes themselves (MMU_NOTIFY, default false)."""
+    return os.getenv("MMU_NOTIFY", "false").lower() == "true"
+
+
+def workflow_link():
+    """The GitHub Actions run this process belongs to, or None."""
+    server, repository, run_id = (os.getenv("GITHUB_SERVER_URL"), os.getenv("GITHUB_REPOSITORY"),
+                                  os.getenv("GITHUB_RUN_ID"))
+    if server and repository and run_id:
+        return f"{server}/{repository}/actions/runs/{run_id}"
+    return None
+
+
+def alert_key(output_data, account=None, reg_type=None):
+    """Identity of an alert: the same account, type, status, units and error give the same key."""
+    registration = output_data.get("registration") or {}
+    identity = json.dumps([
+        account, reg_type, output_data.get("status"), sorted(output_data.get("units") or []),
+        output_data.get("error"), registration.get("status"),
+    ], ensure_ascii=False)
+    return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+
+def _header_class(status):
+    return {"error": " error", "no_units": " warning"}.get(status, "")
+
+
+def _unit_changes(changes):
+    """'New: BIT 2101', 'Removed: ...', 'BIT 2102: hours 3 → 4' lines for a repeat check, else []."""
+    if not changes or changes.get("first_check"):
+        return []
+    lines = [f"New: {unit}" for unit in changes.get("units_added") or []]
+    lines += [f"Removed: {unit}" for unit in changes.get("units_removed") or []]
+    for key, fields in (changes.get("units_changed") or {}).items():
+        lines.append(f"{key}: " + ", ".join(f"{field} {old} → {new}" for field, (old, new) in fields.items()))
+    return lines
+
+
+def _alert_html(alert):
+    """The body of one alert (status, message, units, error, balance)."""
+    output_data = alert["output"]
+    status = output_data.get("status", "unknown")
+    units = output_data.get("units") or []
+    badge = {"success": "✅ SUCCESS", "error": "⚠️ ERROR"}.get(status, "📊 COMPLETE")
+    parts = [
+        f'<div class="status-badge status-{"success" if status == "success" else "error"}">{badge}</div>',
+        f"<h3>{html.escape(output_data.get('message') or 'No message')}</h3>",
+    ]
+    if alert.get("account") or alert.get("reg_type"):
+        who = " - ".join(html.escape(value) for value in (alert.get("account"), alert.get("reg_type")) if value)
+        parts.insert(0, f"<h4>{who}</h4>")
+    if units:
+        items = "".join(f"<li>{html.escape(unit)}</li>" for unit in units)
+        parts.append(
+            f'<div class="units-box"><h4>📖 Available Units ({len(units)} found):</h4>'
+            f'<ul class="units-list">{items}</ul>'
+            '<p class="highlight"><strong>⚡ Action Required:</strong> Units are available NOW! '
+            'Log in to complete your registration.</p></div>'
+        )
+    unit_changes = _unit_changes(alert.get("changes"))
+    if unit_changes:
+        items = "".join(f"<li>{html.escape(line)}</li>" for line in unit_changes)
+        parts.append(f'<div class="info-box"><h4>📝 Changes Since the Last Check:</h4><ul>{items}</ul></div>')
+    registration = output_data.get("registration")
+    if registration:
+        parts.append(f"<p><strong>📋 Registration:</strong> {html.escape(registration['status'])} - "
+                     f"{html.escape(registration.get('message') or '')}</p>")
+    if output_data.get("error"):
+        parts.append(
+            f'<div class="error-box"><h4>❌ Error Details:</h4><p>{html.escape(output_data["error"])}</p>'
+            '<p><em>This usually means registration is not currently allowed or you need to complete a '
+            'payment.</em></p></div>'
+        )
+    balance = format_balance(output_data.get("balance"))
+    if balance:
+        parts.append(f'<div class="info-box"><p><strong>💰 Fee Balance:</strong> {html.escape(balance)}</p></div>')
+    return "\n".join(parts)
+
+
+def _alert_text(alert):
+    output_data = alert["output"]
+    lines = []
+    if alert.get("account") or alert.get("reg_type"):
+        lines.append(" - ".join(value for value in (alert.get("account"), alert.get("reg_type")) if value))
+    lines.append(f"{output_data.get('status', 'unknown')}: {output_data.get('message') or 'No message'}")
+    lines += [f"- {unit}" for unit in output_data.get("units") or []]
+    lines += [f"* {line}" for line in _unit_changes(alert.get("changes"))]
+    registration = output_data.get("registration")
+    if registration:
+        lines.append(f"Registration: {registration['status']} - {registration.get('message') or ''}")
+    if output_data.get("error"):
+        lines.append(f"Error: {output_data['error']}")
+    balance = format_balance(output_data.get("balance"))
+    if balance:
+        lines.append(f"Fee balance: {balance}")
+    return "\n".join(lines)
+
+
+def render_email(alerts, settings):
+    """
+    Build the email for one alert, or a digest for several.
+
+    Args:
+        alerts: [{'output', 'account', 'reg_type', 'changes'}]
+        settings: email_settings() dict (for From/To)
+    """
+    first = alerts[0]
+    if len(alerts) == 1:
+        changes = first.get("changes") or {}
+        subject = changes.get("reason") or DEFAULT_SUBJECT
+        if first.get("account") and not changes.get("reason"):
+            subject = f"{subject} - {first['account']}"
+        header_class = _header_class(first["output"].get("status"))
+        title = "MMU Course Registration Check"
+    else:
+        with_units = sum(1 for alert in alerts if alert["output"].get("status") == "success")
+        subject = f"📋 {len(alerts)} registration updates" + (f" ({with_units} with units)" if with_units else "")
+        header_class = "" if with_units else " warning"
+        title = f"MMU Course Registration - {len(alerts)} updates"
+
+    run_link = workflow_link()
+    info = f"<p><strong>🕐 Check Time:</strong> {time.strftime('%Y-%m-%d %H:%M %Z')}</p>"
+    if run_link:
+        label = f"#{os.getenv('GITHUB_RUN_NUMBER')}" if os.getenv("GITHUB_RUN_NUMBER") else run_link
+        info += f'<p><strong>🔄 Workflow:</strong> <a href="{html.escape(run_link)}">{html.escape(label)}</a></p>'
+    body = '\n<div class="alert">\n'.join(_alert_html(alert) for alert in alerts)
+    if len(alerts) > 1:
+        body = '<div class="alert">\n' + body + "\n</div>"
+    document = f"""<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><style>{STYLE}</style></head>
+<body>
+  <div class="container">
+    <div class="header{header_class}">
+      <h2>📚 {html.escape(title)}</h2>
+      <p>Automated Status Report</p>
+    </div>
+    <div class="content">
+{body}
+      <div class="info-box">{info}</div>
+      <center><a href="{PORTAL_LINK}" class="button">🔗 Go to Registration Portal</a></center>
+    </div>
+    <div class="footer">
+      <p><strong>MMU Course Registration Bot</strong></p>
+      {"<p>🤖 Powered by GitHub Actions</p>" if run_link else ""}
+    </div>
+  </div>
+</body>
+</html>
+"""
+    msg = EmailMessage()
+    msg["Subject"] = subject
+    msg["From"] = f"MMU Bot <{settings['username']}>"
+    msg["To"] = settings["to"]
+    msg.set_content("\n\n".join(_alert_text(alert) for alert in alerts) + (f"\n\n{run_link}" if run_link else ""))
+    msg.add_alternative(document, subtype="html")
+    return msg
+
+
+class SmtpPool:
+    """
+    One SMTP connection reused for every message, reopened when the server
+    has dropped it or it sat idle for longer than `idle_timeout` seconds.
+    """
+
+    def __init__(self, settings, idle_timeout=240, timeout=30):
+        self.settings = settings
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.connection = None
+        self.last_used = 0.0
+        self.connections = 0
+        self.sent = 0
+        self.lock = threading.Lock()
+
+    def _connect(self):
+        settings = self.settings
+        if settings["security"] == "ssl":
+            connection = smtplib.SMTP_SSL(settings["host"], settings["port"], timeout=self.timeout,
+                                          context=ssl.create_default_context())
+        else:
+            connection = smtplib.SMTP(settings["host"], settings["port"], timeout=self.timeout)
+            if settings["security"] == "starttls":
+                connection.starttls(context=ssl.create_default_context())
+        if settings.get("password"):
+            connection.login(settings["username"], settings["password"])
+        self.connections += 1
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            try:
+                self.connection.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.connection = None
+
+    def send(self, msg):
+        """Send one message, reconnecting once if the pooled connection has gone away."""
+        with self.lock:
+            for attempt in (1, 2):
+                if self.connection is not None and time.monotonic() - self.last_used > self.idle_timeout:
+                    self._close()
+                if self.connection is None:
+                    self.connection = self._connect()
+                try:
+                    self.connection.send_message(msg)
+                except (smtplib.SMTPServerDisconnected, OSError) as e:
+                    self._close()
+                    if attempt == 2:
+                        raise
+                    log.debug(f"SMTP connection dropped ({e}), reconnecting")
+                    continue
+                self.last_used = time.monotonic()
+                self.sent += 1
+                return
+
+    def close(self):
+        with self.lock:
+            self._close()
+
+
+class Notifier:
+    """
+    Sends alerts by email, optionally collected into digests.
+
+    Args:
+        settings: email_settings() dict; None only logs the alerts
+        window: Seconds to collect alerts before sending them as one digest
+                (default: $MMU_DIGEST_WINDOW, 0 = send each alert at once,
+                inf = collect until flush())
+        dedup_seconds: Drop an alert identical to one sent this recently
+                       (default: $MMU_NOTIFY_DEDUP_HOURS, 24 hours)
+        state_path: State store database the sent alerts are remembered in
+                    (default: $MMU_STATE_DB; not used with MMU_STATE_STORE=false)
+    """
+
+    def __init__(self, settings=None, window=None, dedup_seconds=None, pool=None, state_path=None):
+        self.settings = settings
+        self.window = float(os.getenv("MMU_DIGEST_WINDOW", "0")) if window is None else window
+        if dedup_seconds is None:
+            dedup_seconds = float(os.getenv("MMU_NOTIFY_DEDUP_HOURS", "24")) * 60 * 60
+        self.dedup_seconds = dedup_seconds
+        self.pool = pool or (SmtpPool(settings) if settings else None)
+        self.state_path = state_path
+        self.persist = state_enabled()
+        self.pending = []
+        # {alert key: time.time() it was sent}, for this process
+        self.sent_keys = {}
+        self.timer = None
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        return cls(email_settings(), **kwargs)
+
+    def notify(self, output_data, account=None, reg_type=None, changes=None):
+        """
+        Queue an alert for a result (sent at once when there is no digest window).
+
+        Returns False when it duplicates an alert already sent or pending.
+        """
+        key = alert_key(output_data, account, reg_type)
+        now = time.time()
+        sent_by_earlier_run = key not in self.sent_keys and self._sent_since(key, now - self.dedup_seconds)
+        with self.lock:
+            sent_at = self.sent_keys.get(key)
+            if sent_by_earlier_run or (sent_at is not None and now - sent_at < self.dedup_seconds) or \
+                    any(alert["key"] == key for alert in self.pending):
+                log.info(f"Skipping duplicate alert for {account or 'account'}: {output_data.get('status')}",
+                         extra={"account": account, "status": output_data.get("status")})
+                return False
+            self.pending.append({"key": key, "output": output_data, "account": account,
+                                 "reg_type": reg_type, "changes": changes})
+            self._start_timer()
+        if self.window <= 0:
+            self.flush()
+        return True
+
+    def _start_timer(self):
+        """Schedule the digest flush; called with the lock held."""
+        if 0 < self.window < float("inf") and self.timer is None:
+            self.timer = threading.Timer(self.window, self.flush)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def _sent_since(self, key, since):
+        """Whether the state store says an earlier run sent this alert at or after `since`."""
+        if not self.persist:
+            return False
+        try:
+            with StateStore(self.state_path) as store:
+                return key in store.sent_notifications([key], since)
+        except Exception as e:
+            log.warning(f"Could not read sent alerts from the state store: {e}")
+            return False
+
+    def _remember_sent(self, keys, sent_at):
+        with self.lock:
+            for key in keys:
+                self.sent_keys[key] = sent_at
+        if not self.persist:
+            return
+        try:
+            with StateStore(self.state_path) as store:
+                store.record_notifications(keys, sent_at, forget_before=sent_at - self.dedup_seconds)
+        except Exception as e:
+            log.warning(f"Could not record sent alerts in the state store: {e}")
+
+    def flush(self):
+        """
+        Send everything pending: one email, or a digest for several alerts.
+
+        Returns the number of alerts sent. When the email cannot be sent the
+        alerts stay queued and go out with the next flush.
+        """
+        with self.lock:
+            alerts, self.pending = self.pending, []
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+        if not alerts:
+            return 0
+        if not self.settings:
+            log.debug(f"Email not configured - {len(alerts)} alert(s) not sent")
+            return 0
+        msg = render_email(alerts, self.settings)
+        try:
+            self.pool.send(msg)
+        except Exception as e:
+            log.warning(f"Could not send notification email ({len(alerts)} alert(s) kept for the next attempt): {e}")
+            with self.lock:
+                self.pending = alerts + self.pending
+                self._start_timer()
+            return 0
+        self._remember_sent([alert["key"] for alert in alerts], time.time())
+        log.info(f"Notification sent to {self.settings['to']}: {msg['Subject']}")
+        return len(alerts)
+
+    def close(self):
+        """Send what is pending and close the SMTP connection."""
+        self.flush()
+        if self.pool:
+            self.pool.close()
+
+
+_notifier = None
+_notifier_lock = threading.Lock()
+
+
+def get_notifier():
+    """The Notifier shared by this process (flushed at exit)."""
+    global _notifier
+    with _notifier_lock:
+        if _notifier is None:
+            _notifier = Notifier.from_env()
+            atexit.register(_notifier.close)
+        return _notifier
+
+
+def load_result(path):
+    """A result file written by the bot or multi_account.py."""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Send the notification email for result files")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    send = subparsers.add_parser("send", help="Email the results that changed since the previous check")
+    send.add_argument("outputs", nargs="+", help="Result files (registration_output.json or results/*.json)")
+    send.add_argument("--all", action="store_true", help="Also send results that did not change")
+    send.add_argument("--digest", action="store_true", help="One email for all files")
+    args = parser.parse_args(argv)
+
+    notifier = Notifier.from_env(window=float("inf") if args.digest else 0)
+    if not notifier.settings:
+        log.error("Email is not configured (EMAIL_USERNAME / EMAIL_PASSWORD)")
+        return 1
+    paths = [path for pattern in args.outputs for path in sorted(glob.glob(pattern)) or [pattern]]
+    queued = 0
+    for path in paths:
+        if os.path.basename(path) == "summary.json":
+            continue
+        try:
+            output_data = load_result(path)
+        except (OSError, ValueError) as e:
+            output_data = {"status": "error", "message": f"Failed to parse output: {e}", "units": [], "error": None}
+            changes = {"changed": True, "reason": "⚠️ Bot Error - Check Logs"}
+        else:
+            changes = output_data.get("changes") or diff_results(None, output_data)
+        if not (args.all or changes.get("changed")):
+            continue
+        # With several result files (results/*.json), label each alert with its file
+        account = os.path.splitext(os.path.basename(path))[0] if len(paths) > 1 else None
+        queued += notifier.notify(output_data, account=account, changes=changes)
+    notifier.close()
+    if notifier.pending:
+        log.error(f"{len(notifier.pending)} alert(s) could not be sent")
+        return 1
+    if not queued:
+        log.info("Nothing changed - no notification sent")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
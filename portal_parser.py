@@ -0,0 +1,608 @@
+"""
+MMU Student Portal - HTML parsing backend
+Parses the ASP.NET WebForms pages served by the student portal (hidden state
+fields, dropdowns, SweetAlert messages and unit lists) from raw HTML, so the
+browser engine (driver.page_source), the HTTP engine and archived pages all
+share one parsing path.
+
+Usage (re-parse saved pages to check for regressions):
+    python portal_parser.py registration_units_page.html archive/*.html
+    python portal_parser.py ".snapshots/blobs/*/*.html.gz"
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import re
+import sys
+import time
+
+from lxml import etree
+from lxml import html as lxml_html
+
+from snapshot_store import load_snapshot
+from structured_log import get_logger
+
+log = get_logger()
+
+# Values of the options in the "Registration For" dropdown (Main__ddlRegFor)
+REGISTRATION_TYPE_VALUES = {
+    "Course Registration": "0",
+    "Supplementary": "2",
+    "Retake": "3"
+}
+
+TABLE_KEYWORDS = ['unit', 'course', 'code']
+TABLE_PREVIEW_ROWS = 10
+
+# swal("Title", "Text", "icon") / swal({title: "...", text: "..."}) / Swal.fire(...)
+SWAL_CALL_RE = re.compile(r"(?:swal|Swal\.fire)\s*\(\s*(?P<args>.*?)\)\s*(?:;|\.then|$)", re.S | re.M)
+SWAL_STRING_RE = re.compile(r"""(['"])((?:\\.|(?!\1).)*)\1""", re.S)
+SWAL_OPTION_RE = re.compile(r"""\b(title|text|html)\s*:\s*(['"])((?:\\.|(?!\2).)*)\2""", re.S)
+HTML_TAG_RE = re.compile(r"<[^>]+>")
+
+PAYMENT_RE = re.compile(r"\b(?:pay(?:ment|able)?s?|paid|unpaid|fees?|arrears?|balance|invoice)\b")
+# "Fee Balance: KES 12,500.00", "Balance: Ksh. (1,200.00)", "Balance 3,000.00 CR"
+BALANCE_TEXT_RE = re.compile(
+    r"balance(?![a-z])[^\d(\-]{0,40}?(?P<currency>KES|KSH|Ksh\.?|Kshs\.?)?\s*"
+    r"(?P<amount>\(?-?\s*[\d,]+(?:\.\d+)?\)?)(?:\s*(?P<suffix>CR|DR)\b)?",
+    re.I
+)
+AMOUNT_RE = re.compile(
+    r"(?P<currency>KES|KSH|Ksh\.?|Kshs\.?)?\s*(?P<amount>\(?-?\s*[\d,]+(?:\.\d+)?\)?)(?:\s*(?P<suffix>CR|DR)\b)?",
+    re.I
+)
+# IIS / ASP.NET pages served instead of the portal when it is overloaded or crashing
+SERVER_ERROR_RE = re.compile(
+    r"<title>\s*(?:Runtime Error|Service Unavailable|Server Too Busy|Server Error|"
+    r"\d{3}[ -](?:Internal Server Error|Service Unavailable|Bad Gateway|Gateway Time-?out))|"
+    r"Server Error in '[^']*' Application|HTTP Error 50[0-9]",
+    re.I
+)
+
+
+def _has_class(name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+# Selectors are compiled once at import time
+XP_FORMS = etree.XPath("//form")
+XP_VIEWSTATE = etree.XPath(".//input[@name='__VIEWSTATE']")
+XP_INPUTS = etree.XPath(".//input")
+XP_BUTTONS = etree.XPath(".//button")
+XP_SELECTS = etree.XPath(".//select")
+XP_OPTIONS = etree.XPath(".//option")
+XP_TEXTAREAS = etree.XPath(".//textarea")
+
+XP_SWAL_MODALS = etree.XPath(f"//*[{_has_class('swal2-modal')} or {_has_class('swal2-popup')}]")
+XP_SWAL_TITLE = etree.XPath(f".//h2 | .//*[{_has_class('swal2-title')}]")
+XP_SWAL_CONTENT = etree.XPath(f".//*[{_has_class('swal2-content')} or {_has_class('swal2-html-container')}]")
+XP_INLINE_SCRIPTS = etree.XPath("//script[not(@src)]")
+XP_PAGE_ERRORS = etree.XPath(
+    f"//*[{_has_class('alert-danger')} or {_has_class('error-message')}"
+    " or contains(@style, 'color: red') or contains(@style, 'color:red')]"
+)
+
+XP_UNITS_DROPDOWN = etree.XPath("//select[@id='Main__ddlUnits']")
+XP_MODAL_CHECKBOXES = etree.XPath("//*[@id='myModalCourseRegister']//input[@type='checkbox']")
+XP_CHECKBOXES = etree.XPath("//input[@type='checkbox']")
+XP_LABEL = etree.XPath(".//label")
+# Nearest row: the unit's own row in the modal table, not the layout table around the modal
+XP_ANCESTOR_ROW = etree.XPath("ancestor::tr[1]")
+XP_ROW_CELLS = etree.XPath("./td")
+XP_TABLES = etree.XPath("//table")
+XP_ROWS = etree.XPath(".//tr")
+XP_HEADER_CELLS = etree.XPath("./th")
+XP_BALANCE_ELEMENTS = etree.XPath(
+    "//*[contains(translate(@id, 'BALNCE', 'balnce'), 'balance') and not(self::input[@type='hidden'])]"
+)
+XP_BODY = etree.XPath("//body")
+
+
+def categorize_portal_message(message, balance=None):
+    """
+    Map a portal message to an error category.
+
+    Args:
+        message: The portal's message
+        balance: The account balance from parse_balance(), if known. A
+                 payment-sounding message on an account that owes nothing
+                 is not 'payment_required'; an unexplained error on an
+                 account that owes money is.
+
+    Returns one of 'already_registered', 'payment_required',
+    'registration_closed' or 'technical_error'.
+    """
+    message_lower = (message or "").lower()
+    owes = balance["amount"] > 0 if balance else None
+
+    if "already" in message_lower and "registered" in message_lower:
+        return "already_registered"
+    if PAYMENT_RE.search(message_lower) and owes is not False:
+        return "payment_required"
+    if "closed" in message_lower or "not allowed" in message_lower or "disabled" in message_lower:
+        return "registration_closed"
+    if owes:
+        return "payment_required"
+    return "technical_error"
+
+
+def parse_amount(text):
+    """
+    Parse a money amount like "KES 12,500.00", "(1,200.00)" or "3,000 CR".
+
+    Returns {'amount', 'currency'}; credits (parentheses, minus, CR) are
+    negative. Returns None if there is no amount.
+    """
+    match = AMOUNT_RE.search(text or "")
+    if not match or not re.search(r"\d", match.group("amount")):
+        return None
+    return _amount(match)
+
+
+def _amount(match):
+    raw = match.group("amount")
+    amount = float(re.sub(r"[^\d.]", "", raw) or 0)
+    if raw.startswith("(") or "-" in raw or (match.group("suffix") or "").upper() == "CR":
+        amount = -amount
+    currency = (match.group("currency") or "KES").upper().rstrip(".")
+    return {"amount": amount, "currency": "KES" if currency.startswith("KSH") else currency}
+
+
+def parse_balance(page_html):
+    """
+    Find the account (fee) balance on a portal page.
+
+    Looks at elements whose id mentions "balance" first, then at
+    "Balance: KES 12,500.00"-style text. Returns {'amount', 'currency',
+    'text'} with a positive amount for money owed, or None.
+    """
+    doc = parse_html(page_html)
+    for element in XP_BALANCE_ELEMENTS(doc):
+        text = element_text(element) or element.get("value", "")
+        parsed = parse_amount(text)
+        if parsed:
+            parsed["text"] = text
+            return parsed
+
+    for body in XP_BODY(doc) or [doc]:
+        text = element_text(body)
+        match = BALANCE_TEXT_RE.search(text)
+        if match:
+            parsed = _amount(match)
+            parsed["text"] = match.group(0).strip()
+            return parsed
+    return None
+
+
+def parse_html(page_html):
+    """Parse raw HTML into an lxml document (documents are passed through)."""
+    if not isinstance(page_html, (str, bytes)):
+        return page_html
+    return lxml_html.fromstring(page_html or "<html></html>")
+
+
+def element_text(element):
+    """Return the text of an element with whitespace collapsed."""
+    return " ".join(element.text_content().split())
+
+
+class FormState:
+    """
+    The postable state of an ASP.NET WebForms page.
+
+    Holds every successful control (hidden __VIEWSTATE/__EVENTVALIDATION,
+    text inputs, selected dropdown values, checked boxes) so the next
+    postback can carry them forward exactly as a browser would.
+    """
+
+    def __init__(self, action="", fields=None, submits=None, selects=None, inputs=None):
+        self.action = action
+        self.fields = fields or {}
+        self.submits = submits or []
+        self.selects = selects or {}
+        self.inputs = inputs or []
+
+    def find_submit(self, element_id):
+        """Return the submit button with the given id, or None."""
+        for submit in self.submits:
+            if submit["id"] == element_id:
+                return submit
+        return None
+
+    def payload(self, submit=None, event_target=None, overrides=None):
+        """
+        Build the form body for a postback.
+
+        Args:
+            submit: Submit button dict (from `submits`) that was "clicked"
+            event_target: Control name for a __doPostBack-style postback
+            overrides: Extra field values to set
+        """
+        data = dict(self.fields)
+        if overrides:
+            data.update(overrides)
+        if event_target is not None:
+            data["__EVENTTARGET"] = event_target
+            data["__EVENTARGUMENT"] = ""
+        if submit and submit.get("name"):
+            data[submit["name"]] = submit.get("value", "")
+        return data
+
+
+def parse_form(page_html):
+    """Extract the postable state of the main WebForms form on a page."""
+    doc = parse_html(page_html)
+    forms = XP_FORMS(doc)
+    form = None
+    for candidate in forms:
+        if XP_VIEWSTATE(candidate):
+            form = candidate
+            break
+    if form is None:
+        form = forms[0] if forms else doc
+
+    state = FormState(action=form.get("action", "") if form is not doc else "")
+
+    for inp in XP_INPUTS(form):
+        name = inp.get("name")
+        input_type = (inp.get("type") or "text").lower()
+        info = {
+            "id": inp.get("id", ""),
+            "name": name or "",
+            "type": input_type,
+            "value": inp.get("value", "")
+        }
+        if input_type in ("submit", "image", "button"):
+            state.submits.append(info)
+            continue
+        state.inputs.append(info)
+        if not name:
+            continue
+        if input_type in ("checkbox", "radio"):
+            if inp.get("checked") is not None:
+                state.fields[name] = inp.get("value", "on")
+        else:
+            state.fields[name] = inp.get("value", "")
+
+    for button in XP_BUTTONS(form):
+        if (button.get("type") or "submit").lower() == "submit":
+            state.submits.append({
+                "id": button.get("id", ""),
+                "name": button.get("name", ""),
+                "type": "submit",
+                "value": button.get("value", "")
+            })
+
+    for select in XP_SELECTS(form):
+        name = select.get("name")
+        options = [
+            {"value": opt.get("value", element_text(opt)), "text": element_text(opt),
+             "selected": opt.get("selected") is not None}
+            for opt in XP_OPTIONS(select)
+        ]
+        selected = [opt for opt in options if opt["selected"]] or options[:1]
+        state.selects[select.get("id", name or "")] = {
+            "name": name or "",
+            "options": options,
+            "onchange": select.get("onchange", ""),
+            "multiple": select.get("multiple") is not None
+        }
+        if name and selected:
+            state.fields[name] = selected[0]["value"]
+
+    for textarea in XP_TEXTAREAS(form):
+        if textarea.get("name"):
+            state.fields[textarea.get("name")] = textarea.text or ""
+
+    return state
+
+
+def _unescape_js(value):
+    """Undo the JavaScript string escaping used in inline swal() calls."""
+    try:
+        return json.loads('"' + value.replace('"', '\\"').replace("\\'", "'") + '"')
+    except ValueError:
+        return value.replace("\\'", "'").replace('\\"', '"')
+
+
+def extract_sweetalert(page_html):
+    """
+    Find a SweetAlert message on a page.
+
+    Looks for a rendered `.swal2-modal` first (browser page source), then for
+    inline `swal(...)` / `Swal.fire(...)` calls registered as startup scripts.
+
+    Returns (title, content); both are empty strings when there is no alert.
+    """
+    doc = parse_html(page_html)
+
+    for modal in XP_SWAL_MODALS(doc):
+        style = (modal.get("style") or "").replace(" ", "")
+        shown = ("display:block" in style or modal.get("aria-hidden") == "false"
+                 or " swal2-show " in f" {modal.get('class', '')} ")
+        if shown:
+            title = XP_SWAL_TITLE(modal)
+            content = XP_SWAL_CONTENT(modal)
+            return (
+                element_text(title[0]) if title else "",
+                element_text(content[0]) if content else ""
+            )
+
+    for script in XP_INLINE_SCRIPTS(doc):
+        source = script.text or ""
+        if "swal" not in source.lower():
+            continue
+        for call in SWAL_CALL_RE.finditer(source):
+            args = call.group("args")
+            options = {key: _unescape_js(value) for key, _, value in SWAL_OPTION_RE.findall(args)}
+            if options:
+                title = options.get("title", "")
+                content = options.get("text") or HTML_TAG_RE.sub(" ", options.get("html", ""))
+            else:
+                strings = [_unescape_js(match[1]) for match in SWAL_STRING_RE.findall(args)]
+                if not strings:
+                    continue
+                title = strings[0]
+                content = strings[1] if len(strings) > 1 else ""
+            title = " ".join(title.split())
+            content = " ".join(content.split())
+            if title or content:
+                return (title, content)
+
+    return ("", "")
+
+
+def extract_page_errors(page_html):
+    """Return the text of page-level error boxes (longer than 10 characters)."""
+    doc = parse_html(page_html)
+    errors = []
+    for element in XP_PAGE_ERRORS(doc):
+        text = element_text(element)
+        if text and len(text) > 10:
+            errors.append(text)
+    return errors
+
+
+def is_server_error_page(page_html):
+    """Whether the page is an IIS/ASP.NET error page rather than a portal page."""
+    return bool(page_html) and SERVER_ERROR_RE.search(page_html[:4096]) is not None
+
+
+def parse_get_units_response(page_html):
+    """
+    Categorize the page shown after clicking 'Get Units To Register'.
+
+    Returns the same (success, error_category, error_message) tuple as
+    click_get_units_button().
+    """
+    if isinstance(page_html, str) and is_server_error_page(page_html):
+        return (False, "technical_error", "The portal answered with a server error page")
+
+    doc = parse_html(page_html)
+
+    error_title, error_content = extract_sweetalert(doc)
+    if error_title or error_content:
+        full_message = f"{error_title}\n\n{error_content}".strip()
+        return (False, categorize_portal_message(full_message), full_message)
+
+    errors = extract_page_errors(doc)
+    if errors:
+        return (False, "technical_error", errors[0])
+
+    return (True, None, None)
+
+
+def parse_registration_response(page_html):
+    """
+    Categorize the page shown after clicking 'Submit Registration'.
+
+    Returns (registered, category, message): category is 'registered' when
+    the portal confirmed the submission, 'unconfirmed' when it showed no
+    message at all, or a categorize_portal_message() category.
+    """
+    doc = parse_html(page_html)
+
+    title, content = extract_sweetalert(doc)
+    message = f"{title}\n\n{content}".strip()
+    if message:
+        message_lower = message.lower()
+        succeeded = "success" in message_lower and "unsuccess" not in message_lower
+        if succeeded or ("registered" in message_lower and "already" not in message_lower
+                         and "not" not in message_lower):
+            return (True, "registered", message)
+        return (False, categorize_portal_message(message), message)
+
+    errors = extract_page_errors(doc)
+    if errors:
+        return (False, "technical_error", errors[0])
+
+    return (False, "unconfirmed", "The portal did not confirm the registration")
+
+
+def extract_dropdown_units(page_html):
+    """Return the units offered in the Main__ddlUnits dropdown."""
+    doc = parse_html(page_html)
+    units = []
+    for dropdown in XP_UNITS_DROPDOWN(doc)[:1]:
+        for option in XP_OPTIONS(dropdown):
+            text = element_text(option)
+            if text and text not in ["", "--Select--"]:
+                units.append({'text': text, 'value': option.get('value', text)})
+    return units
+
+
+def extract_checkbox_units(page_html):
+    """Return the units offered as checkboxes (modal first, then the whole page)."""
+    doc = parse_html(page_html)
+    checkboxes = XP_MODAL_CHECKBOXES(doc) or XP_CHECKBOXES(doc)
+
+    units = []
+    for cb in checkboxes:
+        parent = cb.getparent()
+        if parent is None:
+            continue
+        labels = XP_LABEL(parent)
+        unit_text = element_text(labels[0]) if labels else element_text(parent)
+
+        rows = XP_ANCESTOR_ROW(cb)
+        if rows:
+            cells = [element_text(td) for td in XP_ROW_CELLS(rows[0])]
+            row_text = " | ".join([cell for cell in cells if cell])
+            if row_text:
+                unit_text = row_text
+
+        if unit_text and len(unit_text) > 3:
+            units.append({
+                'text': unit_text,
+                'id': cb.get('id', ''),
+                'name': cb.get('name', ''),
+                'value': cb.get('value', 'on')
+            })
+    return units
+
+
+def extract_units_table(page_html, preview_rows=TABLE_PREVIEW_ROWS):
+    """
+    Return the first units table as {'header', 'rows', 'row_count'}, or None.
+
+    Only the first `preview_rows` rows are included (all of them when None).
+    """
+    doc = parse_html(page_html)
+    for table in XP_TABLES(doc):
+        rows = XP_ROWS(table)
+        if len(rows) <= 1:
+            continue
+        header_text = element_text(rows[0]).lower()
+        if not any(keyword in header_text for keyword in TABLE_KEYWORDS):
+            continue
+        header_cells = XP_HEADER_CELLS(rows[0]) or XP_ROW_CELLS(rows[0])
+        preview = []
+        end = None if preview_rows is None else preview_rows + 1
+        for row in rows[1:end]:
+            cells = [element_text(td) for td in XP_ROW_CELLS(row)]
+            preview.append(" | ".join([cell for cell in cells if cell]))
+        return {
+            "header": " | ".join([element_text(cell) for cell in header_cells]),
+            "rows": preview,
+            "row_count": len(rows)
+        }
+    return None
+
+
+def parse_unit_candidates(page_html):
+    """
+    Collect the candidates of every extraction strategy from raw HTML.
+
+    Same shape as unit_extractor.collect_unit_candidates(), with the checkbox
+    id/name/value in place of the live WebElement.
+    """
+    doc = parse_html(page_html)
+    checkbox_count = len(XP_MODAL_CHECKBOXES(doc) or XP_CHECKBOXES(doc))
+    return {
+        "dropdown": extract_dropdown_units(doc),
+        "dropdown_present": bool(XP_UNITS_DROPDOWN(doc)),
+        "checkboxes": extract_checkbox_units(doc) if checkbox_count else [],
+        "checkbox_count": checkbox_count,
+        "table": extract_units_table(doc)
+    }
+
+
+def select_units(candidates):
+    """Apply the strategy order of extract_available_units(): dropdown, then checkboxes."""
+    return candidates["dropdown"] or candidates["checkboxes"]
+
+
+def pick_units(units, unit_indices=None):
+    """
+    Choose the units to register.
+
+    Args:
+        units: Units from extract_available_units() / parse_available_units()
+        unit_indices: 1-based positions in `units`, or None for all of them
+    """
+    if unit_indices is None:
+        return list(units)
+    picked = []
+    seen = set()
+    for index in unit_indices:
+        if not 1 <= index <= len(units):
+            log.warning(f"Ignoring unit number {index} (only {len(units)} units available)")
+            continue
+        if index not in seen:
+            seen.add(index)
+            picked.append(units[index - 1])
+    return picked
+
+
+def parse_available_units(page_html):
+    """Return the registrable units on a page, as extract_available_units() would."""
+    return select_units(parse_unit_candidates(page_html))
+
+
+def page_fingerprint(page_html):
+    """
+    Hash the parts of a 'Get Units' response that matter: the alert text,
+    page errors, the units dropdown, the unit checkboxes and the units table.
+
+    Hidden state (__VIEWSTATE and friends) is left out, so the same portal
+    answer always gives the same fingerprint.
+    """
+    doc = parse_html(page_html)
+    fragments = {
+        "alert": list(extract_sweetalert(doc)),
+        "errors": extract_page_errors(doc),
+        "dropdown": [[unit["text"], unit["value"]] for unit in extract_dropdown_units(doc)],
+        "checkboxes": [unit["text"] for unit in extract_checkbox_units(doc)],
+        "table": extract_units_table(doc, preview_rows=None),
+    }
+    payload = json.dumps(fragments, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def parse_page(page_html):
+    """Parse a Unit Registration page into its status and units."""
+    doc = parse_html(page_html)
+    success, category, message = parse_get_units_response(doc)
+    return {
+        "success": success,
+        "category": category,
+        "message": message,
+        "units": [unit["text"] for unit in parse_available_units(doc)] if success else []
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-parse saved portal pages")
+    parser.add_argument("paths", nargs="+", help="HTML files or glob patterns")
+    parser.add_argument("--json", action="store_true", help="Print one JSON result per page")
+    args = parser.parse_args(argv)
+
+    paths = []
+    for pattern in args.paths:
+        paths.extend(sorted(glob.glob(pattern)) or [pattern])
+
+    summary = {}
+    started = time.perf_counter()
+    for path in paths:
+        try:
+            result = parse_page(load_snapshot(path))
+        except (OSError, RuntimeError, etree.ParserError) as e:
+            result = {"success": False, "category": "unreadable", "message": str(e), "units": []}
+
+        key = result["category"] or ("units" if result["units"] else "no_units")
+        summary[key] = summary.get(key, 0) + 1
+        if args.json:
+            print(json.dumps({"path": path, **result}))
+        else:
+            print(f"{path}: {key} ({len(result['units'])} units)")
+
+    elapsed = time.perf_counter() - started
+    print(f"\n[INFO] Parsed {len(paths)} pages in {elapsed:.3f}s", file=sys.stderr)
+    for key, count in sorted(summary.items()):
+        print(f"  {key}: {count}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
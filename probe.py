@@ -0,0 +1,72 @@
+"""
+MMU Student Portal - Change-detection probe
+Fetches only the 'Get Units' response over HTTP (reusing the cached portal
+session), fingerprints the alert, units dropdown and units table, and
+compares the fingerprint with the latest result in the state store. When
+nothing changed the full browser check, extraction and notifications can be
+skipped.
+"""
+
+import os
+
+from session_cache import SessionCache, cache_enabled
+from state_store import StateStore
+from structured_log import get_logger
+
+log = get_logger("probe")
+
+
+def probe_enabled():
+    """Whether to probe before the full check (MMU_PROBE, default false)."""
+    return os.getenv("MMU_PROBE", "false").lower() == "true"
+
+
+def run_probe(login_url, unit_registration_url, registration_number, password,
+              reg_type="Course Registration", store=None, rate_limiter=None):
+    """
+    Fetch the 'Get Units' response and compare it with the stored state.
+
+    Returns {'changed', 'fingerprint', 'previous'} where `previous` is the
+    latest stored result (StateStore.latest()) or None, or returns None when
+    the probe could not reach the response (run the full check).
+    """
+    from http_engine import HttpEngineError, HttpPortalSession
+    from portal_parser import page_fingerprint
+
+    cache = SessionCache() if cache_enabled() else None
+    session = HttpPortalSession(login_url, unit_registration_url, rate_limiter=rate_limiter)
+    try:
+        cookies = cache.load(registration_number, password) if cache else None
+        if not (cookies and session.resume_session(cookies)):
+            if cookies:
+                cache.invalidate(registration_number)
+            if not session.login(registration_number, password) or not session.navigate_to_unit_registration():
+                return None
+            if cache:
+                cache.store(registration_number, password, session.export_cookies())
+        if not session.select_registration_type(reg_type):
+            return None
+        session.click_get_units_button()
+    except HttpEngineError as e:
+        log.warning(str(e))
+        return None
+    except Exception as e:
+        log.warning(f"Probe failed: {e}")
+        return None
+    finally:
+        session.close()
+
+    fingerprint = page_fingerprint(session.page_source)
+    if store is None:
+        with StateStore() as store:
+            previous = store.latest(registration_number, reg_type)
+    else:
+        previous = store.latest(registration_number, reg_type)
+    # Results recorded without a fingerprint (full checks, failed runs) never match
+    changed = not previous or previous.get("fingerprint") != fingerprint
+    log.info(f"Portal response {'changed' if changed else 'unchanged'} ({fingerprint[:12]})")
+    return {
+        "changed": changed,
+        "fingerprint": fingerprint,
+        "previous": previous,
+    }
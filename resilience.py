@@ -0,0 +1,258 @@
+"""
+MMU Student Portal - Resilience for an overloaded portal
+During registration week the portal is slow and answers with ASP.NET error
+pages. Three pieces keep the bot working without adding to the overload:
+
+- LatencyTracker: per-step timeouts derived from the latencies actually seen
+- retry(): exponential back-off with full jitter, for idempotent steps only
+- CircuitBreaker: shared by every account in the process; after repeated
+  failures it pauses all portal traffic for a cool-down, then lets a single
+  trial request through before opening the gates again
+"""
+
+import os
+import random
+import threading
+import time
+from collections import deque
+
+from latency_history import get_latency_history
+from structured_log import get_logger
+
+log = get_logger("resilience")
+
+
+class PortalUnavailable(Exception):
+    """The portal did not answer, timed out or served an error page (worth retrying)."""
+
+
+def _env_float(name, default):
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        log.warning(f"Ignoring invalid {name}: {os.getenv(name)}")
+        return float(default)
+
+
+class LatencyTracker:
+    """
+    Recent latencies per step, and timeouts derived from them.
+
+    Once a step has `min_samples` observations its timeout is `multiplier`
+    times its p95, kept between `min_factor` and `max_factor` times the
+    configured timeout: it stretches when the portal slows down and tightens
+    again (so hung requests fail fast) when it recovers. Until then the p95
+    that `history` (a latency_history.LatencyHistory) has for the same step
+    at this hour is used, so a fresh process starts from what earlier runs
+    saw.
+
+    Args:
+        window: Observations kept per step
+        multiplier: Timeout as a multiple of the p95 (default: $MMU_TIMEOUT_MULTIPLIER, 3)
+        max_factor: Longest timeout, as a multiple of the configured one
+                    (default: $MMU_TIMEOUT_MAX_FACTOR, 3)
+        history: LatencyHistory consulted while a step has too few observations
+    """
+
+    def __init__(self, window=50, multiplier=None, min_factor=0.5, max_factor=None, min_samples=5, history=None):
+        self.window = window
+        self.multiplier = multiplier if multiplier is not None else _env_float("MMU_TIMEOUT_MULTIPLIER", "3")
+        self.min_factor = min_factor
+        self.max_factor = max_factor if max_factor is not None else _env_float("MMU_TIMEOUT_MAX_FACTOR", "3")
+        self.min_samples = min_samples
+        self.history = history
+        self.samples = {}
+        self.lock = threading.Lock()
+
+    def observe(self, step, seconds):
+        with self.lock:
+            self.samples.setdefault(step, deque(maxlen=self.window)).append(seconds)
+        if self.history:
+            self.history.observe_step(step, seconds)
+
+    def percentile(self, step, q):
+        """The q-th percentile (0-100) of the step's recent latencies, or None."""
+        with self.lock:
+            samples = sorted(self.samples.get(step, ()))
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(round(q / 100 * (len(samples) - 1))))]
+
+    def timeout(self, step, default):
+        """The timeout to use for `step`, given its configured `default`."""
+        with self.lock:
+            count = len(self.samples.get(step, ()))
+        if count >= self.min_samples:
+            p95 = self.percentile(step, 95)
+        else:
+            p95 = self.history.timeout_hint(step) if self.history else None
+            if p95 is None:
+                return default
+        adaptive = p95 * self.multiplier
+        return round(min(default * self.max_factor, max(default * self.min_factor, adaptive)), 2)
+
+
+class CircuitBreaker:
+    """
+    Stops all portal traffic while the portal is failing.
+
+    closed -> `threshold` consecutive failures -> open for `cooldown`
+    seconds -> half-open: one trial request; success closes the circuit,
+    failure opens it again for twice as long (up to `max_cooldown`).
+
+    Args:
+        threshold: Consecutive failures that open the circuit (default: $MMU_BREAKER_THRESHOLD, 5)
+        cooldown: First pause in seconds (default: $MMU_BREAKER_COOLDOWN, 30)
+        max_cooldown: Longest pause in seconds (default: 300)
+    """
+
+    def __init__(self, threshold=None, cooldown=None, max_cooldown=300, clock=time.monotonic, sleep=time.sleep):
+        self.threshold = int(threshold if threshold is not None else _env_float("MMU_BREAKER_THRESHOLD", "5"))
+        self.base_cooldown = cooldown if cooldown is not None else _env_float("MMU_BREAKER_COOLDOWN", "30")
+        self.max_cooldown = max_cooldown
+        self.clock = clock
+        self.sleep = sleep
+        self.state = "closed"
+        self.failures = 0
+        self.cooldown = self.base_cooldown
+        self.open_until = 0.0
+        self.trial_started = None
+        self.trips = 0
+        self.lock = threading.Lock()
+
+    def before_request(self):
+        """Block while the circuit is open; when half-open, let one caller at a time through."""
+        announced = False
+        while True:
+            with self.lock:
+                if self.state == "closed" or self.threshold <= 0:
+                    return
+                now = self.clock()
+                if self.state == "open" and now >= self.open_until:
+                    self.state = "half_open"
+                    self.trial_started = None
+                # A trial whose caller never reported back does not block forever
+                if self.state == "half_open" and (self.trial_started is None
+                                                  or now - self.trial_started > self.cooldown):
+                    self.trial_started = now
+                    return
+                wait = self.open_until - now if self.state == "open" else 0.1
+            if not announced:
+                log.info(f"Portal paused - waiting {max(wait, 0.1):.0f}s before the next request")
+                announced = True
+            self.sleep(min(max(wait, 0.1), 1.0))
+
+    def record_success(self):
+        with self.lock:
+            if self.state != "closed":
+                log.info("Portal is answering again - resuming traffic")
+            self.state = "closed"
+            self.failures = 0
+            self.cooldown = self.base_cooldown
+            self.trial_started = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.threshold <= 0:
+                return
+            if self.state == "half_open" or (self.state == "closed" and self.failures >= self.threshold):
+                self.state = "open"
+                self.open_until = self.clock() + self.cooldown
+                self.trips += 1
+                log.warning(f"Portal failing ({self.failures} failures in a row) - "
+                            f"pausing all traffic for {self.cooldown:.0f}s")
+                self.cooldown = min(self.max_cooldown, self.cooldown * 2)
+
+
+def retry_settings():
+    """(retries, base delay, max delay) from MMU_RETRIES / MMU_RETRY_BASE / MMU_RETRY_MAX."""
+    return (int(_env_float("MMU_RETRIES", "2")), _env_float("MMU_RETRY_BASE", "1"),
+            _env_float("MMU_RETRY_MAX", "15"))
+
+
+def backoff_delay(attempt, base, ceiling):
+    """Full-jitter exponential back-off for the attempt-th retry (0-based)."""
+    return random.uniform(0, min(ceiling, base * 2 ** attempt))
+
+
+def retry(step, attempt, is_failure=None, retries=None, breaker=None, sleep=time.sleep):
+    """
+    Run a portal step through the circuit breaker, retrying transient failures.
+
+    Only pass retries > 0 for idempotent steps (page loads, the registration
+    type and 'Get Units' postbacks) - never for logging in or submitting a
+    registration.
+
+    Args:
+        step: Name for logs
+        attempt: Callable doing the step once; PortalUnavailable means a
+                 transient failure
+        is_failure: Optional check of attempt()'s result for failures it
+                    reports by return value (e.g. False)
+        retries: Retries after the first attempt (default: $MMU_RETRIES, 2)
+
+    Returns attempt()'s last result; the last PortalUnavailable is re-raised.
+    """
+    default_retries, base, ceiling = retry_settings()
+    retries = default_retries if retries is None else retries
+    breaker = breaker or get_breaker()
+    for number in range(retries + 1):
+        breaker.before_request()
+        error = None
+        try:
+            result = attempt()
+        except PortalUnavailable as e:
+            error = e
+        else:
+            if is_failure is None or not is_failure(result):
+                breaker.record_success()
+                return result
+        breaker.record_failure()
+        if number == retries:
+            if error is not None:
+                raise error
+            return result
+        delay = backoff_delay(number, base, ceiling)
+        log.warning(f"{step} failed ({error or 'no result'}) - retry {number + 1}/{retries} in {delay:.1f}s",
+                    extra={"stage": step})
+        sleep(delay)
+
+
+def adaptive_timeouts_enabled():
+    """Whether timeouts follow observed latencies (MMU_ADAPTIVE_TIMEOUTS, default true)."""
+    return os.getenv("MMU_ADAPTIVE_TIMEOUTS", "true").lower() == "true"
+
+
+_tracker = None
+_breaker = None
+_shared_lock = threading.Lock()
+
+
+def get_latency_tracker():
+    """The LatencyTracker shared by every session in this process."""
+    global _tracker
+    with _shared_lock:
+        if _tracker is None:
+            _tracker = LatencyTracker(history=get_latency_history())
+        return _tracker
+
+
+def get_breaker():
+    """The CircuitBreaker shared by every account in this process."""
+    global _breaker
+    with _shared_lock:
+        if _breaker is None:
+            _breaker = CircuitBreaker()
+        return _breaker
+
+
+def step_timeout(step, default):
+    """The timeout for `step`: adaptive, or `default` when MMU_ADAPTIVE_TIMEOUTS=false."""
+    if not adaptive_timeouts_enabled():
+        return default
+    return get_latency_tracker().timeout(step, default)
+
+
+def observe_latency(step, seconds):
+    get_latency_tracker().observe(step, seconds)
@@ -0,0 +1,254 @@
+"""
+MMU Student Portal - Registration-window scheduler ("sniper")
+Polls slowly while the portal reports registration closed (or already
+registered), switches to second-level polling inside the expected opening
+window, backs off with jitter on technical errors, and registers or sends a
+notification the moment units become available. Outside the window it
+polls less while the latency history marks the hour as busy.
+
+Usage:
+    python scheduler.py --window 2026-01-05T08:00/2026-01-05T12:00 --fast-interval 5 --auto-register all
+
+The window can also be set with MMU_OPEN_WINDOW (same START/END format,
+ISO dates in local time).
+"""
+
+import argparse
+import os
+import random
+import time
+from datetime import datetime
+
+import course_registration_bot as bot
+from config import get_config, load_env
+from latency_history import defer_enabled, get_latency_history
+from notifier import get_notifier
+from structured_log import get_logger
+from timing import write_metrics
+
+log = get_logger("sniper")
+
+# Statuses that mean "not yet" - keep polling at the current pace
+WAITING_STATUSES = ("registration_closed", "already_registered", "payment_required", "no_units")
+
+
+class OpeningWindow:
+    """The period in which registration is expected to open (local time)."""
+
+    def __init__(self, start, end):
+        if end <= start:
+            raise ValueError("The opening window must end after it starts")
+        self.start = start
+        self.end = end
+
+    @classmethod
+    def parse(cls, value):
+        """Parse "START/END" ISO datetimes, e.g. 2026-01-05T08:00/2026-01-05T12:00."""
+        start, sep, end = (value or "").partition("/")
+        if not sep:
+            raise ValueError(f"Expected START/END, got: {value}")
+        return cls(datetime.fromisoformat(start.strip()), datetime.fromisoformat(end.strip()))
+
+    def contains(self, now):
+        return self.start <= now <= self.end
+
+    def seconds_until_start(self, now):
+        return max(0.0, (self.start - now).total_seconds())
+
+    def __str__(self):
+        return f"{self.start:%Y-%m-%d %H:%M} - {self.end:%Y-%m-%d %H:%M}"
+
+
+class PollPolicy:
+    """
+    Decides how long to wait before the next check.
+
+    Args:
+        slow_interval: Seconds between checks outside the opening window
+        fast_interval: Seconds between checks inside the opening window
+        backoff_base: First back-off after a technical error, in seconds
+        backoff_max: Longest back-off after repeated technical errors
+        window: OpeningWindow, or None to always poll slowly
+        history: LatencyHistory; outside the window, checks in busy hours are
+                 spaced `busy_stretch` times further apart, and an account that
+                 has already registered waits for the next quiet hour
+    """
+
+    def __init__(self, slow_interval=1800, fast_interval=5, backoff_base=10, backoff_max=300, window=None,
+                 history=None, busy_stretch=2):
+        self.slow_interval = slow_interval
+        self.fast_interval = fast_interval
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.window = window
+        self.history = history
+        self.busy_stretch = busy_stretch
+        self.failures = 0
+
+    def base_delay(self, now):
+        """The regular interval at `now`: fast inside the window, slow (but never past its start) outside."""
+        if self.window is None:
+            return self.slow_interval
+        if self.window.contains(now):
+            return self.fast_interval
+        if now < self.window.start:
+            return max(self.fast_interval, min(self.slow_interval, self.window.seconds_until_start(now)))
+        return self.slow_interval
+
+    def next_delay(self, status, now=None):
+        """Seconds to wait after a check that ended with `status`."""
+        now = now or datetime.now()
+        delay = self.base_delay(now)
+        if status == "error":
+            # Exponential back-off with full jitter so retries do not line up
+            self.failures += 1
+            ceiling = min(self.backoff_max, self.backoff_base * 2 ** (self.failures - 1))
+            delay = max(delay, random.uniform(self.backoff_base, max(self.backoff_base, ceiling)))
+        else:
+            self.failures = 0
+            delay = self.peak_delay(status, delay, now)
+        return delay
+
+    def peak_delay(self, status, delay, now):
+        """Stretch a regular delay outside the opening window while the portal is usually busy."""
+        if self.history is None or (self.window and self.window.contains(now)):
+            return delay
+        if not self.history.is_busy(now.timestamp()):
+            return delay
+        stretched = delay * self.busy_stretch
+        if status == "already_registered":
+            until_quiet = self.history.seconds_until_quiet(now.timestamp())
+            if until_quiet:
+                stretched = max(delay, until_quiet)
+        if self.window and now < self.window.start:
+            stretched = min(stretched, max(self.fast_interval, self.window.seconds_until_start(now)))
+        return stretched
+
+
+def notify_units_available(output_data, reg_type=None):
+    """Announce that units are available (and the registration result, if any)."""
+    log.detail("\n" + "🎯" * 40)
+    log.success(f"🎯  UNITS AVAILABLE: {output_data['message']}")
+    registration = output_data.get("registration")
+    if registration:
+        log.success(f"🎯  Registration: {registration['status']} - {registration['message']}")
+    log.detail("🎯" * 40)
+
+    subject = "✅ Units Now Available!" if not registration else f"📋 Registration {registration['status']}"
+    get_notifier().notify(output_data, reg_type=reg_type, changes={"changed": True, "reason": subject})
+
+
+class Sniper:
+    """
+    Polls until units are available.
+
+    Args:
+        check: Callable running one check and returning its output_data
+        policy: PollPolicy deciding the delay between checks
+        on_units: Called with output_data once units are available
+        output_path: Where each check's result is written (None if `check` writes it)
+    """
+
+    def __init__(self, check, policy, on_units=notify_units_available, output_path="registration_output.json"):
+        self.check = check
+        self.policy = policy
+        self.on_units = on_units
+        self.output_path = output_path
+        self.check_count = 0
+
+    def run(self, max_checks=None, sleep=time.sleep):
+        """Poll until units appear; returns the final output_data (None if stopped first)."""
+        if self.policy.window:
+            log.info(f"Opening window: {self.policy.window} "
+                     f"(every {self.policy.fast_interval}s inside, {self.policy.slow_interval}s outside)")
+        else:
+            log.info(f"No opening window set - checking every {self.policy.slow_interval}s")
+
+        while max_checks is None or self.check_count < max_checks:
+            output_data = self.check()
+            self.check_count += 1
+            if self.output_path:
+                bot.write_output(output_data, self.output_path)
+                write_metrics(output_data)
+
+            status = output_data["status"]
+            if status == "success":
+                log.info(f"Units available after {self.check_count} checks")
+                self.on_units(output_data)
+                return output_data
+
+            delay = self.policy.next_delay(status)
+            if status not in WAITING_STATUSES and status != "error":
+                log.warning(f"Unexpected status: {status}")
+            log.info(f"Check #{self.check_count}: {status} - next check in {delay:.1f}s")
+            sleep(delay)
+        return None
+
+
+def main(argv=None):
+    from portal_parser import REGISTRATION_TYPE_VALUES
+
+    load_env()
+    parser = argparse.ArgumentParser(description="Poll the portal until registration opens")
+    parser.add_argument("--window", default=os.getenv("MMU_OPEN_WINDOW"),
+                        help="Expected opening window as START/END ISO datetimes (local time)")
+    parser.add_argument("--slow-interval", type=float, default=float(os.getenv("MMU_SLOW_INTERVAL", "1800")),
+                        help="Seconds between checks outside the window")
+    parser.add_argument("--fast-interval", type=float, default=float(os.getenv("MMU_FAST_INTERVAL", "5")),
+                        help="Seconds between checks inside the window")
+    parser.add_argument("--backoff-max", type=float, default=float(os.getenv("MMU_BACKOFF_MAX", "300")),
+                        help="Longest wait after repeated technical errors")
+    parser.add_argument("--engine", choices=["selenium", "http"], default=get_config().engine)
+    parser.add_argument("--reg-type", default="Course Registration",
+                        choices=sorted(REGISTRATION_TYPE_VALUES))
+    parser.add_argument("--auto-register", default=os.getenv("MMU_AUTO_REGISTER"),
+                        help="Register as soon as units appear: 'all' or unit numbers like '1,3,5'")
+    parser.add_argument("--dry-run", action="store_true", default=os.getenv("MMU_DRY_RUN", "false").lower() == "true",
+                        help="With --auto-register, select the units but do not submit")
+    args = parser.parse_args(argv)
+
+    bot.require_credentials()
+    try:
+        window = OpeningWindow.parse(args.window) if args.window else None
+    except ValueError as e:
+        log.error(f"Invalid opening window: {e}")
+        return 1
+    policy = PollPolicy(args.slow_interval, args.fast_interval, backoff_max=args.backoff_max, window=window,
+                        history=get_latency_history() if defer_enabled() else None)
+    auto_register = bot.parse_auto_register(args.auto_register)
+
+    # Keyed by registration type like the daemon's alerts, so one change is one email
+    def on_units(output_data):
+        notify_units_available(output_data, reg_type=args.reg_type)
+
+    daemon = None
+    if args.engine == "selenium":
+        from daemon import BrowserDaemon
+
+        # One warm browser, so second-level polling only repeats the 'Get Units' postback.
+        # The sniper sends the alert, so the daemon does not email the same change too
+        daemon = BrowserDaemon(reg_type=args.reg_type, headless=True,
+                               auto_register=auto_register, dry_run=args.dry_run, notify=False)
+        sniper = Sniper(daemon.check, policy, on_units=on_units, output_path=None)
+    else:
+        def http_check():
+            output_data = bot.run_check(reg_type=args.reg_type, engine="http", headless=True, review=False,
+                                        auto_register=auto_register, dry_run=args.dry_run)
+            bot.record_result(output_data, reg_type=args.reg_type)
+            return output_data
+
+        sniper = Sniper(http_check, policy, on_units=on_units)
+
+    try:
+        result = sniper.run()
+    except KeyboardInterrupt:
+        log.info("Stopped by user.")
+        return 0
+    finally:
+        if daemon:
+            daemon.stop_browser()
+    return 0 if result else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
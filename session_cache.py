@@ -0,0 +1,167 @@
+"""
+MMU Student Portal - Encrypted session cache
+Keeps the authenticated portal cookies (ASP.NET session and auth) on disk,
+one encrypted file per registration number, so repeated checks can skip
+the login form until the session expires.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+DEFAULT_CACHE_DIR = ".session_cache"
+DEFAULT_TTL_SECONDS = 2 * 60 * 60
+DEFAULT_MAX_ENTRIES = 256
+KDF_ITERATIONS = 200_000
+# Shared by every entry in a cache directory, so a process derives each secret's key once
+SALT_FILE = ".salt"
+
+# Derived Fernet keys by (secret digest, salt), for the life of the process
+_derived_keys = {}
+_derived_keys_lock = threading.Lock()
+
+
+class SessionCache:
+    """
+    Encrypted on-disk cookie cache keyed by registration number.
+
+    Files are encrypted with a key derived from MMU_CACHE_KEY when set, or
+    from the account password otherwise, so a copied cache is useless
+    without the secret. Entries older than `ttl_seconds` are rejected and
+    the oldest entries are evicted beyond `max_entries`. The PBKDF2 key
+    derivation is slow on purpose, so its result is kept in memory for the
+    rest of the process.
+    """
+
+    def __init__(self, cache_dir=None, ttl_seconds=None, max_entries=None, secret=None):
+        self.cache_dir = cache_dir or os.getenv("MMU_SESSION_CACHE_DIR", DEFAULT_CACHE_DIR)
+        self.ttl_seconds = int(ttl_seconds or os.getenv("MMU_SESSION_TTL", DEFAULT_TTL_SECONDS))
+        self.max_entries = int(max_entries or os.getenv("MMU_SESSION_CACHE_MAX", DEFAULT_MAX_ENTRIES))
+        self.secret = secret if secret is not None else os.getenv("MMU_CACHE_KEY")
+
+    def _path(self, registration_number):
+        digest = hashlib.sha256(registration_number.strip().lower().encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest[:32]}.session")
+
+    def _salt(self):
+        """The cache directory's salt, created on first use."""
+        path = os.path.join(self.cache_dir, SALT_FILE)
+        try:
+            with open(path, "rb") as f:
+                salt = f.read()
+            if len(salt) == 16:
+                return salt
+        except OSError:
+            pass
+        salt = os.urandom(16)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(salt)
+        os.replace(tmp_path, path)
+        return salt
+
+    def _fernet(self, password, salt):
+        from cryptography.fernet import Fernet
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+
+        secret = (self.secret or password).encode("utf-8")
+        cache_key = (hashlib.sha256(secret).digest(), salt)
+        with _derived_keys_lock:
+            key = _derived_keys.get(cache_key)
+        if key is None:
+            kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=salt, iterations=KDF_ITERATIONS)
+            key = base64.urlsafe_b64encode(kdf.derive(secret))
+            with _derived_keys_lock:
+                _derived_keys[cache_key] = key
+        return Fernet(key)
+
+    def load(self, registration_number, password):
+        """
+        Return the cached cookies for an account, or None.
+
+        Expired, corrupt or undecryptable entries are removed.
+        """
+        from cryptography.fernet import InvalidToken
+
+        path = self._path(registration_number)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            salt = base64.b64decode(entry["salt"])
+            payload = self._fernet(password, salt).decrypt(entry["token"].encode("ascii"), ttl=self.ttl_seconds)
+            return json.loads(payload.decode("utf-8"))
+        except FileNotFoundError:
+            return None
+        except (InvalidToken, KeyError, ValueError, OSError):
+            self.invalidate(registration_number)
+            return None
+
+    def store(self, registration_number, password, cookies):
+        """Encrypt and save the cookies for an account, then apply eviction."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        salt = self._salt()
+        token = self._fernet(password, salt).encrypt(json.dumps(cookies).encode("utf-8"))
+        entry = {
+            "salt": base64.b64encode(salt).decode("ascii"),
+            "stored_at": int(time.time()),
+            "token": token.decode("ascii")
+        }
+
+        path = self._path(registration_number)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+        try:
+            os.chmod(path, 0o600)
+        except OSError:
+            pass
+
+        self.evict()
+
+    def invalidate(self, registration_number):
+        """Forget the cached session for an account."""
+        try:
+            os.remove(self._path(registration_number))
+        except OSError:
+            pass
+
+    def evict(self):
+        """Remove expired entries and the oldest ones beyond max_entries."""
+        try:
+            names = [name for name in os.listdir(self.cache_dir) if name.endswith(".session")]
+        except OSError:
+            return
+
+        now = time.time()
+        entries = []
+        for name in names:
+            path = os.path.join(self.cache_dir, name)
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                continue
+            if now - mtime > self.ttl_seconds:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            else:
+                entries.append((mtime, path))
+
+        entries.sort(reverse=True)
+        for _, path in entries[self.max_entries:]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def cache_enabled():
+    """Whether the session cache is switched on (MMU_SESSION_CACHE, default true)."""
+    return os.getenv("MMU_SESSION_CACHE", "true").lower() == "true"
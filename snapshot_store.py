@@ -0,0 +1,272 @@
+"""
+MMU Student Portal - Page snapshot store
+Keeps the portal pages worth looking at later (no units found, SweetAlert
+errors, rejected registrations) as compressed, content-addressed blobs.
+ASP.NET hidden state is stripped before hashing, so an unchanged page is
+stored once no matter how often it is seen; a size and age limit keeps the
+store bounded.
+
+Usage:
+    python snapshot_store.py list --label no_units
+    python snapshot_store.py show 3fa2c1 > page.html
+    python snapshot_store.py prune
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from structured_log import get_logger
+
+log = get_logger("snapshots")
+
+DEFAULT_DIR = ".snapshots"
+INDEX_FILE = "index.json"
+
+# __VIEWSTATE & co. change on every response and say nothing about the markup
+HIDDEN_STATE_RE = re.compile(
+    r'(<input[^>]*\bname="(?:__VIEWSTATE|__VIEWSTATEGENERATOR|__EVENTVALIDATION|__PREVIOUSPAGE)"[^>]*\bvalue=")'
+    r'[^"]*(")',
+    re.I
+)
+
+
+def normalize_page(page_html):
+    """The page without its per-response hidden state."""
+    return HIDDEN_STATE_RE.sub(r"\1\2", page_html or "")
+
+
+def default_codec():
+    """zstd when the zstandard package is installed, else gzip (MMU_SNAPSHOT_CODEC overrides)."""
+    codec = os.getenv("MMU_SNAPSHOT_CODEC", "").lower()
+    if codec == "zstd" and zstandard is None:
+        log.warning("zstandard is not installed, using gzip")
+        codec = "gzip"
+    return codec or ("zstd" if zstandard is not None else "gzip")
+
+
+def compress(data, codec):
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def load_snapshot(path):
+    """Read a snapshot blob (.html.zst / .html.gz) or a plain HTML file as bytes."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError("zstandard is needed to read .zst snapshots")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if path.endswith(".gz"):
+        return gzip.decompress(data)
+    return data
+
+
+class SnapshotStore:
+    """
+    Content-addressed page snapshots under `directory`.
+
+    blobs/<aa>/<sha256>.html.<gz|zst> holds each distinct page once;
+    index.json lists when each label (e.g. "get_units_payment_required")
+    last changed and which blob it pointed to.
+
+    Args:
+        directory: Where snapshots live (default: $MMU_SNAPSHOT_DIR or .snapshots)
+        max_bytes: Total blob size to keep (default: $MMU_SNAPSHOT_MAX_MB, 20 MB)
+        max_age_days: Drop snapshots older than this (default: $MMU_SNAPSHOT_MAX_AGE_DAYS, 30)
+        codec: "gzip" or "zstd" (default: zstd if installed)
+    """
+
+    def __init__(self, directory=None, max_bytes=None, max_age_days=None, codec=None):
+        self.directory = directory or os.getenv("MMU_SNAPSHOT_DIR", DEFAULT_DIR)
+        if max_bytes is None:
+            max_bytes = float(os.getenv("MMU_SNAPSHOT_MAX_MB", "20")) * 1024 * 1024
+        if max_age_days is None:
+            max_age_days = float(os.getenv("MMU_SNAPSHOT_MAX_AGE_DAYS", "30"))
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 24 * 60 * 60
+        self.codec = codec or default_codec()
+        self.index_path = os.path.join(self.directory, INDEX_FILE)
+        self.lock = threading.Lock()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"latest": {}, "snapshots": []}
+
+    def _save_index(self, index):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".index-")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(index, f, indent=1)
+        os.replace(tmp_path, self.index_path)
+
+    def blob_path(self, digest, codec=None):
+        suffix = "zst" if (codec or self.codec) == "zstd" else "gz"
+        return os.path.join(self.directory, "blobs", digest[:2], f"{digest}.html.{suffix}")
+
+    def save(self, page_html, label, account=None, reason=None):
+        """
+        Store a page under `label` unless it is the same as the label's last one.
+
+        Returns {'hash', 'path', 'new'}.
+        """
+        data = normalize_page(page_html).encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        key = f"{account}|{label}" if account else label
+        with self.lock:
+            os.makedirs(self.directory, exist_ok=True)
+            index = self._load_index()
+            existing = next((s for s in index["snapshots"] if s["hash"] == digest
+                             and os.path.exists(self.blob_path(digest, s["codec"]))), None)
+            latest = index["latest"].get(key)
+            if existing and latest and latest["hash"] == digest:
+                return {"hash": digest, "path": self.blob_path(digest, existing["codec"]), "new": False}
+
+            if existing:
+                codec, stored = existing["codec"], existing["stored_bytes"]
+                path = self.blob_path(digest, codec)
+            else:
+                codec = self.codec
+                path = self.blob_path(digest, codec)
+                blob = compress(data, codec)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "wb") as f:
+                    f.write(blob)
+                stored = len(blob)
+
+            entry = {
+                "hash": digest,
+                "label": label,
+                "account": account,
+                "reason": reason,
+                "captured_at": time.time(),
+                "bytes": len(data),
+                "stored_bytes": stored,
+                "codec": codec,
+            }
+            index["snapshots"].append(entry)
+            index["latest"][key] = entry
+            self._prune(index)
+            self._save_index(index)
+        log.info(f"Saved {label} page ({digest[:12]}, {stored / 1024:.1f} KB)")
+        return {"hash": digest, "path": path, "new": True}
+
+    def _prune(self, index, now=None):
+        """Apply the age and size limits to the index and delete unreferenced blobs."""
+        now = now or time.time()
+        snapshots = sorted(index["snapshots"], key=lambda s: s["captured_at"])
+        if self.max_age:
+            snapshots = [s for s in snapshots if now - s["captured_at"] <= self.max_age]
+
+        def total(entries):
+            seen = {}
+            for s in entries:
+                seen[s["hash"]] = s["stored_bytes"]
+            return sum(seen.values())
+
+        # Oldest first, but never the snapshot just written
+        while self.max_bytes and len(snapshots) > 1 and total(snapshots) > self.max_bytes:
+            snapshots.pop(0)
+
+        kept = {s["hash"] for s in snapshots}
+        for s in index["snapshots"]:
+            if s["hash"] not in kept:
+                try:
+                    os.remove(self.blob_path(s["hash"], s["codec"]))
+                except OSError:
+                    pass
+        index["snapshots"] = snapshots
+        index["latest"] = {key: entry for key, entry in index["latest"].items() if entry["hash"] in kept}
+        return index
+
+    def prune(self):
+        """Apply the retention limits now; returns the number of snapshots kept."""
+        with self.lock:
+            if not os.path.isdir(self.directory):
+                return 0
+            index = self._prune(self._load_index())
+            self._save_index(index)
+            return len(index["snapshots"])
+
+    def list(self, label=None):
+        """Snapshots (oldest first), optionally for one label."""
+        return [s for s in self._load_index()["snapshots"] if label is None or s["label"] == label]
+
+    def read(self, digest_prefix):
+        """The HTML of the snapshot whose hash starts with `digest_prefix`."""
+        for s in reversed(self.list()):
+            if s["hash"].startswith(digest_prefix):
+                return load_snapshot(self.blob_path(s["hash"], s["codec"])).decode("utf-8")
+        raise KeyError(f"No snapshot {digest_prefix}")
+
+
+def snapshots_enabled():
+    """Whether pages are snapshotted (MMU_SNAPSHOTS, default true)."""
+    return os.getenv("MMU_SNAPSHOTS", "true").lower() == "true"
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def save_snapshot(page_html, label, account=None, reason=None):
+    """Snapshot a page in the default store; never raises. Returns save()'s dict or None."""
+    global _store
+    if not snapshots_enabled() or not page_html:
+        return None
+    try:
+        with _store_lock:
+            if _store is None:
+                _store = SnapshotStore()
+        return _store.save(page_html, label, account, reason)
+    except Exception as e:
+        log.warning(f"Could not save {label} page: {e}")
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect the page snapshot store")
+    parser.add_argument("--dir", default=None, help="Snapshot directory (default: $MMU_SNAPSHOT_DIR or .snapshots)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    listing = subparsers.add_parser("list", help="List snapshots")
+    listing.add_argument("--label", default=None)
+    show = subparsers.add_parser("show", help="Print a snapshot's HTML")
+    show.add_argument("hash", help="Hash or hash prefix")
+    subparsers.add_parser("prune", help="Apply the size and age limits")
+    args = parser.parse_args(argv)
+
+    store = SnapshotStore(args.dir)
+    if args.command == "show":
+        try:
+            sys.stdout.write(store.read(args.hash))
+        except KeyError as e:
+            print(f"[ERROR] {e.args[0]}")
+            return 1
+    elif args.command == "prune":
+        print(f"[INFO] [snapshots] {store.prune()} snapshots kept")
+    else:
+        for s in store.list(args.label):
+            captured = time.strftime("%Y-%m-%d %H:%M", time.localtime(s["captured_at"]))
+            print(f"{s['hash'][:12]}  {captured}  {s['label']:<32} {s['stored_bytes'] / 1024:7.1f} KB  "
+                  f"{s.get('account') or ''}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
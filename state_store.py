@@ -0,0 +1,353 @@
+"""
+MMU Student Portal - Local state store
+Keeps every check result in an embedded SQLite database, keyed by account
+and registration type, and works out what changed since the previous check
+(status, units, error). Replaces the previous-state artifact diff in the
+GitHub workflow. Also remembers which notification alerts were sent, so a
+repeat is not emailed again by the next run.
+
+Usage:
+    python state_store.py history --account CIT-223-001/2023 --limit 10
+    python state_store.py github-output registration_output.json
+"""
+
+import argparse
+import html
+import json
+import os
+import sqlite3
+import time
+
+from unit_catalog import UnitCatalog
+
+DEFAULT_DB_PATH = "mmu_state.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    account TEXT NOT NULL,
+    reg_type TEXT NOT NULL,
+    checked_at TEXT NOT NULL,
+    status TEXT NOT NULL,
+    message TEXT,
+    error TEXT,
+    units TEXT NOT NULL,
+    engine TEXT,
+    fingerprint TEXT,
+    changed INTEGER NOT NULL,
+    catalog TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_checks_account ON checks (account, reg_type, id);
+CREATE INDEX IF NOT EXISTS idx_checks_status ON checks (status, checked_at);
+
+CREATE TABLE IF NOT EXISTS latest (
+    account TEXT NOT NULL,
+    reg_type TEXT NOT NULL,
+    check_id INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    message TEXT,
+    error TEXT,
+    units TEXT NOT NULL,
+    fingerprint TEXT,
+    updated_at TEXT NOT NULL,
+    catalog TEXT,
+    PRIMARY KEY (account, reg_type)
+);
+
+CREATE TABLE IF NOT EXISTS notifications (
+    key TEXT PRIMARY KEY,
+    sent_at REAL NOT NULL
+);
+"""
+
+# Columns added after the first release: (table, column, type)
+MIGRATIONS = [
+    ("checks", "catalog", "TEXT"),
+    ("latest", "catalog", "TEXT"),
+]
+
+
+def diff_results(previous, current):
+    """
+    Compare two results (registration_output.json schema; `previous` may be None).
+
+    Returns the incremental changes:
+        changed, first_check, previous_status, status,
+        units_added, units_removed, units_changed, error_changed, reason
+
+    When both results carry a unit catalog, units are compared by catalog
+    key: units_added / units_removed list keys and units_changed maps a
+    key to its changed fields ({field: [old, new]}). Older results without
+    a catalog are compared by their display strings.
+    """
+    status = current.get("status", "unknown")
+    units = current.get("units") or []
+    catalog = current.get("catalog")
+    changes = {
+        "changed": False,
+        "first_check": previous is None,
+        "previous_status": previous.get("status") if previous else None,
+        "status": status,
+        "units_added": [],
+        "units_removed": [],
+        "units_changed": {},
+        "error_changed": False,
+        "reason": "",
+    }
+
+    if previous is None:
+        changes["changed"] = True
+        changes["units_added"] = list(catalog) if catalog is not None else list(units)
+        changes["reason"] = "First Check - Course Registration Status"
+        return changes
+
+    previous_units = previous.get("units") or []
+    if catalog is not None and previous.get("catalog") is not None:
+        keyed = UnitCatalog.from_dict(catalog).diff(UnitCatalog.from_dict(previous["catalog"]))
+        changes["units_added"] = keyed["added"]
+        changes["units_removed"] = keyed["removed"]
+        changes["units_changed"] = keyed["changed"]
+    else:
+        previous_set = set(previous_units)
+        current_set = set(units)
+        changes["units_added"] = [unit for unit in units if unit not in previous_set]
+        changes["units_removed"] = [unit for unit in previous_units if unit not in current_set]
+    changes["error_changed"] = (current.get("error") or "") != (previous.get("error") or "")
+
+    if status != changes["previous_status"]:
+        changes["changed"] = True
+        if status == "success":
+            changes["reason"] = "✅ Units Now Available!"
+        elif status == "error":
+            changes["reason"] = "⚠️ Registration Error - Status Changed"
+        else:
+            changes["reason"] = "📊 Status Changed"
+    elif status == "success" and (changes["units_added"] or changes["units_removed"] or changes["units_changed"]):
+        changes["changed"] = True
+        unit_diff = len(units) - len(previous_units)
+        if unit_diff > 0:
+            changes["reason"] = f"✨ {unit_diff} New Unit(s) Available!"
+        else:
+            changes["reason"] = "📝 Available Units Changed"
+    elif status == "error" and changes["error_changed"]:
+        changes["changed"] = True
+        changes["reason"] = "⚠️ Different Error - Check Details"
+    return changes
+
+
+class StateStore:
+    """
+    SQLite history of check results.
+
+    `checks` holds every result; `latest` holds the most recent one per
+    account and registration type, so diffing a run costs one indexed
+    lookup per account. `notifications` holds when each alert key
+    (notifier.alert_key) was last emailed.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv("MMU_STATE_DB", DEFAULT_DB_PATH)
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        """Add the columns a database created by an older version is missing."""
+        with self.conn:
+            for table, column, column_type in MIGRATIONS:
+                columns = {row["name"] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+                if column not in columns:
+                    self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @staticmethod
+    def _result(row):
+        if row is None:
+            return None
+        result = dict(row)
+        result["units"] = json.loads(result["units"])
+        result["catalog"] = json.loads(result["catalog"]) if result.get("catalog") else None
+        return result
+
+    def latest(self, account, reg_type):
+        """The most recent result for an account, or None."""
+        row = self.conn.execute(
+            "SELECT * FROM latest WHERE account = ? AND reg_type = ?", (account, reg_type)
+        ).fetchone()
+        return self._result(row)
+
+    def history(self, account, reg_type=None, limit=20):
+        """Recent results for an account, newest first."""
+        if reg_type is None:
+            rows = self.conn.execute(
+                "SELECT * FROM checks WHERE account = ? ORDER BY id DESC LIMIT ?", (account, limit)
+            ).fetchall()
+        else:
+            rows = self.conn.execute(
+                "SELECT * FROM checks WHERE account = ? AND reg_type = ? ORDER BY id DESC LIMIT ?",
+                (account, reg_type, limit)
+            ).fetchall()
+        return [self._result(row) for row in rows]
+
+    def _record(self, account, reg_type, output_data, fingerprint=None):
+        previous = self.latest(account, reg_type)
+        changes = diff_results(previous, output_data)
+        checked_at = output_data.get("checked_at") or time.strftime("%Y-%m-%dT%H:%M:%S%z")
+        units = json.dumps(output_data.get("units") or [], ensure_ascii=False)
+        catalog = output_data.get("catalog")
+        catalog = None if catalog is None else json.dumps(catalog, ensure_ascii=False, separators=(",", ":"))
+        cursor = self.conn.execute(
+            "INSERT INTO checks (account, reg_type, checked_at, status, message, error, units, engine, "
+            "fingerprint, changed, catalog) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (account, reg_type, checked_at, output_data.get("status", "unknown"), output_data.get("message"),
+             output_data.get("error"), units, output_data.get("engine"), fingerprint, int(changes["changed"]),
+             catalog)
+        )
+        self.conn.execute(
+            "INSERT OR REPLACE INTO latest (account, reg_type, check_id, status, message, error, units, "
+            "fingerprint, updated_at, catalog) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (account, reg_type, cursor.lastrowid, output_data.get("status", "unknown"),
+             output_data.get("message"), output_data.get("error"), units, fingerprint, checked_at, catalog)
+        )
+        return changes
+
+    def record(self, account, reg_type, output_data, fingerprint=None):
+        """Store a result and return what changed since the previous one (see diff_results)."""
+        with self.conn:
+            return self._record(account, reg_type, output_data, fingerprint)
+
+    def record_many(self, entries):
+        """
+        Store many results in one transaction.
+
+        Args:
+            entries: Iterable of (account, reg_type, output_data, fingerprint)
+
+        Returns {(account, reg_type): changes}.
+        """
+        with self.conn:
+            return {
+                (account, reg_type): self._record(account, reg_type, output_data, fingerprint)
+                for account, reg_type, output_data, fingerprint in entries
+            }
+
+
+    def sent_notifications(self, keys, since):
+        """The alert keys among `keys` that were emailed at or after `since` (epoch seconds)."""
+        keys = list(keys)
+        if not keys:
+            return set()
+        rows = self.conn.execute(
+            f"SELECT key FROM notifications WHERE sent_at >= ? AND key IN ({', '.join('?' * len(keys))})",
+            [since] + keys
+        ).fetchall()
+        return {row["key"] for row in rows}
+
+    def record_notifications(self, keys, sent_at, forget_before=None):
+        """Remember that alerts were emailed at `sent_at`, dropping keys last sent before `forget_before`."""
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO notifications (key, sent_at) VALUES (?, ?)",
+                                  [(key, sent_at) for key in keys])
+            if forget_before is not None:
+                self.conn.execute("DELETE FROM notifications WHERE sent_at < ?", (forget_before,))
+
+
+def state_enabled():
+    """Whether results are recorded in the state store (MMU_STATE_STORE, default true)."""
+    return os.getenv("MMU_STATE_STORE", "true").lower() == "true"
+
+
+def format_balance(balance):
+    """"KES 12,500.00 owed" / "KES 0.00" for the notification, or ""."""
+    if not balance:
+        return ""
+    amount = balance["amount"]
+    text = f"{balance['currency']} {abs(amount):,.2f}"
+    if amount > 0:
+        return f"{text} owed"
+    return f"{text} in credit" if amount < 0 else text
+
+
+def write_github_output(output_path, github_output=None):
+    """
+    Turn a result file (with the 'changes' the bot recorded) into GitHub
+    Actions step outputs for the notification step.
+    """
+    github_output = github_output or os.environ["GITHUB_OUTPUT"]
+    try:
+        with open(output_path, "r", encoding="utf-8") as f:
+            current = json.load(f)
+        changes = current.get("changes") or diff_results(None, current)
+        units = current.get("units") or []
+        values = {
+            "status": current.get("status", "unknown"),
+            "message": current.get("message") or "No message",
+            "error": current.get("error") or "",
+            "unit_count": len(units),
+            "should_notify": "true" if changes["changed"] else "false",
+            "change_reason": changes["reason"],
+            "units_html": "".join(f"<li>{html.escape(str(unit))}</li>" for unit in units),
+            "balance": format_balance(current.get("balance")),
+        }
+    except Exception as e:
+        print(f"Error parsing output: {e}")
+        values = {
+            "status": "error",
+            "message": f"Failed to parse output: {e}",
+            "error": "",
+            "unit_count": 0,
+            "should_notify": "true",
+            "change_reason": "⚠️ Bot Error - Check Logs",
+            "units_html": "",
+            "balance": "",
+        }
+
+    with open(github_output, "a", encoding="utf-8") as f:
+        for key, value in values.items():
+            value = str(value).replace("%", "%25").replace("\n", "%0A").replace("\r", "%0D")
+            f.write(f"{key}={value}\n")
+    for key in ("status", "unit_count", "should_notify", "change_reason"):
+        print(f"{key}: {values[key]}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect the local check history")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    history = subparsers.add_parser("history", help="Show recent results for an account")
+    history.add_argument("--account", default=os.getenv("MMU_REG_NUMBER"), required=not os.getenv("MMU_REG_NUMBER"))
+    history.add_argument("--reg-type", default=None)
+    history.add_argument("--limit", type=int, default=20)
+    history.add_argument("--db", default=None)
+
+    github = subparsers.add_parser("github-output", help="Write GitHub Actions outputs for a result file")
+    github.add_argument("output", nargs="?", default="registration_output.json")
+
+    args = parser.parse_args(argv)
+    if args.command == "github-output":
+        write_github_output(args.output)
+        return 0
+
+    with StateStore(args.db) as store:
+        for result in store.history(args.account, args.reg_type, args.limit):
+            marker = "*" if result["changed"] else " "
+            print(f"{marker} {result['checked_at']}  {result['reg_type']:<20} {result['status']:<20} "
+                  f"{len(result['units'])} units  {result['message'] or ''}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
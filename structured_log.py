@@ -0,0 +1,198 @@
+"""
+MMU Student Portal - Structured logging
+Every module logs through a queue: the calling thread only enqueues the
+record and a background listener formats and writes it, so logging stays
+off the hot path of multi-account and daemon runs. The console shows the
+familiar "[INFO] [http] ..." lines (or JSON with MMU_LOG_FORMAT=json) and
+MMU_LOG_FILE receives JSON lines with the event fields (account, stage,
+category, latency_ms, ...).
+
+Levels, lowest first: DEBUG, DETAIL (banners and unit listings), INFO,
+SUCCESS, WARNING, ERROR. MMU_LOG_LEVEL=INFO hides the banners and listings.
+
+    log = get_logger("http")
+    log.info("Loading page", extra={"stage": "navigation"})
+    with log_context(account="CIT-223-001/2023"):
+        ...
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+
+DETAIL = 15
+SUCCESS = 25
+logging.addLevelName(DETAIL, "DETAIL")
+logging.addLevelName(SUCCESS, "SUCCESS")
+
+ROOT_LOGGER = "mmu"
+
+# Extra fields copied into JSON events when present
+EVENT_FIELDS = ("account", "reg_type", "stage", "outcome", "category", "status", "engine",
+                "latency_ms", "units", "check_number")
+
+_context = contextvars.ContextVar("mmu_log_context", default={})
+_queue = queue.Queue()
+_listener = None
+_configure_lock = threading.Lock()
+
+
+class BotLogger(logging.LoggerAdapter):
+    """Logger for one component; adds success() and detail()."""
+
+    def process(self, msg, kwargs):
+        kwargs["extra"] = {**self.extra, **kwargs.get("extra", {})}
+        return msg, kwargs
+
+    def success(self, msg, *args, **kwargs):
+        self.log(SUCCESS, msg, *args, **kwargs)
+
+    def detail(self, msg, *args, **kwargs):
+        """Banners, rules and listings - hidden at MMU_LOG_LEVEL=INFO."""
+        self.log(DETAIL, msg, *args, **kwargs)
+
+
+class ContextFilter(logging.Filter):
+    """Stamps records with the log_context() fields of the thread that logged them."""
+
+    def filter(self, record):
+        for key, value in _context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+class TextFormatter(logging.Formatter):
+    """'[INFO] [component] message', as the bot has always printed."""
+
+    def format(self, record):
+        component = getattr(record, "component", None)
+        message = record.getMessage()
+        if record.levelno == DETAIL:
+            return message
+        prefix = f"[{record.levelname}]" + (f" [{component}]" if component else "")
+        return f"{prefix} {message}"
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line."""
+
+    def format(self, record):
+        event = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "component": getattr(record, "component", None),
+            "message": record.getMessage(),
+        }
+        for field in EVENT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                event[field] = value
+        return json.dumps(event, ensure_ascii=False, default=str)
+
+
+def _level(value, default):
+    value = (value or "").strip().upper()
+    if not value:
+        return default
+    level = logging.getLevelName(value)
+    return level if isinstance(level, int) else default
+
+
+class LazyQueueHandler(QueueHandler):
+    """Starts the listener on the first record, after .env has been loaded."""
+
+    def emit(self, record):
+        if _listener is None:
+            configure_logging()
+        super().emit(record)
+
+
+def configure_logging(level=None, console_format=None, log_file=None):
+    """
+    (Re)configure the pipeline; called automatically on the first record.
+
+    Args:
+        level: Console level name (default: $MMU_LOG_LEVEL or DETAIL)
+        console_format: "text" or "json" (default: $MMU_LOG_FORMAT or text)
+        log_file: Also append JSON lines here (default: $MMU_LOG_FILE), at
+                  $MMU_LOG_FILE_LEVEL (default DEBUG)
+    """
+    global _listener
+    with _configure_lock:
+        if _listener is not None:
+            _listener.stop()
+
+        console_level = _level(level or os.getenv("MMU_LOG_LEVEL"), DETAIL)
+        console = logging.StreamHandler(sys.stdout)
+        console.setLevel(console_level)
+        json_console = (console_format or os.getenv("MMU_LOG_FORMAT", "text")).lower() == "json"
+        console.setFormatter(JsonFormatter() if json_console else TextFormatter())
+        handlers = [console]
+
+        lowest = console_level
+        log_file = log_file or os.getenv("MMU_LOG_FILE")
+        if log_file:
+            file_handler = logging.FileHandler(log_file, encoding="utf-8")
+            file_handler.setLevel(_level(os.getenv("MMU_LOG_FILE_LEVEL"), logging.DEBUG))
+            file_handler.setFormatter(JsonFormatter())
+            handlers.append(file_handler)
+            lowest = min(lowest, file_handler.level)
+
+        # Records below every handler's level are dropped before they are queued
+        logging.getLogger(ROOT_LOGGER).setLevel(lowest)
+        _listener = QueueListener(_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+
+
+def flush_logs():
+    """Wait until every queued record has been written (before prompts and plain prints)."""
+    if _listener is not None:
+        _queue.join()
+
+
+def shutdown_logging():
+    """Write what is still queued and stop the listener."""
+    global _listener
+    with _configure_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+atexit.register(shutdown_logging)
+
+
+def _install():
+    handler = LazyQueueHandler(_queue)
+    handler.addFilter(ContextFilter())
+    root = logging.getLogger(ROOT_LOGGER)
+    root.handlers = [handler]
+    root.setLevel(logging.DEBUG)
+    root.propagate = False
+
+
+_install()
+
+
+def get_logger(component=None):
+    """The logger for a component ("http", "daemon", ...; None for the bot itself)."""
+    name = f"{ROOT_LOGGER}.{component}" if component else ROOT_LOGGER
+    return BotLogger(logging.getLogger(name), {"component": component})
+
+
+@contextmanager
+def log_context(**fields):
+    """Add fields (account, reg_type, ...) to every record logged inside the block."""
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
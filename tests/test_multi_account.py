@@ -0,0 +1,70 @@
+"""
+Multi-account sweep tests against the local stand-in portal (mock_portal.MockPortal).
+
+    python -m pytest tests
+"""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import set_config
+from mock_portal import MockPortal
+from multi_account import run_accounts
+
+ACCOUNT = {"reg_number": "TEST/001/2024", "password": "secret"}
+
+
+class MultiAccountTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.portal = MockPortal().start()
+        self.addCleanup(self.portal.stop)
+
+        def path(name):
+            return os.path.join(self.directory.name, name)
+
+        patcher = mock.patch.dict(os.environ, {
+            "MMU_PORTAL_URL": self.portal.base_url, "MMU_ENGINE": "http", "MMU_PROBE": "true",
+            "MMU_STATE_STORE": "true", "MMU_STATE_DB": path("state.db"), "MMU_SESSION_CACHE": "false",
+            "MMU_SNAPSHOT_DIR": path("snapshots"), "MMU_LATENCY_HISTORY_FILE": path("latency.json"),
+            "MMU_LOCATOR_CACHE_FILE": path("locators.json"),
+        })
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        set_config(None)
+        self.addCleanup(set_config, None)
+
+    def sweep(self):
+        output_dir = os.path.join(self.directory.name, "results")
+        run_accounts([ACCOUNT], output_dir, concurrency=1, rate=0, engine="http")
+        with open(os.path.join(output_dir, "TEST_001_2024.json")) as f:
+            return json.load(f)
+
+    def test_second_sweep_skips_an_unchanged_account(self):
+        first = self.sweep()
+        self.assertEqual(first["status"], "success")
+        self.assertEqual(first["engine"], "http")
+
+        second = self.sweep()
+        self.assertEqual(second["engine"], "probe")
+        self.assertEqual(second["status"], "success")
+        self.assertEqual(second["units"], first["units"])
+
+    def test_changed_portal_is_checked_again(self):
+        self.sweep()
+        self.portal.configure(unit_count=3)
+
+        second = self.sweep()
+        self.assertEqual(second["engine"], "http")
+        self.assertEqual(len(second["units"]), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+"""
+Notifier tests against the local SMTP sink (mock_smtp.SmtpSink).
+
+    python -m pytest tests
+"""
+
+import os
+import socket
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_smtp import SmtpSink
+from notifier import Notifier, SmtpPool, alert_key
+from state_store import StateStore
+
+
+def sink_settings(port):
+    return {"host": "127.0.0.1", "port": port, "security": "none", "username": "bot@example.com",
+            "password": None, "to": "student@example.com"}
+
+
+def free_port():
+    """A local port nothing is listening on."""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def result(status="success", units=("BIT 2101 - Data Structures",)):
+    return {"status": status, "message": f"{status} message", "units": list(units), "error": None}
+
+
+class NotifierTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.state_path = os.path.join(self.directory.name, "state.db")
+        patcher = mock.patch.dict(os.environ, {"MMU_STATE_STORE": "true"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.sink = SmtpSink().start()
+        self.addCleanup(self.sink.stop)
+
+    def notifier(self, port=None, **kwargs):
+        notifier = Notifier(sink_settings(port or self.sink.port), window=kwargs.pop("window", 0),
+                            state_path=self.state_path, **kwargs)
+        self.addCleanup(notifier.close)
+        return notifier
+
+    def test_sends_one_email_per_alert(self):
+        notifier = self.notifier()
+        self.assertTrue(notifier.notify(result(), changes={"changed": True, "reason": "Units Now Available!"}))
+
+        self.assertEqual(len(self.sink.messages), 1)
+        message = self.sink.messages[0]
+        self.assertEqual(message["Subject"], "Units Now Available!")
+        self.assertEqual(message["To"], "student@example.com")
+        self.assertIn("BIT 2101 - Data Structures", message.get_body(("plain",)).get_content())
+
+    def test_digest_collects_alerts_into_one_email_over_one_connection(self):
+        notifier = self.notifier(window=float("inf"))
+        notifier.notify(result(), account="A/1")
+        notifier.notify(result("registration_closed", units=()), account="B/2")
+        self.assertEqual(self.sink.messages, [])
+
+        self.assertEqual(notifier.flush(), 2)
+        notifier.notify(result(), account="C/3")
+        notifier.flush()
+
+        self.assertEqual(len(self.sink.messages), 2)
+        self.assertTrue(self.sink.messages[0]["Subject"].startswith("📋 2 registration updates"))
+        self.assertEqual(self.sink.connection_count, 1)
+
+    def test_duplicate_is_dropped_within_the_process(self):
+        notifier = self.notifier()
+        self.assertTrue(notifier.notify(result(), account="A/1"))
+        self.assertFalse(notifier.notify(result(), account="A/1"))
+        self.assertTrue(notifier.notify(result("error"), account="A/1"))
+        self.assertEqual(len(self.sink.messages), 2)
+
+    def test_duplicate_is_dropped_by_a_later_run(self):
+        self.notifier().notify(result(), account="A/1")
+
+        later = self.notifier()
+        self.assertFalse(later.notify(result(), account="A/1"))
+        self.assertEqual(len(self.sink.messages), 1)
+        with StateStore(self.state_path) as store:
+            self.assertEqual(store.sent_notifications([alert_key(result(), "A/1")], 0),
+                             {alert_key(result(), "A/1")})
+
+    def test_sent_alert_is_repeated_after_the_dedup_window(self):
+        self.notifier(dedup_seconds=0).notify(result(), account="A/1")
+        self.assertTrue(self.notifier(dedup_seconds=0).notify(result(), account="A/1"))
+        self.assertEqual(len(self.sink.messages), 2)
+
+    def test_failed_send_keeps_alerts_queued(self):
+        notifier = self.notifier(port=free_port(), window=float("inf"))
+        notifier.notify(result(), account="A/1")
+
+        self.assertEqual(notifier.flush(), 0)
+        self.assertEqual(len(notifier.pending), 1)
+        # Still queued, so a repeat is not queued twice
+        self.assertFalse(notifier.notify(result(), account="A/1"))
+
+        notifier.pool = SmtpPool(sink_settings(self.sink.port))
+        self.assertEqual(notifier.flush(), 1)
+        self.assertEqual(notifier.pending, [])
+        self.assertEqual(len(self.sink.messages), 1)
+
+    def test_unsent_alert_is_not_remembered(self):
+        failing = self.notifier(port=free_port())
+        failing.notify(result(), account="A/1")
+
+        self.assertTrue(self.notifier().notify(result(), account="A/1"))
+        self.assertEqual(len(self.sink.messages), 1)
+
+    def test_pool_reconnects_after_the_server_drops_the_connection(self):
+        pool = SmtpPool(sink_settings(self.sink.port))
+        self.addCleanup(pool.close)
+        notifier = self.notifier(pool=pool)
+        notifier.notify(result(), account="A/1")
+        pool.connection.close()
+
+        notifier.notify(result(), account="B/2")
+        self.assertEqual(len(self.sink.messages), 2)
+        self.assertEqual(pool.connections, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+"""
+MMU Student Portal - Per-stage timing
+Times each stage of a check (wall time, WebDriver commands sent, outcome)
+and optionally exports the last run to a Prometheus/OpenMetrics textfile.
+"""
+
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+from structured_log import get_logger
+
+log = get_logger()
+
+
+class StageTimer:
+    """
+    Collects one span per stage of a check.
+
+        timer = StageTimer()
+        timer.attach(driver)
+        with timer.span("login") as span:
+            if not login_to_portal(driver):
+                span["outcome"] = "failed"
+    """
+
+    def __init__(self):
+        self.spans = []
+        self.commands = 0
+
+    def attach(self, driver):
+        """Count every WebDriver command sent through this driver (replaces an earlier timer's count)."""
+        if driver is None or getattr(driver, "_mmu_stage_timer", None) is self:
+            return
+        original = getattr(driver, "_mmu_original_execute", None) or driver.execute
+        driver._mmu_original_execute = original
+
+        def counting_execute(driver_command, params=None):
+            self.commands += 1
+            return original(driver_command, params)
+
+        driver.execute = counting_execute
+        driver._mmu_stage_timer = self
+
+    @contextmanager
+    def span(self, stage):
+        """Time a stage; the yielded dict's "outcome" may be changed inside the block."""
+        span = {"stage": stage, "outcome": "ok"}
+        commands = self.commands
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span["outcome"] = "interrupted" if isinstance(e, KeyboardInterrupt) else "error"
+            raise
+        finally:
+            span["seconds"] = round(time.perf_counter() - started, 3)
+            span["webdriver_commands"] = self.commands - commands
+            self.spans.append(span)
+            log.debug(f"Stage '{stage}' {span['outcome']} in {span['seconds']}s",
+                      extra={"stage": stage, "outcome": span["outcome"],
+                             "latency_ms": round(span["seconds"] * 1000)})
+
+    def total_seconds(self):
+        return round(sum(span["seconds"] for span in self.spans), 3)
+
+
+def metrics_path():
+    """Where to export metrics (MMU_METRICS_FILE), or None."""
+    return os.getenv("MMU_METRICS_FILE") or None
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_metrics(output_data, openmetrics=False):
+    """Render a result's spans in the Prometheus text (or OpenMetrics) format."""
+    engine = _label(output_data.get("engine", "unknown"))
+    spans = output_data.get("timings", [])
+    lines = [
+        "# HELP mmu_bot_stage_duration_seconds Wall time of each stage in the last check.",
+        "# TYPE mmu_bot_stage_duration_seconds gauge",
+    ]
+    for span in spans:
+        lines.append(f'mmu_bot_stage_duration_seconds{{engine="{engine}",stage="{_label(span["stage"])}",'
+                     f'outcome="{_label(span["outcome"])}"}} {span["seconds"]}')
+    lines += [
+        "# HELP mmu_bot_stage_webdriver_commands WebDriver commands sent during each stage of the last check.",
+        "# TYPE mmu_bot_stage_webdriver_commands gauge",
+    ]
+    for span in spans:
+        lines.append(f'mmu_bot_stage_webdriver_commands{{engine="{engine}",stage="{_label(span["stage"])}"}} '
+                     f'{span["webdriver_commands"]}')
+    lines += [
+        "# HELP mmu_bot_check_duration_seconds Wall time of the last check.",
+        "# TYPE mmu_bot_check_duration_seconds gauge",
+        f'mmu_bot_check_duration_seconds{{engine="{engine}",status="{_label(output_data.get("status"))}"}} '
+        f'{round(sum(span["seconds"] for span in spans), 3)}',
+        "# HELP mmu_bot_last_check_timestamp_seconds When the last check finished.",
+        "# TYPE mmu_bot_last_check_timestamp_seconds gauge",
+        f"mmu_bot_last_check_timestamp_seconds {time.time():.3f}",
+    ]
+    if openmetrics:
+        lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics(output_data, path=None):
+    """
+    Export a result's timings to a textfile for the node_exporter textfile
+    collector (or any OpenMetrics scraper when the path ends in .om or
+    MMU_METRICS_FORMAT=openmetrics). Written atomically; never raises.
+    """
+    path = path or metrics_path()
+    if not path:
+        return
+    openmetrics = path.endswith(".om") or os.getenv("MMU_METRICS_FORMAT", "").lower() == "openmetrics"
+    try:
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile("w", dir=directory, delete=False, suffix=".tmp") as f:
+            f.write(format_metrics(output_data, openmetrics))
+        os.replace(f.name, path)
+        log.info(f"Metrics written to {path}")
+    except Exception as e:
+        log.warning(f"Could not write metrics file: {e}")
@@ -0,0 +1,464 @@
+"""
+MMU Student Portal - Registration type scanner
+Checks several registration types (Course Registration, Supplementary,
+Retake) on one logged-in session: the HTTP engine posts 'Get Units' for
+every type in parallel on a shared connection pool, and the browser engine
+drives one tab per type, firing each tab's postback before waiting on any
+of them. The per-type results are merged into one output.
+
+Usage:
+    python course_registration_bot.py --reg-types all
+    python course_registration_bot.py --reg-types "Course Registration,Retake" --engine http
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import course_registration_bot as bot
+from config import get_config
+from latency_history import observe_spans
+from lean_profile import page_loads, record_page_load
+from locator_cache import locator_stats
+from resilience import PortalUnavailable
+from session_cache import SessionCache, cache_enabled
+from snapshot_store import save_snapshot
+from state_store import state_enabled
+from structured_log import get_logger, log_context
+from timing import StageTimer
+from waits import (
+    any_of,
+    checkbox_modal_rendered,
+    get_wait_engine,
+    sweetalert_visible,
+    units_dropdown_populated,
+)
+
+log = get_logger()
+http_log = get_logger("http")
+
+# Order used for "all" and for picking the overall status
+REGISTRATION_TYPES = ["Course Registration", "Supplementary", "Retake"]
+
+# arguments: registration type value. Selects it; if the dropdown posts back
+# on change, marks the old document so we can tell when the new one is in.
+SELECT_TYPE_SCRIPT = """
+const dropdown = document.getElementById('Main__ddlRegFor');
+if (!dropdown) return {found: false, offered: false, postback: false};
+if (![...dropdown.options].some(option => option.value === arguments[0])) {
+    return {found: true, offered: false, postback: false};
+}
+dropdown.value = arguments[0];
+const postback = (dropdown.getAttribute('onchange') || '').includes('__doPostBack');
+if (postback) {
+    window._mmuScanPending = true;
+    setTimeout(() => dropdown.dispatchEvent(new Event('change', {bubbles: true})), 0);
+}
+return {found: true, offered: true, postback: postback};
+"""
+
+# Clicks 'Get Units To Register' without waiting for the postback
+CLICK_GET_UNITS_SCRIPT = """
+const button = document.getElementById('Main__btnRegister');
+if (!button) return false;
+window._mmuScanPending = true;
+setTimeout(() => button.click(), 0);
+return true;
+"""
+
+PAGE_SETTLED_SCRIPT = """
+return !window._mmuScanPending && document.readyState !== 'loading'
+    && !!document.getElementById('Main__btnRegister');
+"""
+
+
+def parse_reg_types(value):
+    """
+    Parse --reg-types / MMU_REG_TYPES: "all" or comma-separated type names.
+
+    Returns a list of registration types in scan order.
+    """
+    from portal_parser import REGISTRATION_TYPE_VALUES
+
+    if not value or value.strip().lower() == "all":
+        return list(REGISTRATION_TYPES)
+    reg_types = []
+    for name in value.split(","):
+        name = name.strip()
+        if not name:
+            continue
+        if name not in REGISTRATION_TYPE_VALUES:
+            raise ValueError(f"Unknown registration type: {name}")
+        if name not in reg_types:
+            reg_types.append(name)
+    return reg_types
+
+
+def page_settled(driver):
+    return driver.execute_script(PAGE_SETTLED_SCRIPT)
+
+
+def type_error(message, error):
+    """A failed result for one registration type."""
+    output_data = bot.new_output()
+    output_data["status"] = "error"
+    output_data["message"] = message
+    output_data["error"] = error
+    return output_data
+
+
+def get_units_result(success, error_category, error_message, units):
+    """Build one type's result from its 'Get Units' response and extracted units."""
+    output_data = bot.new_output()
+    if not success:
+        bot.record_portal_message(output_data, error_category, error_message)
+    elif units:
+        bot.record_units(output_data, units)
+    else:
+        output_data["status"] = "no_units"
+        output_data["message"] = "No units found available for registration"
+    return output_data
+
+
+# --- HTTP engine ---------------------------------------------------------
+
+def scan_http_type(session, reg_type):
+    """
+    Run one type on its own fork of the session.
+
+    Returns its result, or None when the Selenium engine should take over.
+    """
+    from http_engine import HttpEngineError
+
+    with log_context(reg_type=reg_type):
+        started = time.perf_counter()
+        if not session.select_registration_type(reg_type):
+            output_data = type_error(f"Could not select {reg_type} type",
+                                     "Registration type selection failed")
+        else:
+            try:
+                success, error_category, error_message = session.click_get_units_button()
+            except HttpEngineError as e:
+                http_log.warning(f"{reg_type}: {e}")
+                return None
+            except PortalUnavailable as e:
+                http_log.error(f"{reg_type}: portal unavailable: {e}")
+                output_data = bot.new_output()
+                bot.record_portal_unavailable(output_data, e)
+                output_data["engine"] = "http"
+                return output_data
+            units = session.extract_available_units() if success else []
+            if success and not units:
+                # Units may be rendered by scripts the HTTP engine does not run
+                return None
+            output_data = get_units_result(success, error_category, error_message, units)
+        output_data["engine"] = "http"
+        output_data["duration_seconds"] = round(time.perf_counter() - started, 3)
+        return output_data
+
+
+def scan_http(reg_types, registration_number, password, rate_limiter=None, timer=None):
+    """
+    Log in once over HTTP and post 'Get Units' for every type in parallel.
+
+    Returns {reg_type: result} for the types the HTTP engine could finish.
+    """
+    from http_engine import HttpPortalSession
+
+    timer = timer or StageTimer()
+    config = get_config()
+    session = HttpPortalSession(config.login_url, config.unit_registration_url, pool_size=max(4, len(reg_types)),
+                                rate_limiter=rate_limiter)
+    cache = SessionCache() if cache_enabled() else None
+    try:
+        # Separate restore, login and navigation spans, as in run_check, so only a
+        # fresh login is recorded as a login latency
+        cookies = cache.load(registration_number, password) if cache else None
+        restored = False
+        if cookies:
+            with timer.span("http_session_restore") as span:
+                restored = session.resume_session(cookies)
+                span["outcome"] = "ok" if restored else "miss"
+            if not restored:
+                cache.invalidate(registration_number)
+        if not restored:
+            with timer.span("http_login") as span:
+                if not session.login(registration_number, password):
+                    span["outcome"] = "failed"
+                    return {}
+            with timer.span("http_navigation") as span:
+                if not session.navigate_to_unit_registration():
+                    span["outcome"] = "failed"
+                    return {}
+            if cache:
+                bot.save_session(session.export_cookies(), cache, registration_number, password)
+
+        # Every fork starts from the Unit Registration page we are on
+        with timer.span("http_scan") as span:
+            with ThreadPoolExecutor(max_workers=len(reg_types)) as executor:
+                futures = {reg_type: executor.submit(scan_http_type, session.fork(), reg_type)
+                           for reg_type in reg_types}
+            results = {reg_type: future.result() for reg_type, future in futures.items()
+                       if future.result() is not None}
+            if len(results) < len(reg_types):
+                span["outcome"] = "partial"
+        return results
+    except PortalUnavailable as e:
+        # Handing the types to the browser would only add to the overload
+        http_log.error(f"Portal unavailable: {e}")
+        results = {reg_type: bot.new_output() for reg_type in reg_types}
+        for output_data in results.values():
+            bot.record_portal_unavailable(output_data, e)
+        return results
+    except Exception as e:
+        http_log.error(f"Scan failed: {e}")
+        return {}
+    finally:
+        session.close()
+
+
+# --- browser engine ------------------------------------------------------
+
+def scan_tabs(driver, reg_types, timer=None):
+    """
+    Run registration type -> 'Get Units' -> extraction for every type, one
+    tab each, starting on the Unit Registration page of a logged-in driver.
+
+    Each phase starts the postback in every tab before waiting on any, so the
+    portal round trips overlap. Returns {reg_type: result}.
+    """
+    from portal_parser import REGISTRATION_TYPE_VALUES, parse_get_units_response
+
+    timer = timer or StageTimer()
+    waits = get_wait_engine(driver)
+    results = {}
+    started = time.perf_counter()
+
+    with timer.span("tabs"):
+        tabs = {reg_types[0]: driver.current_window_handle}
+        for reg_type in reg_types[1:]:
+            driver.switch_to.new_window("tab")
+            driver.execute_script("window.location.href = arguments[0];", get_config().unit_registration_url)
+            tabs[reg_type] = driver.current_window_handle
+        log.info(f"Scanning {len(tabs)} registration types in {len(tabs)} tabs")
+
+    def settle(reg_type, step):
+        driver.switch_to.window(tabs[reg_type])
+        if waits.until(step, page_settled, name=f"page_settled:{reg_type}", required=False):
+            return True
+        results[reg_type] = type_error("Could not navigate to Unit Registration page",
+                                       f"The {reg_type} tab did not load")
+        return False
+
+    with timer.span("registration_type") as span:
+        for reg_type in list(tabs):
+            if not settle(reg_type, "navigation"):
+                continue
+            selected = driver.execute_script(SELECT_TYPE_SCRIPT, REGISTRATION_TYPE_VALUES[reg_type])
+            if not selected["offered"]:
+                log.error(f"Registration type not offered: {reg_type}")
+                results[reg_type] = type_error(f"Could not select {reg_type} type",
+                                               "Registration type selection failed")
+            else:
+                log.success(f"Selected: {reg_type}")
+        pending = [reg_type for reg_type in tabs if reg_type not in results]
+        if len(pending) < len(tabs):
+            span["outcome"] = "partial"
+
+    with timer.span("get_units") as span:
+        for reg_type in pending:
+            if settle(reg_type, "registration_type") and not driver.execute_script(CLICK_GET_UNITS_SCRIPT):
+                results[reg_type] = type_error("Could not load units for registration",
+                                               "Get Units button not found")
+        pending = [reg_type for reg_type in pending if reg_type not in results]
+
+    with timer.span("extraction") as span:
+        for reg_type in pending:
+            if not settle(reg_type, "get_units"):
+                continue
+            waits.until(
+                "get_units_render",
+                any_of(alert=sweetalert_visible, units_dropdown=units_dropdown_populated,
+                       checkbox_modal=checkbox_modal_rendered),
+                name=f"get_units_outcome:{reg_type}",
+                required=False
+            )
+            record_page_load(driver, f"get_units:{reg_type}")
+            page_source = driver.page_source
+            success, error_category, error_message = parse_get_units_response(page_source)
+            if not success:
+                save_snapshot(page_source, f"get_units_{error_category}", reason=error_message)
+            log.info(f"{reg_type}: {'units loaded' if success else error_message}",
+                     extra={"reg_type": reg_type, "stage": "get_units"})
+            units = bot.extract_available_units(driver, reg_type) if success else []
+            results[reg_type] = get_units_result(success, error_category, error_message, units)
+        if any(results[reg_type]["status"] == "error" for reg_type in tabs):
+            span["outcome"] = "partial"
+
+    elapsed = round(time.perf_counter() - started, 3)
+    for reg_type in tabs:
+        results[reg_type].setdefault("engine", "selenium")
+        results[reg_type]["duration_seconds"] = elapsed
+    driver.switch_to.window(tabs[reg_types[0]])
+    return results
+
+
+def scan_browser(reg_types, registration_number, password, headless, timer):
+    """Start a browser, log in once and scan every type in tabs."""
+    from selenium.webdriver.common.by import By
+
+    driver = None
+    try:
+        with timer.span("driver_startup") as span:
+            driver = bot.setup_driver(headless=headless)
+            if driver is None:
+                span["outcome"] = "failed"
+                raise RuntimeError("Could not start the browser")
+        timer.attach(driver)
+
+        cache = SessionCache() if cache_enabled() else None
+        restored = False
+        if cache:
+            with timer.span("session_restore") as span:
+                restored = bot.restore_cached_session(driver, cache, registration_number, password)
+                span["outcome"] = "ok" if restored else "miss"
+        if not restored:
+            with timer.span("login") as span:
+                if not bot.login_to_portal(driver, registration_number, password):
+                    span["outcome"] = "failed"
+                    raise RuntimeError("Login failed - Please check credentials")
+            with timer.span("navigation") as span:
+                if not bot.navigate_to_unit_registration(driver):
+                    span["outcome"] = "failed"
+                    raise RuntimeError("Could not navigate to Unit Registration page")
+            if cache:
+                bot.save_session(driver.get_cookies(), cache, registration_number, password)
+
+        if not driver.find_elements(By.ID, "Main__ddlRegFor"):
+            raise RuntimeError("Registration type dropdown not found")
+        results = scan_tabs(driver, reg_types, timer)
+        return results, {"waits": get_wait_engine(driver).records, "page_loads": page_loads(driver),
+                         "locators": locator_stats(driver)}
+    finally:
+        if driver:
+            log.info("Closing browser...")
+            with timer.span("teardown"):
+                driver.quit()
+
+
+# --- merged output -------------------------------------------------------
+
+def merge_results(results, reg_types):
+    """
+    Merge per-type results into one output in the registration_output.json
+    schema, with every type's own result under "types".
+
+    The overall status is "success" if any type has units, otherwise the
+    status of the first type scanned.
+    """
+    output_data = bot.new_output()
+    ordered = [reg_type for reg_type in reg_types if reg_type in results]
+    output_data["types"] = {reg_type: results[reg_type] for reg_type in ordered}
+    if not ordered:
+        output_data["status"] = "error"
+        output_data["message"] = "No registration type could be checked"
+        return output_data
+
+    available = [reg_type for reg_type in ordered if results[reg_type]["status"] == "success"]
+    if available:
+        output_data["status"] = "success"
+        output_data["units"] = [f"{reg_type}: {unit}" for reg_type in available
+                                for unit in results[reg_type]["units"]]
+        output_data["catalog"] = {f"{reg_type}: {key}": record for reg_type in available
+                                  for key, record in (results[reg_type].get("catalog") or {}).items()}
+        output_data["message"] = (f"Found {len(output_data['units'])} units available for registration "
+                                  f"({', '.join(available)})")
+    else:
+        first = results[ordered[0]]
+        output_data["status"] = first["status"]
+        output_data["message"] = "; ".join(f"{reg_type}: {results[reg_type]['message']}" for reg_type in ordered)
+    errors = [f"{reg_type}: {results[reg_type]['error']}" for reg_type in ordered if results[reg_type].get("error")]
+    output_data["error"] = "\n".join(errors) or None
+    return output_data
+
+
+def run_scan(reg_types, registration_number=None, password=None, engine=None, headless=None,
+             rate_limiter=None):
+    """
+    Check every registration type in `reg_types` on one login.
+
+    Args:
+        reg_types: Registration types to check, e.g. parse_reg_types("all")
+        registration_number, password: Account to check (default: MMU_REG_NUMBER / MMU_PASSWORD)
+        engine: "selenium" or "http" (default: $MMU_ENGINE); the HTTP engine
+                hands the types it cannot finish to the browser
+        headless: Run Chrome headless (default: in CI only)
+        rate_limiter: Shared limiter acquired before each HTTP portal request
+
+    Returns the merged output (see merge_results()).
+    """
+    config = get_config()
+    registration_number = registration_number or config.registration_number
+    password = password or config.password
+    engine = engine or config.engine
+    headless = bot.is_ci() if headless is None else headless
+    timer = StageTimer()
+    results = {}
+    browser_info = {}
+
+    try:
+        if engine == "http":
+            log.info(f"Using HTTP engine for {len(reg_types)} registration types")
+            results = scan_http(reg_types, registration_number, password, rate_limiter, timer)
+        remaining = [reg_type for reg_type in reg_types if reg_type not in results]
+        if remaining:
+            if engine == "http":
+                log.warning(f"HTTP engine could not finish {', '.join(remaining)}, using the browser...")
+            browser_results, browser_info = scan_browser(remaining, registration_number, password, headless, timer)
+            results.update(browser_results)
+    except KeyboardInterrupt:
+        log.info("Script interrupted by user.")
+        output_data = merge_results(results, reg_types)
+        output_data["status"] = "interrupted"
+        output_data["message"] = "Script interrupted by user"
+        output_data["timings"] = timer.spans
+        return output_data
+    except Exception as e:
+        log.error(f"An error occurred: {e}")
+        for reg_type in reg_types:
+            results.setdefault(reg_type, type_error("An unexpected error occurred", str(e)))
+
+    output_data = merge_results(results, reg_types)
+    engines = sorted({result.get("engine", "selenium") for result in results.values()})
+    output_data["engine"] = "+".join(engines) or engine
+    output_data.update({key: value for key, value in browser_info.items() if value})
+    output_data["timings"] = timer.spans
+    # The scan's get_units span covers every type, so only the login and navigation are
+    # comparable with other checks (a restored session has neither span)
+    observe_spans(timer.spans, stages=("login", "http_login", "navigation", "http_navigation"))
+
+    log.detail("\n" + "=" * 80)
+    log.detail("REGISTRATION TYPES")
+    log.detail("=" * 80)
+    for reg_type, result in output_data["types"].items():
+        log.detail(f"  {reg_type:<20} {result['status']:<20} {result['message']}")
+    return output_data
+
+
+def record_scan(output_data, registration_number=None):
+    """
+    Record every type's result in the state store (keyed per type) and
+    summarise what changed under output_data["changes"].
+    """
+    if not state_enabled():
+        return None
+    changed = []
+    for reg_type, result in output_data.get("types", {}).items():
+        changes = bot.record_result(result, registration_number, reg_type)
+        if changes and changes["changed"]:
+            changed.append((reg_type, changes))
+    output_data["changes"] = {
+        "changed": bool(changed),
+        "types": [reg_type for reg_type, _ in changed],
+        "reason": "; ".join(f"{reg_type}: {changes['reason']}" for reg_type, changes in changed),
+    }
+    return output_data["changes"]
@@ -0,0 +1,234 @@
+"""
+MMU Student Portal - Unit catalog
+Parses the display strings the portal gives for each unit ("BIT 2101 - Data
+Structures" in the dropdown, "BIT 2101 | Data Structures | 3" in the
+checkbox table) into compact records, keeps them in a catalog keyed by unit
+code and diffs two catalogs field by field.
+
+A result stores its catalog under "catalog" as {key: record}, sorted by key,
+with empty fields left out:
+
+    "catalog": {"BIT 2101": {"title": "Data Structures", "hours": 3, "ref": "Main_chkUnit_0"}}
+"""
+
+import re
+
+# "BIT 2101", "BIT2101", "CIT-2104A"
+UNIT_CODE_RE = re.compile(r"\b([A-Z]{2,5})[ \-]?(\d{3,4}[A-Z]?)\b")
+HOURS_RE = re.compile(r"^(\d{1,2}(?:\.\d+)?)\s*(?:ch|hrs?|hours?|credit\s*hours?|credits?|units?)?$", re.IGNORECASE)
+CELL_SPLIT_RE = re.compile(r"\s*\|\s*")
+GROUP_RE = re.compile(r"^(?:group|grp|class|stream|section)\s*[:\-]?\s*(\S+)$", re.IGNORECASE)
+# Ordinal UnitCatalog.add() appends to the key of a second unit with the same key ("BIT 2101 #2")
+ORDINAL_RE = re.compile(r" #\d+$")
+
+FIELDS = ("code", "title", "hours", "group", "ref")
+# Compared by UnitCatalog.diff(); `ref` is only a locator and shifts when units are inserted
+DIFF_FIELDS = ("code", "title", "hours", "group")
+
+
+def normalize_code(code):
+    """'bit2101' / 'BIT-2101' -> 'BIT 2101', or None."""
+    match = UNIT_CODE_RE.search((code or "").upper())
+    return f"{match.group(1)} {match.group(2)}" if match else None
+
+
+def _hours(text):
+    match = HOURS_RE.match(text)
+    if not match:
+        return None
+    value = float(match.group(1))
+    return int(value) if value.is_integer() else value
+
+
+class Unit:
+    """
+    One unit offered for registration.
+
+    Args:
+        code: Normalized unit code ("BIT 2101"), or None if none was found
+        title: Unit name
+        hours: Credit hours (int or float), or None
+        group: Class group / stream, or None
+        ref: Dropdown option value or checkbox id used to select the unit
+        text: The display string it was parsed from
+    """
+
+    __slots__ = FIELDS + ("text",)
+
+    def __init__(self, code=None, title=None, hours=None, group=None, ref=None, text=None):
+        self.code = code
+        self.title = title
+        self.hours = hours
+        self.group = group
+        self.ref = ref
+        self.text = text
+
+    @classmethod
+    def parse(cls, text, ref=None):
+        """
+        Parse a display string: '|'-separated table cells, or a dropdown
+        option such as 'BIT 2101 - Data Structures'.
+        """
+        text = " ".join((text or "").split())
+        cells = [cell for cell in CELL_SPLIT_RE.split(text) if cell]
+        code = None
+        title_cells = []
+        hours = group = None
+        for cell in cells:
+            if code is None:
+                match = UNIT_CODE_RE.search(cell.upper())
+                if match and match.start() == 0:
+                    code = f"{match.group(1)} {match.group(2)}"
+                    rest = cell[match.end():].strip(" -:")
+                    if rest:
+                        title_cells.append(rest)
+                    continue
+            if hours is None and _hours(cell) is not None:
+                hours = _hours(cell)
+                continue
+            group_match = GROUP_RE.match(cell)
+            if group is None and group_match:
+                group = group_match.group(1)
+                continue
+            title_cells.append(cell)
+        if code is None:
+            code = normalize_code(text)
+        return cls(code=code, title=" - ".join(title_cells) or None, hours=hours, group=group,
+                   ref=ref, text=text)
+
+    @classmethod
+    def from_extracted(cls, unit):
+        """From a unit of extract_available_units() / parse_available_units() (or a plain string)."""
+        if isinstance(unit, str):
+            return cls.parse(unit)
+        return cls.parse(unit.get("text", ""), ref=unit.get("id") or unit.get("value") or None)
+
+    @classmethod
+    def from_record(cls, key, record):
+        """From a stored record; the code is taken from the key when it was left out."""
+        code = record.get("code")
+        if code is None:
+            # Merged catalogs prefix the key with the registration type ("Retake: BIT 2101 #2")
+            candidate = ORDINAL_RE.sub("", key.rsplit(": ", 1)[-1])
+            code = candidate if normalize_code(candidate) == candidate else None
+        return cls(code=code, title=record.get("title"), hours=record.get("hours"), group=record.get("group"),
+                   ref=record.get("ref"), text=None if code else key)
+
+    @property
+    def key(self):
+        """Catalog key: the code (with the group when there is one), or the text for code-less units."""
+        if self.code is None:
+            return self.text or self.title or ""
+        return f"{self.code} / {self.group}" if self.group else self.code
+
+    def record(self):
+        """The stored form: non-empty fields except the code when it is the key."""
+        record = {field: getattr(self, field) for field in FIELDS if getattr(self, field) is not None}
+        if record.get("code") == self.key:
+            del record["code"]
+        return record
+
+    def label(self):
+        """A display string built from the fields."""
+        parts = [self.code, self.title, None if self.hours is None else str(self.hours),
+                 self.group and f"Group {self.group}"]
+        return " | ".join(part for part in parts if part) or (self.text or "")
+
+    def __eq__(self, other):
+        return isinstance(other, Unit) and all(getattr(self, f) == getattr(other, f) for f in FIELDS)
+
+    def __hash__(self):
+        return hash(tuple(getattr(self, field) for field in FIELDS))
+
+    def __repr__(self):
+        return f"Unit({', '.join(f'{f}={getattr(self, f)!r}' for f in FIELDS if getattr(self, f) is not None)})"
+
+
+class UnitCatalog:
+    """
+    Units keyed by code, iterated in key order. Units sharing a key (the
+    same code offered twice without a group the parser recognises) are kept
+    apart by an ordinal in the order they were added: "BIT 2101",
+    "BIT 2101 #2".
+
+        catalog = UnitCatalog.from_extracted(units)
+        catalog["BIT 2101"].title
+        catalog.diff(UnitCatalog.from_dict(previous["catalog"]))
+    """
+
+    def __init__(self, units=()):
+        self.units = {}
+        self._order = None
+        for unit in units:
+            self.add(unit)
+
+    @classmethod
+    def from_extracted(cls, units):
+        return cls(Unit.from_extracted(unit) for unit in units)
+
+    @classmethod
+    def from_dict(cls, records):
+        """From a stored catalog ({key: record}), keeping its keys; None gives an empty catalog."""
+        catalog = cls()
+        for key, record in (records or {}).items():
+            catalog.units[key] = Unit.from_record(key, record)
+        return catalog
+
+    def add(self, unit):
+        """Add a unit and return the key it is stored under."""
+        key = unit.key
+        ordinal = 1
+        while key in self.units:
+            ordinal += 1
+            key = f"{unit.key} #{ordinal}"
+        self.units[key] = unit
+        self._order = None
+        return key
+
+    def keys(self):
+        if self._order is None:
+            self._order = sorted(self.units)
+        return list(self._order)
+
+    def get(self, key, default=None):
+        return self.units.get(key, default)
+
+    def __getitem__(self, key):
+        return self.units[key]
+
+    def __contains__(self, key):
+        return key in self.units
+
+    def __len__(self):
+        return len(self.units)
+
+    def __iter__(self):
+        return (self.units[key] for key in self.keys())
+
+    def to_dict(self):
+        """The stored form, {key: record} in key order."""
+        return {key: self.units[key].record() for key in self.keys()}
+
+    def diff(self, previous):
+        """
+        What changed since `previous` (another UnitCatalog).
+
+        Returns {'added': [keys], 'removed': [keys], 'changed': {key: {field: [old, new]}}}
+        """
+        added = [key for key in self.keys() if key not in previous]
+        removed = [key for key in previous.keys() if key not in self]
+        changed = {}
+        for key in self.keys():
+            old = previous.get(key)
+            if old is None:
+                continue
+            fields = {field: [getattr(old, field), getattr(self.units[key], field)]
+                      for field in DIFF_FIELDS if getattr(old, field) != getattr(self.units[key], field)}
+            if fields:
+                changed[key] = fields
+        return {"added": added, "removed": removed, "changed": changed}
+
+
+def catalog_dict(units):
+    """The stored catalog for extracted units (see UnitCatalog.to_dict())."""
+    return UnitCatalog.from_extracted(units).to_dict()
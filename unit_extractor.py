@@ -0,0 +1,269 @@
+"""
+MMU Student Portal - Unit candidate collection
+Gathers everything extract_available_units() needs (dropdown options,
+checkbox rows, unit tables) in a single execute_script round trip instead of
+several WebDriver calls per element.
+"""
+
+from locator_cache import get_locator_cache, settle
+from structured_log import get_logger
+
+log = get_logger()
+
+# Mirrors the three strategies of extract_available_units() (and
+# portal_parser.parse_unit_candidates() for raw HTML); element.innerText
+# matches what WebElement.text returns for rendered elements. arguments[2]
+# is the learned {strategy, selector} from the locator cache, or null; it
+# only changes which checkbox selector is tried first.
+COLLECT_UNITS_SCRIPT = """
+const keywords = arguments[0];
+const previewRows = arguments[1];
+const preferred = arguments[2];
+const checkboxSelectors = arguments[3];
+const text = (el) => (el ? (el.innerText || '').trim() : '');
+const result = {dropdown: [], dropdown_present: false, checkboxes: [], checkbox_count: 0, checkbox_selector: null,
+                table: null};
+
+const collectDropdown = () => {
+    const dropdown = document.getElementById('Main__ddlUnits');
+    if (dropdown && dropdown.tagName === 'SELECT') {
+        result.dropdown_present = true;
+        for (const option of dropdown.options) {
+            const optionText = (option.text || '').trim();
+            if (optionText && optionText !== '--Select--') {
+                result.dropdown.push({text: optionText, value: option.getAttribute('value')});
+            }
+        }
+    }
+};
+
+const collectCheckboxes = (selectors) => {
+    let checkboxes = [];
+    result.checkbox_selector = null;
+    for (const selector of selectors) {
+        checkboxes = document.querySelectorAll(selector);
+        if (checkboxes.length) {
+            result.checkbox_selector = selector;
+            break;
+        }
+    }
+    result.checkbox_count = checkboxes.length;
+    result.checkboxes = [];
+    for (const cb of checkboxes) {
+        const parent = cb.parentElement;
+        if (!parent) continue;
+        const label = parent.querySelector('label');
+        let unitText = label ? text(label) : text(parent);
+        const row = cb.closest('tr');
+        if (row) {
+            const cells = Array.from(row.querySelectorAll('td')).map(text).filter((t) => t);
+            if (cells.length) unitText = cells.join(' | ');
+        }
+        if (unitText && unitText.length > 3) {
+            result.checkboxes.push({element: cb, text: unitText, id: cb.id || null});
+        }
+    }
+};
+
+const collectTable = () => {
+    for (const table of document.getElementsByTagName('table')) {
+        const rows = table.querySelectorAll('tr');
+        if (rows.length <= 1) continue;
+        const headerText = text(rows[0]).toLowerCase();
+        if (!keywords.some((keyword) => headerText.includes(keyword))) continue;
+        let headerCells = rows[0].querySelectorAll('th');
+        if (!headerCells.length) headerCells = rows[0].querySelectorAll('td');
+        const preview = [];
+        for (const row of Array.from(rows).slice(1, previewRows + 1)) {
+            const cells = Array.from(row.querySelectorAll('td')).map(text).filter((t) => t);
+            preview.push(cells.join(' | '));
+        }
+        result.table = {
+            header: Array.from(headerCells).map(text).join(' | '),
+            rows: preview,
+            row_count: rows.length
+        };
+        break;
+    }
+};
+
+// The dropdown always wins, so nothing else is needed when it lists units
+collectDropdown();
+if (result.dropdown.length) return result;
+collectCheckboxes(preferred && preferred.strategy === 'checkboxes' && preferred.selector
+    ? [preferred.selector].concat(checkboxSelectors.filter((selector) => selector !== preferred.selector))
+    : checkboxSelectors);
+collectTable();
+return result;
+"""
+
+# Tried in order; the modal's checkboxes are the units
+CHECKBOX_SELECTORS = ["#myModalCourseRegister input[type='checkbox']", "input[type='checkbox']"]
+
+# Key of the learned extraction strategy in the locator cache
+LOCATOR_PAGE = "unit_registration"
+
+
+def checkbox_selectors(preferred=None):
+    """CHECKBOX_SELECTORS, with the learned checkbox selector (if any) moved to the front."""
+    selector = (preferred or {}).get("selector") if (preferred or {}).get("strategy") == "checkboxes" else None
+    if not selector:
+        return list(CHECKBOX_SELECTORS)
+    return [selector] + [other for other in CHECKBOX_SELECTORS if other != selector]
+
+
+def found_strategy(candidates):
+    """(strategy, selector) of extract_available_units()'s choice among the candidates, or None."""
+    if candidates["dropdown"]:
+        return "dropdown", None
+    if candidates["checkboxes"]:
+        return "checkboxes", candidates.get("checkbox_selector")
+    return None
+
+
+def collect_unit_candidates(driver, reg_type=None):
+    """
+    Collect the candidates for every extraction strategy in one round trip.
+
+    The dropdown is always read first and wins when it lists units, as in
+    extract_available_units(). The checkbox selector that found the units
+    last time for `reg_type` (see locator_cache) is only tried before the
+    default ones.
+
+    Returns a dict with:
+        dropdown: [{'text', 'value'}] options of Main__ddlUnits
+        dropdown_present: whether Main__ddlUnits exists
+        checkboxes: [{'element', 'text', 'id'}] unit checkboxes
+        checkbox_count: number of checkboxes found
+        checkbox_selector: the selector that found them
+        table: first units table as {'header', 'rows', 'row_count'}, or None
+    """
+    from selenium.common.exceptions import WebDriverException
+
+    from portal_parser import TABLE_KEYWORDS, TABLE_PREVIEW_ROWS
+
+    cache = get_locator_cache()
+    cached = cache.lookup(LOCATOR_PAGE, reg_type) if cache else None
+    try:
+        candidates = driver.execute_script(COLLECT_UNITS_SCRIPT, TABLE_KEYWORDS, TABLE_PREVIEW_ROWS, cached,
+                                           CHECKBOX_SELECTORS)
+    except WebDriverException as e:
+        log.debug(f"Batched extraction failed, using per-element lookups: {e}")
+        candidates = collect_unit_candidates_per_element(driver, cached)
+    found = found_strategy(candidates)
+    # A page without units says nothing about the markup, so it is neither a hit nor a miss
+    if found is not None:
+        settle(driver, LOCATOR_PAGE, cached, found, reg_type, cache)
+    return candidates
+
+
+def collect_unit_candidates_per_element(driver, preferred=None):
+    """
+    The original per-element implementation of collect_unit_candidates().
+
+    Makes several WebDriver round trips per checkbox and table row; kept as
+    a fallback and as the baseline for benchmarks/bench_extract_units.py.
+    `preferred` is the learned {'strategy', 'selector'}; only its checkbox
+    selector is used, to try it first.
+    """
+    result = {"dropdown": [], "dropdown_present": False, "checkboxes": [], "checkbox_count": 0,
+              "checkbox_selector": None, "table": None}
+
+    # Strategy 1: units in the dropdown (nothing else is needed when it lists units)
+    _dropdown_per_element(driver, result)
+    if result["dropdown"]:
+        return result
+    # Strategy 2: checkboxes, in the modal first unless another selector found them last time
+    _checkboxes_per_element(driver, result, checkbox_selectors(preferred))
+    # Strategy 3: units tables
+    _table_per_element(driver, result)
+    return result
+
+
+def _dropdown_per_element(driver, result):
+    from selenium.common.exceptions import NoSuchElementException
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import Select
+
+    try:
+        unit_dropdown = Select(driver.find_element(By.ID, "Main__ddlUnits"))
+        result["dropdown_present"] = True
+        for option in unit_dropdown.options:
+            if option.text.strip() and option.text.strip() not in ["", "--Select--"]:
+                result["dropdown"].append({
+                    'text': option.text.strip(),
+                    'value': option.get_attribute('value')
+                })
+    except NoSuchElementException:
+        pass
+
+
+def _checkboxes_per_element(driver, result, selectors):
+    from selenium.common.exceptions import NoSuchElementException, WebDriverException
+    from selenium.webdriver.common.by import By
+
+    modal_checkboxes = []
+    result["checkbox_selector"] = None
+    for selector in selectors:
+        modal_checkboxes = driver.find_elements(By.CSS_SELECTOR, selector)
+        if modal_checkboxes:
+            result["checkbox_selector"] = selector
+            break
+    result["checkbox_count"] = len(modal_checkboxes)
+    result["checkboxes"] = []
+
+    for cb in modal_checkboxes:
+        try:
+            parent = cb.find_element(By.XPATH, "..")
+            try:
+                label = parent.find_element(By.TAG_NAME, "label")
+                unit_text = label.text.strip()
+            except NoSuchElementException:
+                unit_text = parent.text.strip()
+
+            try:
+                # The nearest row is the unit's own row in the modal table (the modal itself
+                # sits inside the page layout table); closest('tr') above and the lxml parser agree
+                row = cb.find_element(By.XPATH, "ancestor::tr[1]")
+                cells = row.find_elements(By.TAG_NAME, "td")
+                if cells:
+                    row_text = " | ".join([cell.text.strip() for cell in cells if cell.text.strip()])
+                    if row_text:
+                        unit_text = row_text
+            except NoSuchElementException:
+                pass
+
+            if unit_text and len(unit_text) > 3:
+                result["checkboxes"].append({'element': cb, 'text': unit_text, 'id': cb.get_attribute('id') or None})
+        except WebDriverException:
+            continue
+
+
+def _table_per_element(driver, result):
+    from selenium.webdriver.common.by import By
+
+    from portal_parser import TABLE_KEYWORDS, TABLE_PREVIEW_ROWS
+
+    for table in driver.find_elements(By.TAG_NAME, "table"):
+        rows = table.find_elements(By.TAG_NAME, "tr")
+        if len(rows) <= 1:
+            continue
+        header_text = rows[0].text.lower()
+        if not any(keyword in header_text for keyword in TABLE_KEYWORDS):
+            continue
+
+        header_cells = rows[0].find_elements(By.TAG_NAME, "th")
+        if not header_cells:
+            header_cells = rows[0].find_elements(By.TAG_NAME, "td")
+
+        preview = []
+        for row in rows[1:TABLE_PREVIEW_ROWS + 1]:
+            cells = row.find_elements(By.TAG_NAME, "td")
+            preview.append(" | ".join([cell.text.strip() for cell in cells if cell.text.strip()]))
+
+        result["table"] = {
+            "header": " | ".join([cell.text.strip() for cell in header_cells]),
+            "rows": preview,
+            "row_count": len(rows)
+        }
+        break
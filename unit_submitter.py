@@ -0,0 +1,119 @@
+"""
+MMU Student Portal - Unit selection and submission
+Ticks the chosen unit checkboxes (or selects the chosen dropdown units) and
+clicks 'Submit Registration' in a single execute_script round trip, so the
+registration goes in as soon as the units appear.
+"""
+
+from structured_log import get_logger
+from waits import dom_ready, element_present, get_wait_engine, staleness_of
+
+log = get_logger()
+
+ADD_UNIT_BUTTON_ID = "Main__btnAddUnit"
+
+# arguments: checkbox elements, dropdown values, dry run.
+# The submit click is deferred with setTimeout so the script returns before
+# the postback navigates away.
+SELECT_AND_SUBMIT_SCRIPT = """
+const checkboxes = arguments[0];
+const values = arguments[1];
+const dryRun = arguments[2];
+const result = {selected: 0, button: null, submitted: false, error: null};
+
+for (const cb of checkboxes) {
+    if (!cb.checked) cb.click();
+    if (cb.checked) result.selected += 1;
+}
+
+if (values.length) {
+    const dropdown = document.getElementById('Main__ddlUnits');
+    if (!dropdown) {
+        result.error = 'Units dropdown not found';
+        return result;
+    }
+    if (values.length > 1 && !dropdown.multiple) {
+        result.error = 'The units dropdown only takes one unit at a time';
+        return result;
+    }
+    for (const option of dropdown.options) {
+        option.selected = values.includes(option.value);
+        if (option.selected) result.selected += 1;
+    }
+    dropdown.dispatchEvent(new Event('change', {bubbles: true}));
+}
+
+const button = document.getElementById('Main__btnRegisterCourse');
+result.button = button;
+if (button && !dryRun) {
+    setTimeout(() => button.click(), 0);
+    result.submitted = true;
+}
+return result;
+"""
+
+# arguments: dropdown value. Selects one unit and clicks the 'Add' button.
+ADD_DROPDOWN_UNIT_SCRIPT = """
+const dropdown = document.getElementById('Main__ddlUnits');
+const button = document.getElementById('Main__btnAddUnit');
+if (!dropdown || !button) return false;
+dropdown.value = arguments[0];
+setTimeout(() => button.click(), 0);
+return true;
+"""
+
+
+def add_dropdown_units(driver, values):
+    """
+    Add dropdown units one postback at a time, for portals with an 'Add'
+    button next to Main__ddlUnits.
+
+    Returns False if there is no 'Add' button.
+    """
+    from selenium.webdriver.common.by import By
+
+    waits = get_wait_engine(driver)
+    for value in values:
+        buttons = driver.find_elements(By.ID, ADD_UNIT_BUTTON_ID)
+        if not buttons:
+            return False
+        if not driver.execute_script(ADD_DROPDOWN_UNIT_SCRIPT, value):
+            return False
+        waits.until("registration_submit", staleness_of(buttons[0]), name="add_unit_postback", required=False)
+        waits.until("registration_submit", dom_ready, name="dom_ready", required=False)
+        waits.until("registration_submit", element_present(By.ID, ADD_UNIT_BUTTON_ID),
+                    name="add_unit_button", required=False)
+    return True
+
+
+def select_and_submit(driver, units, dry_run=False):
+    """
+    Select `units` and click 'Submit Registration'.
+
+    Args:
+        units: Units from extract_available_units() (checkbox units carry their
+               WebElement, dropdown units their option value)
+        dry_run: Select the units but do not click the submit button
+
+    Returns {'selected', 'button', 'submitted', 'error'}, where `button` is
+    the submit button element (or None) to wait on for the postback.
+    """
+    from selenium.webdriver.common.by import By
+
+    checkboxes = [unit["element"] for unit in units if unit.get("element") is not None]
+    values = [unit["value"] for unit in units if unit.get("element") is None and unit.get("value")]
+
+    # Portals with an 'Add' button post back once per dropdown unit
+    added = 0
+    if values and driver.find_elements(By.ID, ADD_UNIT_BUTTON_ID):
+        if dry_run:
+            log.info(f"Dry run - would add {len(values)} units from the dropdown")
+            added = len(values)
+        elif add_dropdown_units(driver, values):
+            added = len(values)
+        if added:
+            values = []
+
+    result = driver.execute_script(SELECT_AND_SUBMIT_SCRIPT, checkboxes, values, dry_run)
+    result["selected"] += added
+    return result
@@ -0,0 +1,235 @@
+"""
+MMU Student Portal - Wait engine
+Waits on explicit page conditions (DOM ready, SweetAlert visible, units
+loaded, URL changed) instead of fixed sleeps, with a timeout per step and a
+record of how long each condition actually took. Selenium is imported
+where it is used, so the module loads without it.
+"""
+
+import os
+import time
+
+from resilience import observe_latency, step_timeout
+from structured_log import get_logger
+
+log = get_logger()
+
+# Seconds to wait for each step before giving up (override with MMU_WAIT_TIMEOUTS)
+DEFAULT_TIMEOUTS = {
+    "login_form": 10,
+    "login_submit": 15,
+    "navigation": 15,
+    "registration_type": 10,
+    "get_units": 20,
+    "get_units_render": 3,
+    "alert_close": 5,
+    "registration_submit": 30
+}
+
+POLL_FREQUENCY = 0.1
+
+SWEETALERT_SELECTOR = ".swal2-modal[style*='display: block'], .swal2-modal[aria-hidden='false'], .swal2-popup.swal2-show"
+UNITS_DROPDOWN_SELECTOR = "#Main__ddlUnits option"
+MODAL_CHECKBOX_SELECTOR = "#myModalCourseRegister input[type='checkbox']"
+
+
+def load_timeouts():
+    """
+    Read per-step timeouts, e.g. MMU_WAIT_TIMEOUTS="get_units=30,navigation=20".
+    """
+    timeouts = dict(DEFAULT_TIMEOUTS)
+    for item in os.getenv("MMU_WAIT_TIMEOUTS", "").split(","):
+        step, _, seconds = item.partition("=")
+        if step.strip() and seconds.strip():
+            try:
+                timeouts[step.strip()] = float(seconds)
+            except ValueError:
+                log.warning(f"Ignoring invalid wait timeout: {item}")
+    return timeouts
+
+
+# --- conditions (callables taking the driver) ----------------------------
+
+def dom_ready(driver):
+    # "interactive" is enough: with the eager load strategy images and
+    # stylesheets may still be loading when the DOM is ready
+    return driver.execute_script("return document.readyState") in ("interactive", "complete")
+
+
+def sweetalert_visible(driver):
+    from selenium.webdriver.common.by import By
+
+    for modal in driver.find_elements(By.CSS_SELECTOR, SWEETALERT_SELECTOR):
+        if modal.is_displayed():
+            return modal
+    return False
+
+
+def sweetalert_closed(driver):
+    return not sweetalert_visible(driver)
+
+
+def units_dropdown_populated(driver):
+    from selenium.webdriver.common.by import By
+
+    options = driver.find_elements(By.CSS_SELECTOR, UNITS_DROPDOWN_SELECTOR)
+    return len([opt for opt in options if opt.get_attribute("value")]) > 0
+
+
+def checkbox_modal_rendered(driver):
+    from selenium.webdriver.common.by import By
+
+    checkboxes = driver.find_elements(By.CSS_SELECTOR, MODAL_CHECKBOX_SELECTOR)
+    return bool(checkboxes) and checkboxes[0].is_displayed()
+
+
+def element_present(by, value):
+    def condition(driver):
+        elements = driver.find_elements(by, value)
+        return elements[0] if elements else False
+    return condition
+
+
+def element_visible(by, value):
+    def condition(driver):
+        for element in driver.find_elements(by, value):
+            if element.is_displayed():
+                return element
+        return False
+    return condition
+
+
+def url_changed(old_url):
+    def condition(driver):
+        return driver.current_url != old_url
+    return condition
+
+
+def staleness_of(element):
+    """True once the element has been detached by a page load (postback)."""
+    from selenium.common.exceptions import NoSuchElementException, StaleElementReferenceException
+
+    def condition(driver):
+        try:
+            element.is_enabled()
+            return False
+        except (StaleElementReferenceException, NoSuchElementException):
+            return True
+    return condition
+
+
+def any_of(**conditions):
+    """Succeeds with the name of the first condition that is met."""
+    from selenium.common.exceptions import NoSuchElementException, StaleElementReferenceException
+
+    def condition(driver):
+        for name, check in conditions.items():
+            try:
+                if check(driver):
+                    return name
+            except (StaleElementReferenceException, NoSuchElementException):
+                continue
+        return False
+    return condition
+
+
+class WaitEngine:
+    """
+    Central place for every wait in a browser session.
+
+    Each wait is named after the step it belongs to; its timeout comes from
+    DEFAULT_TIMEOUTS / MMU_WAIT_TIMEOUTS, stretched or tightened by the
+    latencies seen for the same wait (resilience.step_timeout), and the time
+    it actually took is kept in `records`.
+    """
+
+    def __init__(self, driver, timeouts=None):
+        self.driver = driver
+        self.timeouts = timeouts or load_timeouts()
+        self.records = []
+
+    def until(self, step, condition, name=None, timeout=None, required=True):
+        """
+        Wait for a condition during a step.
+
+        Returns the condition's result, or False on timeout when `required`
+        is False (TimeoutException is raised otherwise).
+        """
+        from selenium.common.exceptions import NoSuchElementException, StaleElementReferenceException, TimeoutException
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        name = name or getattr(condition, "__name__", "condition")
+        # Stretches with the latencies seen for this wait when the portal slows down
+        timeout = timeout if timeout is not None else step_timeout(f"{step}:{name}", self.timeouts.get(step, 10))
+        started = time.perf_counter()
+        met = False
+        try:
+            result = WebDriverWait(
+                self.driver, timeout, poll_frequency=POLL_FREQUENCY,
+                ignored_exceptions=(StaleElementReferenceException, NoSuchElementException)
+            ).until(condition)
+            met = True
+            return result
+        except TimeoutException:
+            if required:
+                raise
+            return False
+        finally:
+            seconds = time.perf_counter() - started
+            if met:
+                observe_latency(f"{step}:{name}", seconds)
+            self.records.append({
+                "step": step,
+                "condition": name,
+                "seconds": round(seconds, 3),
+                "met": met,
+                "timeout": timeout
+            })
+
+    def page_load(self, step, old_element=None):
+        """Wait for a postback/navigation to finish (old element detached, DOM ready)."""
+        if old_element is not None:
+            self.until(step, staleness_of(old_element), name="postback")
+        return self.until(step, dom_ready, name="dom_ready")
+
+    def total_seconds(self):
+        return round(sum(record["seconds"] for record in self.records), 3)
+
+
+def get_wait_engine(driver):
+    """Return the WaitEngine shared by every step run on this driver."""
+    engine = getattr(driver, "_mmu_wait_engine", None)
+    if engine is None:
+        engine = WaitEngine(driver)
+        driver._mmu_wait_engine = engine
+    return engine
+
+
+def is_ci():
+    """Whether we are running in GitHub Actions or another CI environment."""
+    return os.getenv("CI") == "true" or os.getenv("GITHUB_ACTIONS") == "true"
+
+
+def linger_seconds(local_default, ci_default):
+    """
+    How long to keep the browser open for manual review.
+
+    MMU_LINGER_SECONDS overrides the local/CI defaults; set it to 0 to
+    remove the review pauses entirely.
+    """
+    override = os.getenv("MMU_LINGER_SECONDS")
+    if override is not None and override.strip() != "":
+        try:
+            return max(0.0, float(override))
+        except ValueError:
+            log.warning(f"Ignoring invalid MMU_LINGER_SECONDS: {override}")
+    return ci_default if is_ci() else local_default
+
+
+def linger(local_default, ci_default, message):
+    """Keep the browser open for manual review, unless configured away."""
+    seconds = linger_seconds(local_default, ci_default)
+    if seconds <= 0:
+        return
+    log.info(message.format(seconds=int(seconds)))
+    time.sleep(seconds)